@@ -0,0 +1,174 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Any, Dict, List
+
+from legal_rag.tracing import METRICS
+
+# ----------------------------
+#      CONFIG
+# ----------------------------
+
+# Graph executions allowed to run at the same time in this process
+MAX_CONCURRENT_GRAPHS = int(os.getenv("MAX_CONCURRENT_GRAPHS", "4"))
+# Requests beyond this many waiting are rejected immediately
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30"))
+# Queue depth (seen on arrival) from which admitted requests run degraded
+DEGRADE_FAST_QUEUE_DEPTH = int(os.getenv("DEGRADE_FAST_QUEUE_DEPTH", str(MAX_CONCURRENT_GRAPHS)))
+DEGRADE_MINIMAL_QUEUE_DEPTH = int(os.getenv("DEGRADE_MINIMAL_QUEUE_DEPTH", str(2 * MAX_CONCURRENT_GRAPHS)))
+
+# Pipeline settings applied at each degradation level (see legal_rag.pipeline_config)
+DEGRADATION_LEVELS: Dict[str, Dict[str, Any]] = {
+    "none": {},
+    "fast": {"fast_mode": True, "max_research_cycles": 2},
+    "minimal": {"fast_mode": True, "max_research_cycles": 1, "skip_evaluation": True},
+}
+
+# Lawyers are admitted ahead of citizens when both are queued
+ROLE_PRIORITY = {"lawyer": 0, "citizen": 1}
+
+ADMISSION_DECISIONS = METRICS.counter(
+    "lara_admission_decisions_total", "Admission outcomes for /process_query by decision."
+)
+ADMISSION_WAIT = METRICS.histogram(
+    "lara_admission_wait_seconds", "Time requests spent queued before admission."
+)
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After estimate in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """A granted execution slot. Use as `async with` so the slot is always released."""
+
+    def __init__(self, controller: "AdmissionController", level: str, waited: float):
+        self.controller = controller
+        self.level = level
+        self.waited = waited
+        self.settings = dict(DEGRADATION_LEVELS[level])
+        self._started = time.monotonic()
+
+    @property
+    def degraded(self) -> bool:
+        return self.level != "none"
+
+    def describe(self) -> Dict[str, Any]:
+        return {"level": self.level, "queue_wait_seconds": round(self.waited, 3), **self.settings}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.controller._release(time.monotonic() - self._started)
+
+
+# ----------------------------
+#      CONTROLLER
+# ----------------------------
+
+class AdmissionController:
+    """
+    Concurrency-limited, priority-ordered admission queue in front of the agent graph.
+    Runs on the event loop; requests wait on futures rather than holding threads.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_GRAPHS,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._running = 0
+        self._waiters: List[tuple] = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        # Moving average of graph run time, used for Retry-After estimates
+        self._avg_service_seconds = 20.0
+
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def running(self) -> int:
+        return self._running
+
+    def _retry_after(self) -> int:
+        estimate = self._avg_service_seconds * (len(self._waiters) + 1) / self.max_concurrent
+        return int(min(300, max(1, math.ceil(estimate))))
+
+    def _reject(self, reason: str):
+        ADMISSION_DECISIONS.inc(decision=f"rejected_{reason}")
+        raise Overloaded(reason, self._retry_after())
+
+    def _level(self, depth_on_arrival: int, waited: float) -> str:
+        if depth_on_arrival >= DEGRADE_MINIMAL_QUEUE_DEPTH or waited >= self.max_wait / 2:
+            return "minimal"
+        if depth_on_arrival >= DEGRADE_FAST_QUEUE_DEPTH or waited >= self.max_wait / 4:
+            return "fast"
+        return "none"
+
+    async def admit(self, role: str) -> Admission:
+        """Waits for a slot (up to max_wait) and decides how degraded the run should be."""
+        priority = ROLE_PRIORITY.get((role or "").strip().lower(), 1)
+        depth_on_arrival = len(self._waiters)
+        start = time.monotonic()
+
+        if self._running < self.max_concurrent and not self._waiters:
+            self._running += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._reject("queue_full")
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            try:
+                await asyncio.wait_for(future, timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self._remove(future)
+                # The slot may have been granted just as the wait timed out (wait_for can
+                # still raise then); it is counted in _running, so take it
+                if not (future.done() and not future.cancelled()):
+                    self._reject("timeout")
+            except asyncio.CancelledError:
+                # Client went away; hand the slot on if it had already been granted
+                if future.done() and not future.cancelled():
+                    self._release(None)
+                self._remove(future)
+                raise
+
+        waited = time.monotonic() - start
+        ADMISSION_WAIT.observe(waited)
+        level = self._level(depth_on_arrival, waited)
+        ADMISSION_DECISIONS.inc(decision="admitted" if level == "none" else f"degraded_{level}")
+        return Admission(self, level, waited)
+
+    def _remove(self, future: asyncio.Future):
+        self._waiters = [w for w in self._waiters if w[2] is not future]
+        heapq.heapify(self._waiters)
+
+    def _release(self, service_seconds):
+        if service_seconds is not None:
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+        self._running -= 1
+        # Hand the slot to the highest-priority waiter that is still waiting
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._running += 1
+                break
+
+
+ADMISSION = AdmissionController()
+METRICS.gauge_callback("lara_admission_queue_depth", "Requests waiting for a graph slot.", lambda: {(): ADMISSION.queue_depth()})
+METRICS.gauge_callback("lara_admission_running", "Graph executions currently admitted.", lambda: {(): ADMISSION.running()})
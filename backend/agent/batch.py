@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from agent.router import route_query
+from legal_rag.retrieval import prefetch_legal_search
+from legal_rag.providers import PRIORITY_BATCH
+from agent.singleflight import query_key
+
+# ----------------------------
+#      CONFIG
+# ----------------------------
+
+# Number of graph runs executed at the same time for one batch job.
+# The provider calls inside those runs are additionally scheduled by legal_rag.providers.
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+BATCH_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "batch_results")
+
+
+# ----------------------------
+#      JOB STATE
+# ----------------------------
+
+@dataclass
+class BatchJob:
+    job_id: str
+    items: List[Dict[str, str]]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    unique_queries: int = 0
+    completed_queries: int = 0
+    failed_queries: int = 0
+    error: Optional[str] = None
+    results_path: Optional[str] = None
+
+    def to_status(self) -> Dict[str, Any]:
+        """Summarizes the job for status polling, including throughput in queries/minute."""
+        end = self.finished_at or time.time()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        processed = self.completed_queries + self.failed_queries
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total_queries": len(self.items),
+            "unique_queries": self.unique_queries,
+            "completed_queries": self.completed_queries,
+            "failed_queries": self.failed_queries,
+            "elapsed_seconds": round(elapsed, 2),
+            "queries_per_minute": round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "error": self.error,
+        }
+
+
+_jobs: Dict[str, BatchJob] = {}
+_jobs_lock = threading.Lock()
+
+
+# ----------------------------
+#      JOB EXECUTION
+# ----------------------------
+
+def _run_single(job_id: str, position: int, role: str, query: str) -> Dict[str, Any]:
+    """Runs one unique query through the normal agent graph on its own thread."""
+    thread_id = f"batch-{job_id}-{position}"
+    try:
+        result = route_query(
+            role=role, user_query=query, thread_id=thread_id, priority=PRIORITY_BATCH
+        )
+        return {
+            "status": "completed",
+            "final_analysis": result.get(
+                "final_analysis", "Sorry, I couldn't generate a final analysis."
+            ),
+        }
+    except Exception as e:
+        print(f"Batch {job_id}: query {position} failed: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+def _run_job(job: BatchJob):
+    job.status = "running"
+    job.started_at = time.time()
+    print(f"---BATCH {job.job_id}: {len(job.items)} QUERIES---")
+
+    try:
+        # 1. Dedupe identical (role, query) pairs, remembering where each input maps to
+        unique: Dict[Any, Dict[str, str]] = {}
+        positions = []
+        for item in job.items:
+            key = query_key(item["role"], item["query"])
+            if key not in unique:
+                unique[key] = item
+            positions.append(key)
+        job.unique_queries = len(unique)
+
+        # 2. Shared retrieval: one batched embedding + FAISS search for the whole job
+        try:
+            prefetch_legal_search([item["query"] for item in unique.values()])
+        except Exception as e:
+            # Each graph run falls back to its own search if the batch prefetch fails
+            print(f"Batch {job.job_id}: shared retrieval failed, searching per query: {e}")
+
+        # 3. Run the unique queries concurrently
+        unique_results: Dict[Any, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(_run_single, job.job_id, n, item["role"], item["query"]): key
+                for n, (key, item) in enumerate(unique.items())
+            }
+            for future, key in futures.items():
+                outcome = future.result()
+                unique_results[key] = outcome
+                if outcome["status"] == "completed":
+                    job.completed_queries += 1
+                else:
+                    job.failed_queries += 1
+
+        # 4. Fan results back out to every input position as JSONL
+        os.makedirs(BATCH_RESULTS_DIR, exist_ok=True)
+        results_path = os.path.join(BATCH_RESULTS_DIR, f"{job.job_id}.jsonl")
+        with open(results_path, "w", encoding="utf-8") as f:
+            for index, (item, key) in enumerate(zip(job.items, positions)):
+                record = {"index": index, "role": item["role"], "query": item["query"]}
+                record.update(unique_results[key])
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        job.results_path = results_path
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"Batch {job.job_id} failed: {e}")
+    finally:
+        job.finished_at = time.time()
+        print(f"---BATCH {job.job_id} {job.status.upper()}: {job.to_status()['queries_per_minute']} queries/min---")
+
+
+# ----------------------------
+#      PUBLIC API
+# ----------------------------
+
+def submit_batch(items: List[Dict[str, str]]) -> BatchJob:
+    """Registers a batch job and starts it in a background thread."""
+    job = BatchJob(job_id=str(uuid.uuid4()), items=items)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    threading.Thread(target=_run_job, args=(job,), daemon=True).start()
+    return job
+
+
+def get_batch_job(job_id: str) -> Optional[BatchJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -5,10 +5,18 @@ import operator
 from langchain_core.messages import BaseMessage
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableConfig
 
 # --- 1. UPDATED IMPORTS ---
 from legal_rag.query_rewriter import rewrite_query
-from legal_rag.retrieval import perform_research
+from legal_rag.providers import PROVIDER_MODE
+from legal_rag.pipeline_config import pipeline_setting
+from legal_rag.retrieval import (
+    perform_research,
+    speculative_rewrite_and_research,
+    SPECULATIVE_RETRIEVAL,
+)
+from legal_rag.sources import merge_source_ids
 from legal_rag.summarizer import (
     summarize_and_reflect, 
     generate_final_analysis, 
@@ -23,7 +31,7 @@ load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-if not TAVILY_API_KEY or not GROQ_API_KEY:
+if PROVIDER_MODE == "live" and (not TAVILY_API_KEY or not GROQ_API_KEY):
     raise ValueError(
         "API keys for Tavily and Grok are not set. Please add them to your .env file."
     )
@@ -34,27 +42,33 @@ MAX_RESEARCH_CYCLES = 3
 class AgentState(TypedDict):
     query: str
     intermediate_steps: Annotated[List[Any], operator.add]
-    web_search_results: str
-    faiss_search_results: str
+    web_search_results: List[str]
+    faiss_search_results: List[str]
     final_analysis: str
     research_complete: bool
     chat_history: List[BaseMessage]
-    sources: Annotated[List[dict], operator.add]
+    sources: Annotated[List[str], merge_source_ids]
+    citations: List[dict]
     role: str
+    rewritten_query: str
+    speculation: dict
     research_cycles: Annotated[int, operator.add]
-    evaluation_score: str 
+    evaluation_score: str
+    evaluation_metrics: dict
+    research_context: str
 
 # --- Decision Nodes ---
-def decide_next_step(state: AgentState):
+def decide_next_step(state: AgentState, config: RunnableConfig = None):
     research_cycles = state.get("research_cycles", 0)
+    max_cycles = pipeline_setting(config, "max_research_cycles", MAX_RESEARCH_CYCLES)
     print(f"---DECISION: Entering cycle {research_cycles}---")
 
     if state.get("research_complete", False):
         print("---DECISION: Research complete. Proceeding to final analysis.---")
         return "final_analysis"
 
-    if research_cycles >= MAX_RESEARCH_CYCLES:
-        print(f"---DECISION: Max research cycles ({MAX_RESEARCH_CYCLES}) reached. Forcing final analysis.---")
+    if research_cycles >= max_cycles:
+        print(f"---DECISION: Max research cycles ({max_cycles}) reached. Forcing final analysis.---")
         return "final_analysis"
     
     else:
@@ -68,7 +82,6 @@ def increment_counter(state: AgentState):
 workflow = StateGraph(AgentState)
 
 # --- 2. ADD ALL NODES ---
-workflow.add_node("rewrite_query", rewrite_query)
 workflow.add_node("perform_research", perform_research)
 workflow.add_node("summarize_and_reflect", summarize_and_reflect)
 workflow.add_node("final_analysis", generate_final_analysis)
@@ -77,8 +90,15 @@ workflow.add_node("evaluate_hybrid_response", evaluate_hybrid_response)
 workflow.add_node("combine_analysis_and_evaluation", combine_analysis_and_evaluation) # <-- ADD THIS NODE
 
 # --- Define the graph flow ---
-workflow.set_entry_point("rewrite_query")
-workflow.add_edge("rewrite_query", "perform_research")
+if SPECULATIVE_RETRIEVAL:
+    # First cycle: rewrite and raw-query retrieval run concurrently in one node
+    workflow.add_node("speculative_research", speculative_rewrite_and_research)
+    workflow.set_entry_point("speculative_research")
+    workflow.add_edge("speculative_research", "summarize_and_reflect")
+else:
+    workflow.add_node("rewrite_query", rewrite_query)
+    workflow.set_entry_point("rewrite_query")
+    workflow.add_edge("rewrite_query", "perform_research")
 workflow.add_edge("perform_research", "summarize_and_reflect")
 workflow.add_edge("summarize_and_reflect", "increment_counter")
 
@@ -1,13 +1,28 @@
+import os
 from dotenv import load_dotenv
 from agent.citizen_agent import app as citizen_app
 from agent.lawyer_agent import lawyer_app as lawyer_app
-from db import save_message, get_thread_messages
+from db import save_message, get_recent_messages
+from legal_rag.providers import request_priority, PRIORITY_LAWYER, PRIORITY_CITIZEN
+from legal_rag.tracing import TracingCallbackHandler
+from legal_rag.pipeline_config import get_profile
 
 load_dotenv()
 
+# Most recent messages of a thread loaded into chat_history for each new query
+CHAT_HISTORY_CONTEXT_MESSAGES = int(os.getenv("CHAT_HISTORY_CONTEXT_MESSAGES", "50"))
+
 
 # --- Routing Logic ---
-def route_query(role: str, user_query: str, thread_id: str):
+def route_query(
+    role: str,
+    user_query: str,
+    thread_id: str,
+    priority: int = None,
+    callbacks: list = None,
+    settings: dict = None,
+    profile: str = None,
+):
     """
     Routes the user's query to the correct agent based on their selected role.
 
@@ -15,12 +30,20 @@ def route_query(role: str, user_query: str, thread_id: str):
         role (str): The role selected by the user ("Common Citizen" or "Lawyer").
         user_query (str): The user's input query.
         thread_id (str): The unique identifier for the conversation thread.
+        priority (int, optional): Provider priority class for the LLM and web search
+            calls of this run. Defaults to the interactive class of the role.
+        callbacks (list, optional): LangChain callback handlers attached to the graph run,
+            e.g. for per-node timing and token usage in benchmarks.
+        settings (dict, optional): Overrides on top of the profile's pipeline settings,
+            e.g. {"fast_mode": True, "max_research_cycles": 1, "skip_evaluation": True}.
+        profile (str, optional): Pipeline profile ("instant", "balanced", "deep").
+            Defaults to PIPELINE_PROFILE. Raises ValueError for unknown names.
 
     Returns:
         The response from the invoked agent.
     """
-    # Load existing chat history for the thread
-    existing_messages = get_thread_messages(thread_id)
+    # Load the thread's recent chat history as context for the agent
+    existing_messages = get_recent_messages(thread_id, CHAT_HISTORY_CONTEXT_MESSAGES)
     chat_history = []
     for msg in existing_messages:
         if msg['role'] == 'user':
@@ -39,22 +62,37 @@ def route_query(role: str, user_query: str, thread_id: str):
     # Normalize role to avoid case-sensitivity issues between frontend and backend
     normalized_role = (role or '').strip().lower()
 
-    if normalized_role == "lawyer":
-        print("Routing to Lawyer Agent...")
-        result = lawyer_app.invoke(
-            input_state, config={"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
-        )
-    elif normalized_role == "citizen":
-        print("Routing to Citizen Agent...")
-        result = citizen_app.invoke(
-            input_state, config={"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
-        )
-    else:
-        # If role is unrecognized, default to Citizen behavior but log a warning.
-        print(f"Warning: Unrecognized role '{role}' received. Defaulting to Citizen Agent.")
-        result = citizen_app.invoke(
-            input_state, config={"configurable": {"thread_id": thread_id}, "recursion_limit": 50}
-        )
+    # Interactive lawyer queries are served ahead of citizen and batch traffic
+    if priority is None:
+        priority = PRIORITY_LAWYER if normalized_role == "lawyer" else PRIORITY_CITIZEN
+
+    # Profile settings travel in the graph config and are read per node
+    pipeline_settings = get_profile(profile).to_settings(settings)
+
+    # Node spans and token counts are always recorded into the current trace
+    config = {
+        "configurable": {**pipeline_settings, "thread_id": thread_id},
+        "recursion_limit": 50,
+        "callbacks": [TracingCallbackHandler()] + list(callbacks or []),
+    }
+
+    with request_priority(priority):
+        if normalized_role == "lawyer":
+            print("Routing to Lawyer Agent...")
+            result = lawyer_app.invoke(
+                input_state, config=config
+            )
+        elif normalized_role == "citizen":
+            print("Routing to Citizen Agent...")
+            result = citizen_app.invoke(
+                input_state, config=config
+            )
+        else:
+            # If role is unrecognized, default to Citizen behavior but log a warning.
+            print(f"Warning: Unrecognized role '{role}' received. Defaulting to Citizen Agent.")
+            result = citizen_app.invoke(
+                input_state, config=config
+            )
 
     # Save messages to database after processing
     from db import save_message
@@ -64,6 +102,10 @@ def route_query(role: str, user_query: str, thread_id: str):
         message.get("role") or message.get("type", "assistant"),  # fallback
         message.get("content", "")
     )
+    # Citation IDs in the saved answer must resolve after a restart
+    from db import save_sources
+    from legal_rag.sources import SOURCE_REGISTRY
+    save_sources([SOURCE_REGISTRY.export(source_id) for source_id in result.get("sources", [])])
 
 
     return result
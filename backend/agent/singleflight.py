@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from legal_rag.tracing import METRICS
+
+COALESCED_REQUESTS = METRICS.counter(
+    "lara_coalesced_requests_total", "Requests answered by attaching to an identical in-flight run."
+)
+
+
+def query_key(role: str, query: str) -> Tuple[str, str]:
+    """Identical queries are detected on a whitespace/case-normalized (role, query) pair."""
+    return ((role or "").strip().lower(), " ".join((query or "").split()).lower())
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the work,
+    later callers wait on the same future and receive the same result (or error).
+    Lives on the event loop, so waiting followers do not hold worker threads.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, coalesced) where coalesced is True for followers."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            COALESCED_REQUESTS.inc(role=key[0] if isinstance(key, tuple) else "")
+            # shield: a follower disconnecting must not cancel the leader's run
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no follower attached
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+
+QUERY_FLIGHTS = SingleFlight()
+METRICS.gauge_callback(
+    "lara_in_flight_queries", "Distinct (role, query) graph runs currently executing.",
+    lambda: {(): QUERY_FLIGHTS.in_flight()},
+)
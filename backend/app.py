@@ -1,13 +1,49 @@
 import uuid
+import json
+from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 
 # --- Import your existing agent router ---
 # This assumes your 'agent' folder is in the same 'backend' directory
 # and your Python path is set up correctly.
 from agent.router import route_query
-from db import save_thread, save_message, get_user_threads, get_thread_messages, delete_thread
+from agent.batch import submit_batch, get_batch_job
+from agent.singleflight import QUERY_FLIGHTS, query_key
+from agent.admission import ADMISSION, Overloaded
+from legal_rag.providers import get_provider_stats
+from legal_rag.web_cache import get_web_cache_stats
+from legal_rag.embeddings import get_embedding_cache_stats
+from legal_rag.sources import SOURCE_REGISTRY
+from legal_rag.tracing import METRICS, start_trace, get_trace
+from legal_rag.pipeline_config import PROFILES, get_profile
+from legal_rag.vector_index import validate_filters
+from legal_rag.index_versions import INDEX
+from legal_rag.usage import request_usage, USER_DAILY_TOKEN_QUOTA
+from db import (
+    save_thread,
+    save_message,
+    get_user_threads,
+    get_thread_messages,
+    get_all_user_threads,
+    get_all_thread_messages,
+    delete_thread,
+    search_messages,
+    record_usage,
+    user_tokens_today,
+    thread_owner,
+    get_usage,
+    get_source as load_source,
+    THREAD_PAGE_SIZE,
+    MAX_THREAD_PAGE_SIZE,
+    MESSAGE_PAGE_SIZE,
+    MAX_MESSAGE_PAGE_SIZE,
+    SEARCH_PAGE_SIZE,
+    MAX_SEARCH_PAGE_SIZE,
+)
 
 # ----------------------------
 #      1. INITIALIZATION
@@ -43,48 +79,186 @@ class QueryRequest(BaseModel):
     user_query: str
     role: str
     thread_id: str
+    profile: Optional[str] = None  # "instant", "balanced" or "deep"; see /profiles
+    filters: Optional[Dict[str, Any]] = None  # e.g. {"doc_type": "statute", "year": [2024, 2025]}
+    user_id: Optional[str] = None  # for token accounting / quotas; else the thread's saved owner
 
 class QueryResponse(BaseModel):
     final_analysis: str
     thread_id: str
+    citations: List[Dict[str, Any]] = []
+    trace_id: str = None
+    coalesced: bool = False
+    profile: str = None
+    degraded: bool = False
+    degradation: Dict[str, Any] = {}
+    index_version: str = None  # FAISS index version the answer was retrieved from
+    usage: Dict[str, Any] = {}  # tokens, LLM calls and cost of the run, per graph node
 
+# Requests without limit/cursor/since get the full list, as before pagination
 class ChatHistoryRequest(BaseModel):
     user_id: str
+    limit: Optional[int] = Field(None, ge=1, le=MAX_THREAD_PAGE_SIZE)  # page size, THREAD_PAGE_SIZE if paging
+    cursor: Optional[str] = None  # next_cursor of the previous page
+    since: Optional[str] = None  # sync_cursor of an earlier response: only threads updated since
 
 class ThreadMessagesRequest(BaseModel):
     thread_id: str
+    limit: Optional[int] = Field(None, ge=1, le=MAX_MESSAGE_PAGE_SIZE)  # page size, MESSAGE_PAGE_SIZE if paging
+    cursor: Optional[str] = None  # next_cursor of the previous page (older messages)
+    since: Optional[str] = None  # sync_cursor of an earlier response: only newer messages
+
+class SearchHistoryRequest(BaseModel):
+    user_id: str
+    query: str
+    limit: int = Field(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE)
+    cursor: Optional[str] = None  # next_cursor of the previous page
+
+class UsageRequest(BaseModel):
+    user_id: Optional[str] = None
+    thread_id: Optional[str] = None  # takes precedence over user_id; neither = everyone
+    days: int = Field(30, ge=1, le=366)
 
 class SaveThreadRequest(BaseModel):
     user_id: str
     thread_id: str
     title: str = None
 
+class BatchQueryItem(BaseModel):
+    user_query: str
+    role: str
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQueryItem] = Field(..., min_length=1)
+
 
 # ----------------------------
 #      3. API ENDPOINTS
 # ----------------------------
 
+@app.on_event("startup")
+def watch_index_versions():
+    """Loads the published index in the background and swaps in newer versions as the indexer publishes them."""
+    INDEX.start_polling()
+
+
 @app.get("/")
 def read_root():
     """A simple endpoint to check if the server is running."""
     return {"message": "Welcome to the L.A.R.A. Backend API"}
 
 
+@app.get("/provider_stats")
+def provider_stats():
+    """Queue depth, wait times and retry counts of the shared Groq and Tavily schedulers, plus cache stats."""
+    stats = get_provider_stats()
+    stats["web_cache"] = get_web_cache_stats()
+    stats["embedding_cache"] = get_embedding_cache_stats()
+    return stats
+
+
+@app.get("/index_version")
+def index_version():
+    """The FAISS index version being served, the published one and how many swaps happened."""
+    return INDEX.stats()
+
+
+@app.get("/profiles")
+def list_profiles():
+    """Available pipeline profiles and what each one trades for latency."""
+    return {"profiles": [p.describe() for p in PROFILES.values()]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: span latency histograms, token and cache counters, provider gauges."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces/{trace_id}")
+def trace_details(trace_id: str):
+    """Spans, token counts and cache events recorded for one recent request."""
+    trace = get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found")
+    return trace.summary()
+
+
+def _run_traced_query(
+    role: str, user_query: str, thread_id: str, profile: str, settings: Dict[str, Any] = None,
+    user_id: str = None,
+):
+    """
+    Runs the agent graph (blocking) inside a fresh trace; returns (result, trace_id).
+    The run's token usage is stored against the thread (and user) that started it.
+    """
+    with start_trace() as trace:
+        try:
+            result = route_query(
+                role=role, user_query=user_query, thread_id=thread_id, settings=settings, profile=profile
+            )
+        finally:
+            # Failed runs still spent their tokens
+            try:
+                record_usage(trace.trace_id, thread_id, trace.summary()["token_usage"], user_id)
+            except Exception as e:
+                print(f"Could not record token usage for thread {thread_id}: {e}")
+    return result, trace.trace_id
+
+
+async def _admitted_query(
+    role: str, user_query: str, thread_id: str, profile: str, filters: Dict[str, Any] = None,
+    user_id: str = None,
+):
+    """Waits for a graph slot, then runs the query with whatever degradation the admission chose."""
+    async with await ADMISSION.admit(role) as admission:
+        if admission.degraded:
+            print(f"---ADMISSION: running thread {thread_id} degraded ({admission.level})---")
+        settings = {**admission.settings, "search_filters": filters} if filters else admission.settings
+        # The graph is blocking, so it runs in the threadpool to keep the event loop free.
+        result, trace_id = await run_in_threadpool(
+            _run_traced_query, role, user_query, thread_id, profile, settings, user_id
+        )
+    return result, trace_id, admission.describe() if admission.degraded else {}
+
+
 @app.post("/process_query", response_model=QueryResponse)
 async def process_legal_query(request: QueryRequest):
     """
     Receives a legal query from the frontend, processes it using the agent router,
     and returns the final analysis.
+    Identical (role, query) requests arriving while one is already running attach to
+    that run instead of starting their own graph execution.
+    Graph runs go through the admission queue: under load they run degraded (fast mode,
+    fewer research cycles, no evaluation) or are rejected with 429 and Retry-After.
     """
     print(f"Received query for thread_id: {request.thread_id}")
+    try:
+        profile = get_profile(request.profile).name
+        validate_filters(request.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user_id = request.user_id or await run_in_threadpool(thread_owner, request.thread_id)
+    if USER_DAILY_TOKEN_QUOTA and user_id:
+        used = await run_in_threadpool(user_tokens_today, user_id)
+        if used >= USER_DAILY_TOKEN_QUOTA:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Daily token quota of {USER_DAILY_TOKEN_QUOTA} reached ({used} used). It resets at 00:00 UTC.",
+            )
+
     try:
         # --- Call your core application logic ---
-        # This is the same function your Streamlit app was calling.
-        result = route_query(
-            role=request.role,
-            user_query=request.user_query,
-            thread_id=request.thread_id,
+        # Runs under different profiles or filters give different answers, so they are not coalesced
+        (result, trace_id, degradation), coalesced = await QUERY_FLIGHTS.do(
+            query_key(request.role, request.user_query) + (profile, json.dumps(request.filters, sort_keys=True)),
+            lambda: _admitted_query(
+                request.role, request.user_query, request.thread_id, profile, request.filters, user_id
+            ),
         )
+        if coalesced:
+            print(f"Coalesced query for thread_id {request.thread_id} onto an in-flight run")
 
         # Extract the final analysis from the result dictionary
         final_analysis = result.get(
@@ -92,15 +266,34 @@ async def process_legal_query(request: QueryRequest):
             "Sorry, I couldn't generate a final analysis."
         )
 
-        # Save messages to database
+        # Save messages to database (always under this request's own thread)
         save_message(request.thread_id, 'user', request.user_query)
         save_message(request.thread_id, 'bot', final_analysis)
 
+        # A coalesced request reports the shared run's usage; it was billed once, to the leader
+        trace = get_trace(trace_id)
+        usage = request_usage(trace) if trace is not None else {}
+
         return QueryResponse(
             final_analysis=final_analysis,
-            thread_id=request.thread_id
+            thread_id=request.thread_id,
+            citations=result.get("citations", []),
+            trace_id=trace_id,
+            coalesced=coalesced,
+            profile=profile,
+            degraded=bool(degradation),
+            degradation=degradation,
+            index_version=INDEX.active_version(),
+            usage=usage,
         )
 
+    except Overloaded as e:
+        print(f"Rejected query for thread_id {request.thread_id}: {e.reason}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"The server is busy ({e.reason}). Please retry in {e.retry_after} seconds.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         # If anything goes wrong in your agent, send back a detailed error
         print(f"An error occurred: {e}")
@@ -109,24 +302,86 @@ async def process_legal_query(request: QueryRequest):
             detail=f"An error occurred while processing your request: {e}"
         )
 
+@app.get("/sources/{source_id}")
+async def get_source(source_id: str):
+    """Resolve a citation: returns the source's location and its passage text."""
+    record = SOURCE_REGISTRY.export(source_id)
+    if record is None:
+        # Cited before a restart: load it from the chat database back into the registry
+        record = load_source(source_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Source '{source_id}' not found")
+        SOURCE_REGISTRY.restore(record)
+    return record
+
 @app.post("/get_chat_history")
 async def get_chat_history(request: ChatHistoryRequest):
-    """Get all threads for a user."""
+    """
+    Get a user's threads, most recently updated first. Without limit/cursor/since all of
+    them ({"threads": [...]}); otherwise one page: `next_cursor` pages further back,
+    `since` returns only the threads updated after an earlier `sync_cursor`.
+    """
     try:
-        threads = get_user_threads(request.user_id)
-        return {"threads": threads}
+        if request.limit is None and not request.cursor and not request.since:
+            return {"threads": await run_in_threadpool(get_all_user_threads, request.user_id)}
+        return await run_in_threadpool(
+            get_user_threads, request.user_id, request.limit or THREAD_PAGE_SIZE, request.cursor, request.since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching chat history: {e}")
 
 @app.post("/get_thread_messages")
 async def get_thread_messages_endpoint(request: ThreadMessagesRequest):
-    """Get all messages for a thread."""
+    """
+    Get a thread's messages, oldest first. Without limit/cursor/since all of them
+    ({"messages": [...]}); otherwise the latest page: `next_cursor` pages back to older
+    messages, `since` returns only the messages after an earlier `sync_cursor`.
+    """
     try:
-        messages = get_thread_messages(request.thread_id)
-        return {"messages": messages}
+        if request.limit is None and not request.cursor and not request.since:
+            return {"messages": await run_in_threadpool(get_all_thread_messages, request.thread_id)}
+        return await run_in_threadpool(
+            get_thread_messages, request.thread_id, request.limit or MESSAGE_PAGE_SIZE, request.cursor, request.since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching thread messages: {e}")
 
+@app.post("/search_history")
+async def search_history(request: SearchHistoryRequest):
+    """
+    Full-text search over one user's messages, best match first, with highlighted
+    snippets. Pass `next_cursor` back as `cursor` to fetch the next page.
+    """
+    try:
+        return await run_in_threadpool(
+            search_messages, request.user_id, request.query, request.limit, request.cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching chat history: {e}")
+
+@app.post("/usage")
+async def token_usage(request: UsageRequest):
+    """
+    Token and cost report over the last `days` days for a thread, a user or everyone:
+    totals, per day, per graph node, and the most expensive requests / threads / users.
+    """
+    try:
+        report = await run_in_threadpool(get_usage, request.user_id, request.thread_id, request.days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching usage: {e}")
+    if request.user_id and USER_DAILY_TOKEN_QUOTA:
+        report["quota"] = {
+            "daily_tokens": USER_DAILY_TOKEN_QUOTA,
+            "used_today": await run_in_threadpool(user_tokens_today, request.user_id),
+        }
+    return report
+
 @app.post("/save_thread")
 async def save_thread_endpoint(request: SaveThreadRequest):
     """Save a thread."""
@@ -145,6 +400,39 @@ async def delete_thread_endpoint(thread_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting thread: {e}")
 
+@app.post("/batch_process")
+async def batch_process(request: BatchRequest):
+    """
+    Submits a list of queries as one offline job. Identical queries are answered once,
+    FAISS retrieval is shared across the batch, and the job runs in the background.
+    Poll /batch_status/{job_id} and download /batch_results/{job_id} when completed.
+    """
+    items = [{"query": q.user_query, "role": q.role} for q in request.queries]
+    job = submit_batch(items)
+    return job.to_status()
+
+@app.get("/batch_status/{job_id}")
+async def batch_status(job_id: str):
+    """Get the progress and throughput of a batch job."""
+    job = get_batch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found")
+    return job.to_status()
+
+@app.get("/batch_results/{job_id}")
+async def batch_results(job_id: str):
+    """Download the results of a completed batch job as JSONL (one line per submitted query)."""
+    job = get_batch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found")
+    if job.status != "completed" or not job.results_path:
+        raise HTTPException(status_code=409, detail=f"Batch job is {job.status}; results are not ready")
+    return FileResponse(
+        job.results_path,
+        media_type="application/x-ndjson",
+        filename=f"batch_{job_id}.jsonl",
+    )
+
 # ----------------------------
 #      4. SERVER EXECUTION (for local testing)
 # ----------------------------
@@ -0,0 +1,119 @@
+"""
+Parity and throughput check for the embedding backends.
+
+Parity: embeds the same texts (golden queries plus passages from the corpus) with the
+PyTorch and the int8 ONNX embedder and reports the per-text cosine agreement between
+the two vectors, plus how often both backends agree on each query's top-5 passages.
+Exits with status 1 if the mean cosine agreement is below --min-cosine.
+
+Throughput: texts/second of each backend at several batch sizes, and process RSS
+after loading each backend.
+
+Usage (from the backend directory, after `python data/export_onnx_embedder.py`):
+    python -m benchmarks.embedder_benchmark
+    python -m benchmarks.embedder_benchmark --passages 2000 --threads 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+from typing import List
+
+import numpy as np
+
+from benchmarks.eval_harness import load_golden_queries
+
+DOCS_PATH = os.path.join("data", "indian_law_docs")
+
+
+def load_passages(limit: int, words: int = 180) -> List[str]:
+    """Fixed-size word windows from the corpus, roughly the size of an index chunk."""
+    passages = []
+    for filename in sorted(os.listdir(DOCS_PATH)):
+        if not filename.endswith(".txt"):
+            continue
+        try:
+            with open(os.path.join(DOCS_PATH, filename), "r", encoding="utf-8") as f:
+                tokens = f.read().split()
+        except UnicodeDecodeError:
+            continue
+        for i in range(0, len(tokens), words * 10):
+            passages.append(" ".join(tokens[i : i + words]))
+            if len(passages) >= limit:
+                return passages
+    return passages
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def throughput(embedder, texts: List[str], batch_sizes: List[int]) -> dict:
+    results = {}
+    embedder.encode(texts[:8])  # warm-up
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        embedder.encode(texts, batch_size=batch_size)
+        results[batch_size] = len(texts) / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the torch and ONNX int8 embedders.")
+    parser.add_argument("--passages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=None, help="Overrides EMBEDDING_THREADS")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    # Must be set before legal_rag.embeddings reads its config
+    if args.threads:
+        os.environ["EMBEDDING_THREADS"] = str(args.threads)
+    from legal_rag.embeddings import create_embedder
+
+    queries = [item["query"] for item in load_golden_queries()]
+    passages = load_passages(args.passages)
+    texts = queries + passages
+    print(f"---EMBEDDER BENCHMARK: {len(queries)} queries, {len(passages)} passages---")
+
+    vectors, speeds, memory = {}, {}, {}
+    for backend in ("torch", "onnx"):
+        rss_before = max_rss_mb()
+        start = time.perf_counter()
+        embedder = create_embedder(backend)
+        load_seconds = time.perf_counter() - start
+        memory[backend] = (max_rss_mb() - rss_before, load_seconds)
+        vectors[backend] = embedder.encode(texts)
+        speeds[backend] = throughput(embedder, passages, args.batch_sizes)
+
+    # Parity: cosine between the two backends' vectors for the same text
+    agreement = np.sum(vectors["torch"] * vectors["onnx"], axis=1)
+    q = len(queries)
+    top_torch = np.argsort(-(vectors["torch"][:q] @ vectors["torch"][q:].T), axis=1)[:, :5]
+    top_onnx = np.argsort(-(vectors["onnx"][:q] @ vectors["onnx"][q:].T), axis=1)[:, :5]
+    top5_overlap = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(top_torch, top_onnx)])
+
+    print("\n--- Parity (torch vs onnx int8) ---")
+    print(f"cosine agreement: mean {agreement.mean():.4f}, min {agreement.min():.4f}, p5 {np.percentile(agreement, 5):.4f}")
+    print(f"top-5 passage overlap per query: {top5_overlap:.2%}")
+
+    print("\n--- Throughput (texts/s) ---")
+    print("batch".ljust(8) + "".join(backend.rjust(10) for backend in speeds))
+    for batch_size in args.batch_sizes:
+        print(str(batch_size).ljust(8) + "".join(f"{speeds[b][batch_size]:10.1f}" for b in speeds))
+
+    print("\n--- Load ---")
+    for backend, (rss_mb, seconds) in memory.items():
+        print(f"{backend}: +{rss_mb:.0f} MB peak RSS, {seconds:.1f}s to load")
+
+    if agreement.mean() < args.min_cosine:
+        print(f"❌ Mean cosine agreement below {args.min_cosine}")
+        sys.exit(1)
+    print("✅ ONNX embedder matches the PyTorch model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Headless benchmark harness for the production pipeline.
+
+Runs a golden query set through the real `route_query` graph, concurrently, and
+records per-node latency, token usage, research cycles and the hybrid confidence
+from `evaluate_analysis`. Results are stored under benchmarks/results/ and can be
+diffed against an earlier run; model_score_checker.py is the dashboard for them.
+
+Usage (from the backend directory):
+    python -m benchmarks.eval_harness --provider offline --parallelism 4
+    python -m benchmarks.eval_harness --profile deep
+    python -m benchmarks.eval_harness --compare benchmarks/results/<previous run>.csv
+"""
+
+import os
+import json
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any
+
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_QUERIES_PATH = os.path.join(BENCHMARKS_DIR, "golden_queries.json")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# Columns that identify a row rather than measure it
+ID_COLUMNS = ["run_id", "profile", "query_id", "role", "query", "status", "error"]
+
+
+# ----------------------------
+#      RUNNING
+# ----------------------------
+
+def load_golden_queries(path: str = GOLDEN_QUERIES_PATH) -> List[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_query(
+    run_id: str, item: Dict[str, str], profile: str = None, settings: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Runs one golden query through route_query and flattens its measurements into a row.
+    `settings` override individual profile settings (e.g. {"reflection_mode": "single"}).
+    """
+    from agent.router import route_query
+    from legal_rag.providers import PRIORITY_BATCH
+    from legal_rag.tracing import start_trace
+
+    row = {
+        "run_id": run_id, "profile": profile or "", "query_id": item["id"],
+        "role": item["role"], "query": item["query"],
+    }
+    start = time.perf_counter()
+    # The request trace carries node spans, LLM spans and token counts for this run
+    with start_trace() as trace:
+        try:
+            result = route_query(
+                role=item["role"],
+                user_query=item["query"],
+                thread_id=f"eval-{run_id}-{item['id']}",
+                priority=PRIORITY_BATCH,
+                profile=profile,
+                settings=settings,
+            )
+            row["status"] = "ok"
+            row["error"] = ""
+        except Exception as e:
+            result = {}
+            row["status"] = "failed"
+            row["error"] = str(e)
+    row["total_seconds"] = round(time.perf_counter() - start, 3)
+
+    metrics = result.get("evaluation_metrics") or {}
+    row["research_cycles"] = result.get("research_cycles", 0)
+    row["sources"] = len(result.get("sources", []))
+    row["confidence"] = metrics.get("confidence")
+    row["llm_score"] = metrics.get("llm_score")
+    row["semantic_confidence"] = metrics.get("semantic_confidence")
+    row["llm_calls"] = sum(1 for s in trace.spans if s["kind"] == "llm")
+    row["input_tokens"] = trace.input_tokens
+    row["output_tokens"] = trace.output_tokens
+    compressions = [s for s in trace.spans if s["kind"] == "compression"]
+    row["compressed_tokens_saved"] = sum(s.get("input_tokens", 0) - s.get("kept_tokens", 0) for s in compressions)
+    node_seconds: Dict[str, float] = {}
+    for s in trace.spans:
+        if s["kind"] == "node":
+            node_seconds[s["name"]] = node_seconds.get(s["name"], 0.0) + s["duration_ms"] / 1000
+    for node, seconds in node_seconds.items():
+        row[f"node_{node}_seconds"] = round(seconds, 3)
+    return row
+
+
+def run_benchmark(
+    queries: List[Dict[str, str]],
+    parallelism: int = 4,
+    run_id: str = None,
+    profile: str = None,
+    settings: Dict[str, Any] = None,
+) -> pd.DataFrame:
+    run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    print(f"---BENCHMARK {run_id}: {len(queries)} queries, parallelism {parallelism}, profile {profile or 'default'}---")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        rows = list(executor.map(lambda item: run_query(run_id, item, profile, settings), queries))
+    elapsed = time.perf_counter() - start
+    print(f"---BENCHMARK {run_id} DONE in {elapsed:.1f}s ({len(queries) / elapsed * 60:.1f} queries/min)---")
+    return pd.DataFrame(rows)
+
+
+# ----------------------------
+#      STORAGE & DIFF
+# ----------------------------
+
+def save_results(df: pd.DataFrame, fmt: str = "csv") -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{df['run_id'].iloc[0]}.{fmt}")
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def load_results(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+
+def list_result_files() -> List[str]:
+    if not os.path.isdir(RESULTS_DIR):
+        return []
+    files = [f for f in os.listdir(RESULTS_DIR) if f.endswith((".csv", ".parquet"))]
+    return [os.path.join(RESULTS_DIR, f) for f in sorted(files, reverse=True)]
+
+
+def diff_runs(baseline: pd.DataFrame, candidate: pd.DataFrame) -> pd.DataFrame:
+    """Per-metric mean/median of both runs and the change, over the queries they share."""
+    shared = sorted(set(baseline["query_id"]) & set(candidate["query_id"]))
+    base = baseline[baseline["query_id"].isin(shared)]
+    cand = candidate[candidate["query_id"].isin(shared)]
+    metrics = [
+        c for c in candidate.columns
+        if c in base.columns and c not in ID_COLUMNS and pd.api.types.is_numeric_dtype(candidate[c])
+    ]
+    rows = []
+    for metric in metrics:
+        rows.append({
+            "metric": metric,
+            "baseline_mean": base[metric].mean(),
+            "candidate_mean": cand[metric].mean(),
+            "delta_mean": cand[metric].mean() - base[metric].mean(),
+            "baseline_median": base[metric].median(),
+            "candidate_median": cand[metric].median(),
+        })
+    return pd.DataFrame(rows).set_index("metric").round(4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the L.A.R.A. pipeline on a golden query set.")
+    parser.add_argument("--queries", default=GOLDEN_QUERIES_PATH, help="JSON list of {id, role, query}")
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--provider", choices=["live", "offline"], default=None,
+                        help="Overrides PROVIDER_MODE for this run")
+    parser.add_argument("--profile", help="Pipeline profile to run (instant, balanced, deep)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--compare", help="Earlier results file to diff this run against")
+    args = parser.parse_args()
+
+    # Must be set before the agents (and their provider clients) are imported
+    if args.provider:
+        os.environ["PROVIDER_MODE"] = args.provider
+
+    df = run_benchmark(load_golden_queries(args.queries), parallelism=args.parallelism, profile=args.profile)
+    path = save_results(df, args.format)
+    print(f"📁 Results saved at: {path}")
+    print(df.drop(columns=["query", "error"]).to_string(index=False))
+
+    if args.compare:
+        print("\n--- Diff against", args.compare, "---")
+        print(diff_runs(load_results(args.compare), df).to_string())
+
+
+if __name__ == "__main__":
+    main()
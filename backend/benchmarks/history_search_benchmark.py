@@ -0,0 +1,158 @@
+"""
+Chat-history search latency: FTS5 (db.search_messages) vs the LIKE scan it replaces.
+
+Builds a synthetic chat database with the real schema, triggers included (so the
+insert rate shows the cost of keeping the FTS index in sync), with message text cut
+from the legal corpus. Then runs the same user-scoped searches both ways and reports
+p50/p95 latency and the number of hits.
+
+Usage (from the backend directory):
+    python -m benchmarks.history_search_benchmark                       # 1M messages
+    python -m benchmarks.history_search_benchmark --messages 100000 --db-path /tmp/history.db
+The database is reused if --db-path already holds one, so repeated runs skip the build.
+"""
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from typing import List
+
+DOCS_PATH = os.path.join("data", "indian_law_docs")
+SEARCHES = [
+    "section 138", "anticipatory bail", "dowry", "cheque dishonour", "article 21",
+    "maintenance wife", "specific performance", "limitation period", "cruelty", "evidence act",
+]
+
+
+def corpus_words(limit: int = 2_000_000) -> List[str]:
+    words = []
+    for filename in sorted(os.listdir(DOCS_PATH)):
+        if not filename.endswith(".txt"):
+            continue
+        try:
+            with open(os.path.join(DOCS_PATH, filename), "r", encoding="utf-8") as f:
+                words.extend(f.read().split())
+        except UnicodeDecodeError:
+            continue
+        if len(words) >= limit:
+            break
+    return words
+
+
+def build_database(db_path: str, messages: int, users: int, messages_per_thread: int, seed: int = 7):
+    import db  # creates the schema (tables, FTS table, triggers) at CHAT_DB_PATH
+
+    rng = random.Random(seed)
+    words = corpus_words()
+    threads = max(1, messages // messages_per_thread)
+    start_time = datetime(2024, 1, 1)
+    print(f"---BUILDING {messages} messages in {threads} threads for {users} users---")
+
+    # db's own connections: the FTS triggers call its message_text() function
+    conn = db._connect()
+    conn.executemany(
+        "INSERT INTO threads (thread_id, user_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"thread-{t}", f"user-{t % users}", f"Chat {t}", start_time, start_time)
+            for t in range(threads)
+        ),
+    )
+
+    def message_rows():
+        for i in range(messages):
+            role = "user" if i % 2 == 0 else "bot"
+            # Questions are short, analyses long
+            length = rng.randint(10, 30) if role == "user" else rng.randint(80, 300)
+            offset = rng.randrange(0, len(words) - length)
+            yield (
+                f"thread-{rng.randrange(threads)}",
+                role,
+                db.CODEC.encode(" ".join(words[offset : offset + length])),
+                start_time + timedelta(seconds=i * 30),
+            )
+
+    started = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO messages (thread_id, role, content, timestamp) VALUES (?, ?, ?, ?)", message_rows()
+    )
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(f"---BUILT in {elapsed:.0f}s ({messages / elapsed:.0f} inserts/s incl. FTS triggers)---")
+
+
+def like_search(user_id: str, query: str, limit: int = 20) -> int:
+    """What a search looks like without FTS: a LIKE per word over the user's messages."""
+    import db
+
+    words = query.split()
+    conditions = " AND ".join("message_text(m.content) LIKE ?" for _ in words)
+    conn = db._connect()
+    rows = conn.execute(
+        f"""
+        SELECT m.id, m.thread_id, m.role, m.timestamp
+        FROM messages m JOIN threads t ON t.thread_id = m.thread_id
+        WHERE t.user_id = ? AND {conditions}
+        ORDER BY m.timestamp DESC
+        LIMIT ?
+        """,
+        [user_id] + [f"%{w}%" for w in words] + [limit],
+    ).fetchall()
+    conn.close()
+    return len(rows)
+
+
+def timed_runs(fn, runs) -> dict:
+    latencies, hits = [], []
+    for args in runs:
+        start = time.perf_counter()
+        hits.append(fn(*args))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "mean_hits": round(statistics.mean(hits), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 history search against LIKE.")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages-per-thread", type=int, default=20)
+    parser.add_argument("--searches", type=int, default=50, help="Searches per method")
+    parser.add_argument("--db-path", default=os.path.join(tempfile.gettempdir(), "lara_history_benchmark.db"))
+    args = parser.parse_args()
+
+    # Must be set before db is imported
+    os.environ["CHAT_DB_PATH"] = args.db_path
+    if not os.path.exists(args.db_path):
+        build_database(args.db_path, args.messages, args.users, args.messages_per_thread)
+    import db
+
+    conn = sqlite3.connect(args.db_path)
+    count = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    users = conn.execute("SELECT COUNT(DISTINCT user_id) FROM threads").fetchone()[0]
+    conn.close()
+    print(f"📚 {count} messages, {users} users, {os.path.getsize(args.db_path) / 1e6:.0f} MB at {args.db_path}")
+
+    rng = random.Random(11)
+    runs = [(f"user-{rng.randrange(users)}", rng.choice(SEARCHES)) for _ in range(args.searches)]
+    fts = timed_runs(lambda user, q: len(db.search_messages(user, q)["results"]), runs)
+    like = timed_runs(lambda user, q: like_search(user, q), runs)
+
+    print()
+    print("method".ljust(9) + "p50 ms".rjust(10) + "p95 ms".rjust(10) + "hits".rjust(8))
+    for name, result in (("fts5", fts), ("like", like)):
+        print(name.ljust(9) + f"{result['p50_ms']:10}" + f"{result['p95_ms']:10}" + f"{result['mean_hits']:8}")
+    print(f"\n🚀 FTS5 p50 speed-up: {like['p50_ms'] / max(fts['p50_ms'], 1e-6):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Load and soak tests for the API.
+
+Drives /process_query, /get_chat_history and /get_thread_messages (plus /save_thread
+when a virtual user opens a new chat) with a mixed workload: virtual users with a
+role each (citizen or lawyer), several threads per user, golden queries as questions,
+and follow-ups in existing threads so MemorySaver checkpoints and the message tables
+keep growing the way they do in production.
+
+Two ways of generating load:
+  closed  --concurrency virtual users, each sending its next request when the previous
+          one has returned (plus think time). Measures capacity.
+  open    requests arrive at --rate per second (Poisson) whether or not earlier ones
+          have finished. Latency is measured from the scheduled arrival, so a stalled
+          server shows up as queueing delay instead of fewer samples.
+
+By default the server is started here (uvicorn, one worker) with PROVIDER_MODE=offline
+and a throwaway chat database, so runs need no API keys and don't touch real data.
+The server's RSS is sampled throughout; a steady climb over a long (soak) run points
+at unbounded growth such as MemorySaver checkpoints.
+
+The report (latency percentiles and histogram per endpoint, status codes, throughput,
+RSS timeline and growth rate) is written to benchmarks/results/load-<time>-<commit>.json.
+Pass an earlier report with --compare to print the change between two commits.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --duration 60 --concurrency 16
+    python -m benchmarks.load_test --mode open --rate 4 --duration 1800 --llm-latency 0.5   # soak
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --server-pid 4242
+    python -m benchmarks.load_test --compare benchmarks/results/load-20250101-120000-abc1234.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.eval_harness import RESULTS_DIR, load_golden_queries
+from legal_rag.tracing import LATENCY_BUCKETS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Share of requests per operation; "query" also covers the /save_thread of new chats
+DEFAULT_MIX = {"query": 0.2, "history": 0.4, "messages": 0.4}
+FOLLOW_UPS = [
+    "Can you explain that in simpler terms?",
+    "Which court judgments support this?",
+    "What is the punishment under that section?",
+    "What should I do next?",
+]
+
+
+# ----------------------------
+#      WORKLOAD
+# ----------------------------
+
+class Workload:
+    """Virtual users, their threads, and the next request to send."""
+
+    def __init__(self, users: int, lawyer_share: float, new_thread_share: float, mix: Dict[str, float],
+                 profile: Optional[str], seed: int = 17):
+        self.rng = random.Random(seed)
+        self.queries = load_golden_queries()
+        self.users = [
+            {"user_id": f"load-{uuid.uuid4().hex[:8]}-{n}",
+             "role": "lawyer" if self.rng.random() < lawyer_share else "citizen",
+             "threads": []}
+            for n in range(users)
+        ]
+        self.new_thread_share = new_thread_share
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.profile = profile
+
+    def next_requests(self) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+        """[(endpoint label, method, path, json body)], sent in order as one user action."""
+        user = self.rng.choice(self.users)
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        if operation != "query" and not user["threads"]:
+            operation = "query"  # nothing to read yet
+
+        if operation == "history":
+            return [("get_chat_history", "POST", "/get_chat_history", {"user_id": user["user_id"]})]
+        if operation == "messages":
+            thread_id = self.rng.choice(user["threads"])
+            return [("get_thread_messages", "POST", "/get_thread_messages", {"thread_id": thread_id})]
+
+        requests = []
+        if not user["threads"] or self.rng.random() < self.new_thread_share:
+            thread_id = f"{user['user_id']}-t{len(user['threads'])}"
+            user["threads"].append(thread_id)
+            query = self.rng.choice(self.queries)["query"]
+            requests.append(("save_thread", "POST", "/save_thread",
+                             {"user_id": user["user_id"], "thread_id": thread_id, "title": query[:60]}))
+        else:
+            thread_id = self.rng.choice(user["threads"])
+            query = self.rng.choice(FOLLOW_UPS)
+        body = {"user_query": query, "role": user["role"], "thread_id": thread_id}
+        if self.profile:
+            body["profile"] = self.profile
+        requests.append(("process_query", "POST", "/process_query", body))
+        return requests
+
+
+# ----------------------------
+#      RECORDING
+# ----------------------------
+
+class Recorder:
+    """Latencies and status codes per endpoint, recorded once the warm-up is over."""
+
+    def __init__(self, record_after: float):
+        self.record_after = record_after
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.dropped = 0
+
+    def record(self, endpoint: str, started: float, latency: float, status: str):
+        if started < self.record_after:
+            return
+        self.latencies.setdefault(endpoint, []).append(latency)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            values = np.array(latencies)
+            statuses = self.statuses[endpoint]
+            ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+            # Cumulative counts per bucket upper bound (seconds), like the /metrics histograms
+            histogram = {str(bound): int((values <= bound).sum()) for bound in LATENCY_BUCKETS}
+            histogram["+Inf"] = len(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "ok": ok,
+                "error_rate": round(1 - ok / len(values), 4),
+                "throughput_rps": round(len(values) / seconds, 3),
+                "p50_ms": round(float(np.percentile(values, 50)) * 1000, 1),
+                "p95_ms": round(float(np.percentile(values, 95)) * 1000, 1),
+                "p99_ms": round(float(np.percentile(values, 99)) * 1000, 1),
+                "max_ms": round(float(values.max()) * 1000, 1),
+                "statuses": statuses,
+                "histogram": histogram,
+            }
+        return endpoints
+
+
+async def send(client: httpx.AsyncClient, recorder: Recorder, requests, started: float):
+    """Sends one user action's requests in order; latency counts from `started`."""
+    for endpoint, method, path, body in requests:
+        try:
+            response = await client.request(method, path, json=body)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = f"error:{type(e).__name__}"
+        now = time.perf_counter()
+        recorder.record(endpoint, started, now - started, status)
+        started = now
+        if not status.startswith("2"):
+            break  # e.g. no point querying a thread whose save failed
+
+
+# ----------------------------
+#      LOAD GENERATION
+# ----------------------------
+
+async def closed_loop(client, workload: Workload, recorder: Recorder, concurrency: int, end: float,
+                      think_seconds: float):
+    async def virtual_user():
+        while time.perf_counter() < end:
+            await send(client, recorder, workload.next_requests(), time.perf_counter())
+            if think_seconds:
+                await asyncio.sleep(workload.rng.expovariate(1 / think_seconds))
+
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+
+
+async def open_loop(client, workload: Workload, recorder: Recorder, rate: float, end: float,
+                    max_in_flight: int):
+    in_flight = set()
+    next_arrival = time.perf_counter()
+    while next_arrival < end:
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if len(in_flight) >= max_in_flight:
+            # The client itself would become the bottleneck; count it instead of queueing forever
+            recorder.dropped += 1
+        else:
+            task = asyncio.create_task(send(client, recorder, workload.next_requests(), next_arrival))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_arrival += workload.rng.expovariate(rate)
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+def read_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process from /proc (Linux); None where that isn't available."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid: Optional[int], samples: List[Dict[str, float]], interval: float, start: float,
+                     recorder: Recorder):
+    while True:
+        rss = read_rss_mb(pid)
+        done = sum(len(latencies) for latencies in recorder.latencies.values())
+        samples.append({"t": round(time.perf_counter() - start, 1), "rss_mb": rss, "requests": done})
+        await asyncio.sleep(interval)
+
+
+def rss_growth_mb_per_min(samples: List[Dict[str, float]]) -> Optional[float]:
+    """Least-squares slope of RSS over the run; the number to watch in soak tests."""
+    points = [(s["t"], s["rss_mb"]) for s in samples if s["rss_mb"] is not None]
+    if len(points) < 3:
+        return None
+    t, rss = np.array(points).T
+    return round(float(np.polyfit(t / 60, rss, 1)[0]), 3)
+
+
+# ----------------------------
+#      SERVER
+# ----------------------------
+
+def start_server(port: int, db_path: str, llm_latency: float, web_latency: float) -> subprocess.Popen:
+    """uvicorn with offline providers; chat database, archive and web cache all in db_path's directory."""
+    scratch_dir = os.path.dirname(db_path)
+    env = {
+        **os.environ,
+        "PROVIDER_MODE": "offline",
+        "CHAT_DB_PATH": db_path,
+        "CHAT_ARCHIVE_DIR": os.path.join(scratch_dir, "chat_archive"),
+        "WEB_CACHE_PATH": os.path.join(scratch_dir, "web_cache.db"),
+        "OFFLINE_LLM_LATENCY_SECONDS": str(llm_latency),
+        "OFFLINE_WEB_LATENCY_SECONDS": str(web_latency),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_ready(url: str, process: Optional[subprocess.Popen], timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} not ready after {timeout}s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ----------------------------
+#      REPORTING
+# ----------------------------
+
+def print_report(report: Dict[str, Any]):
+    print()
+    print("endpoint".ljust(22) + "reqs".rjust(7) + "rps".rjust(8) + "err%".rjust(7)
+          + "p50 ms".rjust(10) + "p95 ms".rjust(10) + "p99 ms".rjust(10))
+    for endpoint, stats in report["endpoints"].items():
+        print(endpoint.ljust(22) + f"{stats['requests']:7}{stats['throughput_rps']:8.2f}"
+              + f"{stats['error_rate'] * 100:7.1f}{stats['p50_ms']:10.1f}{stats['p95_ms']:10.1f}{stats['p99_ms']:10.1f}")
+    rss = [s["rss_mb"] for s in report["rss"] if s["rss_mb"] is not None]
+    if rss:
+        print(f"\n🧠 Server RSS {rss[0]:.0f} -> {rss[-1]:.0f} MB (peak {max(rss):.0f}), "
+              f"growth {report['rss_growth_mb_per_min']} MB/min")
+    if report["dropped"]:
+        print(f"⚠️ {report['dropped']} arrivals dropped at --max-in-flight")
+
+
+def compare_reports(baseline: Dict[str, Any], candidate: Dict[str, Any]):
+    """Relative change per endpoint and metric between two reports (candidate vs baseline)."""
+    print(f"\n📊 {candidate['commit']} vs baseline {baseline['commit']} "
+          f"({baseline['config']['mode']} -> {candidate['config']['mode']} mode)")
+    print("endpoint".ljust(22) + "metric".ljust(16) + "baseline".rjust(12) + "candidate".rjust(12) + "change".rjust(10))
+    for endpoint, stats in candidate["endpoints"].items():
+        base = baseline["endpoints"].get(endpoint)
+        if base is None:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"):
+            change = (stats[metric] - base[metric]) / base[metric] * 100 if base[metric] else float("nan")
+            print(endpoint.ljust(22) + metric.ljust(16) + f"{base[metric]:12}" + f"{stats[metric]:12}"
+                  + f"{change:+9.1f}%")
+    print("rss_growth_mb_per_min".ljust(38) + f"{baseline['rss_growth_mb_per_min']!s:>12}"
+          + f"{candidate['rss_growth_mb_per_min']!s:>12}")
+
+
+# ----------------------------
+#      MAIN
+# ----------------------------
+
+async def run(args, url: str, pid: Optional[int]) -> Dict[str, Any]:
+    mix = dict(DEFAULT_MIX)
+    for part in args.mix.split(",") if args.mix else []:
+        name, share = part.split("=")
+        mix[name.strip()] = float(share)
+    workload = Workload(args.users, args.lawyer_share, args.new_thread_share, mix, args.profile)
+
+    start = time.perf_counter()
+    recorder = Recorder(record_after=start + args.warmup)
+    end = start + args.warmup + args.duration
+    samples: List[Dict[str, float]] = []
+    sampler = asyncio.create_task(sample_rss(pid, samples, args.sample_seconds, start, recorder))
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        if args.mode == "closed":
+            await closed_loop(client, workload, recorder, args.concurrency, end, args.think_seconds)
+        else:
+            await open_loop(client, workload, recorder, args.rate, end, args.max_in_flight)
+    sampler.cancel()
+    samples.append({"t": round(time.perf_counter() - start, 1), "rss_mb": read_rss_mb(pid),
+                    "requests": sum(len(v) for v in recorder.latencies.values())})
+
+    seconds = max(time.perf_counter() - start - args.warmup, 1e-6)
+    commit = git_commit()
+    return {
+        "run_id": f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}",
+        "commit": commit,
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "seconds": round(seconds, 1),
+        "endpoints": recorder.summary(seconds),
+        "dropped": recorder.dropped,
+        "rss": samples,
+        "rss_growth_mb_per_min": rss_growth_mb_per_min(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load / soak test the API with a mixed workload.")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds (after warm-up)")
+    parser.add_argument("--warmup", type=float, default=10, help="Seconds of load before recording starts")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: virtual users in flight")
+    parser.add_argument("--think-seconds", type=float, default=0.0, help="Closed loop: mean pause between actions")
+    parser.add_argument("--rate", type=float, default=2.0, help="Open loop: arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop: client-side cap")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--lawyer-share", type=float, default=0.3)
+    parser.add_argument("--new-thread-share", type=float, default=0.3,
+                        help="Share of queries that start a new thread instead of following up")
+    parser.add_argument("--mix", default=None, help="e.g. query=0.5,history=0.25,messages=0.25")
+    parser.add_argument("--profile", default=None, help="Pipeline profile sent with every query")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--sample-seconds", type=float, default=5, help="RSS sampling interval")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of --url's server, for RSS sampling")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Offline LLM stand-in delay per call (s)")
+    parser.add_argument("--web-latency", type=float, default=0.3, help="Offline web search stand-in delay (s)")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare this run against")
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/<run_id>.json)")
+    args = parser.parse_args()
+
+    process = None
+    db_dir = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.server_pid
+    else:
+        db_dir = tempfile.TemporaryDirectory()
+        process = start_server(args.port, os.path.join(db_dir.name, "chat_load.db"), args.llm_latency, args.web_latency)
+        url, pid = f"http://127.0.0.1:{args.port}", process.pid
+
+    try:
+        print(f"---WAITING for {url}---")
+        wait_until_ready(url, process)
+        print(f"---LOAD: {args.mode} loop for {args.warmup:.0f}s warm-up + {args.duration:.0f}s---")
+        report = asyncio.run(run(args, url, pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if db_dir is not None:
+            db_dir.cleanup()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(RESULTS_DIR, f"{report['run_id']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\n📁 Report saved to {path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
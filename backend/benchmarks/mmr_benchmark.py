@@ -0,0 +1,98 @@
+"""
+Latency and diversity of MMR reranking (legal_rag.vector_index.mmr_select) on
+candidate pools of 50-500 passages.
+
+Candidate pools are synthetic but shaped like the real failure case: a handful of
+documents, each with runs of near-duplicate (overlapping) chunks, and a query close
+to one popular document. For each pool size it reports selection latency p50/p95
+for the vectorized MMR and for LangChain's maximal_marginal_relevance (the
+implementation it replaces), plus how many distinct documents end up in the top-k
+for plain nearest-neighbour ranking, MMR, and MMR with the per-document cap.
+
+Usage (from the backend directory):
+    python -m benchmarks.mmr_benchmark
+    python -m benchmarks.mmr_benchmark --pools 50 100 250 500 --k 8 --cap 2 --dim 768
+"""
+
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+from legal_rag.vector_index import mmr_select
+
+
+def make_pool(rng: np.random.Generator, size: int, dim: int, documents: int):
+    """Chunks of `documents` documents (the first one over-represented) and a query near it."""
+    # Legal passages share a lot of vocabulary: every document is partly the same direction
+    shared = rng.normal(size=dim).astype(np.float32)
+    centers = (shared + rng.normal(size=(documents, dim))).astype(np.float32)
+    # Half the pool comes from the popular document, the rest spread over the others
+    groups = np.where(rng.random(size) < 0.5, 0, rng.integers(1, documents, size))
+    vectors = centers[groups] + rng.normal(scale=0.35, size=(size, dim)).astype(np.float32)
+    query = centers[0] + rng.normal(scale=0.8, size=dim).astype(np.float32)
+    return query, vectors, groups.tolist()
+
+
+def timed(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return result, statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized MMR selection.")
+    parser.add_argument("--pools", type=int, nargs="+", default=[50, 100, 200, 500])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--cap", type=int, default=2, help="Per-document cap")
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--documents", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+    except ImportError:
+        maximal_marginal_relevance = None
+        print("langchain_community not installed: skipping the LangChain baseline")
+
+    rng = np.random.default_rng(3)
+    print(
+        "pool".ljust(6) + "mmr p50".rjust(10) + "mmr p95".rjust(10) + "lc p50".rjust(10) + "lc p95".rjust(10)
+        + "docs@k top".rjust(12) + "mmr".rjust(6) + "mmr+cap".rjust(9)
+    )
+    for size in args.pools:
+        query, vectors, groups = make_pool(rng, size, args.dim, args.documents)
+
+        plain = np.argsort(-(vectors @ query))[: args.k]
+        mmr, _, _ = timed(lambda: mmr_select(query, vectors, args.k, args.lambda_mult), args.runs)
+        capped, p50, p95 = timed(
+            lambda: mmr_select(query, vectors, args.k, args.lambda_mult, groups=groups, per_group_cap=args.cap),
+            args.runs,
+        )
+        if maximal_marginal_relevance is not None:
+            _, lc_p50, lc_p95 = timed(
+                lambda: maximal_marginal_relevance(query, list(vectors), args.lambda_mult, args.k), args.runs
+            )
+            baseline = f"{lc_p50:10.3f}{lc_p95:10.3f}"
+        else:
+            baseline = "-".rjust(10) * 2
+
+        def distinct(selection):
+            return len({groups[i] for i in selection})
+
+        print(
+            str(size).ljust(6) + f"{p50:10.3f}{p95:10.3f}" + baseline
+            + f"{distinct(plain):12}{distinct(mmr):6}{distinct(capped):9}"
+        )
+    print("\nLatencies in ms; docs@k = distinct documents among the k selected passages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Latency SLO check for the pipeline profiles.
+
+Runs the golden query set once per profile through the benchmark harness and compares
+each profile's p95 end-to-end latency against its `latency_slo_seconds`. Exits with
+status 1 if any profile misses its SLO, so it can gate a CI job.
+
+Usage (from the backend directory):
+    python -m benchmarks.profile_slo --provider offline
+    python -m benchmarks.profile_slo --profiles instant balanced --parallelism 2
+"""
+
+import os
+import sys
+import argparse
+from typing import List
+
+import pandas as pd
+
+from benchmarks.eval_harness import GOLDEN_QUERIES_PATH, load_golden_queries, run_benchmark, save_results
+
+
+def check_slos(profiles: List[str], queries, parallelism: int = 4) -> pd.DataFrame:
+    """One benchmark run per profile; returns a row per profile with p50/p95 and the verdict."""
+    from legal_rag.pipeline_config import get_profile
+
+    rows = []
+    for name in profiles:
+        profile = get_profile(name)
+        df = run_benchmark(queries, parallelism=parallelism, profile=profile.name)
+        path = save_results(df)
+        ok = df[df["status"] == "ok"]
+        p95 = ok["total_seconds"].quantile(0.95) if len(ok) else float("nan")
+        rows.append({
+            "profile": profile.name,
+            "queries": len(df),
+            "failed": int((df["status"] != "ok").sum()),
+            "p50_seconds": round(ok["total_seconds"].median(), 2) if len(ok) else float("nan"),
+            "p95_seconds": round(p95, 2),
+            "slo_seconds": profile.latency_slo_seconds,
+            # Failed queries count against the SLO as well
+            "met": bool(len(ok) == len(df) and p95 <= profile.latency_slo_seconds),
+            "results": path,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    from legal_rag.pipeline_config import PROFILES
+
+    parser = argparse.ArgumentParser(description="Check per-profile latency SLOs on the golden query set.")
+    parser.add_argument("--queries", default=GOLDEN_QUERIES_PATH, help="JSON list of {id, role, query}")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--provider", choices=["live", "offline"], default=None,
+                        help="Overrides PROVIDER_MODE for this run")
+    args = parser.parse_args()
+
+    if args.provider:
+        os.environ["PROVIDER_MODE"] = args.provider
+
+    report = check_slos(args.profiles, load_golden_queries(args.queries), parallelism=args.parallelism)
+    print(report.drop(columns=["results"]).to_string(index=False))
+
+    missed = report[~report["met"]]["profile"].tolist()
+    if missed:
+        print(f"❌ SLO missed for: {', '.join(missed)}")
+        sys.exit(1)
+    print("✅ All profiles within their latency SLO")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the two reflection modes of the research loop on the golden query set.
+
+"multi" is the original design: every research cycle summarizes the FAISS results,
+summarizes the web results, then reflects on the two summaries (up to three LLM calls
+per cycle). "single" makes one call over the raw, word-budgeted evidence and gets the
+reflection back as validated JSON, falling back to "multi" if the reply does not parse.
+
+Reports, per mode: LLM calls per query and per research cycle, input/output tokens,
+time spent in the summarize_and_reflect node and end-to-end latency, plus the
+confidence score so a saving is not bought with a worse answer.
+
+Usage (from the backend directory):
+    python -m benchmarks.reflection_benchmark --provider offline
+    python -m benchmarks.reflection_benchmark --profile deep --parallelism 2
+"""
+
+import os
+import argparse
+
+import pandas as pd
+
+from benchmarks.eval_harness import GOLDEN_QUERIES_PATH, load_golden_queries, run_benchmark, save_results
+
+MODES = ("multi", "single")
+
+
+def summarize_mode(mode: str, df: pd.DataFrame) -> dict:
+    ok = df[df["status"] == "ok"]
+    cycles = ok["research_cycles"].clip(lower=1)
+    # Citizen and lawyer graphs name their reflection node differently
+    reflect_columns = [c for c in ok.columns if c.startswith("node_summarize_and_reflect")]
+    return {
+        "mode": mode,
+        "queries": len(df),
+        "failed": int((df["status"] != "ok").sum()),
+        "llm_calls": round(ok["llm_calls"].mean(), 2),
+        "llm_calls_per_cycle": round((ok["llm_calls"] / cycles).mean(), 2),
+        "input_tokens": round(ok["input_tokens"].mean()),
+        "output_tokens": round(ok["output_tokens"].mean()),
+        "reflect_node_seconds": round(ok[reflect_columns].fillna(0).sum(axis=1).mean(), 3),
+        "p50_seconds": round(ok["total_seconds"].median(), 2),
+        "p95_seconds": round(ok["total_seconds"].quantile(0.95), 2),
+        "confidence": round(ok["confidence"].mean(), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-call vs single-call reflection.")
+    parser.add_argument("--queries", default=GOLDEN_QUERIES_PATH, help="JSON list of {id, role, query}")
+    parser.add_argument("--profile", default="balanced", help="Pipeline profile both modes run under")
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--provider", choices=["live", "offline"], default=None,
+                        help="Overrides PROVIDER_MODE for this run")
+    args = parser.parse_args()
+
+    # Must be set before the agents (and their provider clients) are imported
+    if args.provider:
+        os.environ["PROVIDER_MODE"] = args.provider
+
+    queries = load_golden_queries(args.queries)
+    rows = []
+    for mode in MODES:
+        df = run_benchmark(
+            queries, parallelism=args.parallelism, profile=args.profile,
+            settings={"reflection_mode": mode},
+        )
+        print(f"📁 {mode} results saved at: {save_results(df)}")
+        rows.append(summarize_mode(mode, df))
+
+    report = pd.DataFrame(rows).set_index("mode")
+    print("\n--- Reflection modes ---")
+    print(report.T.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Sharded vs single FAISS index: build time, search latency and recall.
+
+Embeds the corpus chunks once, then builds hash-sharded indexes (1, 4 and 16 shards
+by default) from the same vectors, so only the index layout differs between runs.
+For sample queries it reports per-query search p50/p95 through ShardedIndex.search
+(parallel fan-out + heap merge) and the top-k overlap with the single index, which
+should be 100% - sharding changes where vectors live, not the exact L2 ranking.
+
+Usage (from the backend directory):
+    python -m benchmarks.shard_benchmark
+    python -m benchmarks.shard_benchmark --shards 1 2 8 --queries 200 --k 10
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.eval_harness import load_golden_queries
+from legal_rag.embeddings import get_embedder
+from legal_rag.vector_index import IndexShard, ShardedIndex
+
+sys.path.insert(0, os.path.join("data", "faiss_index"))
+from faiss_indexer import get_text_splitter, load_documents, shard_name  # noqa: E402
+
+
+def build_index(chunks, vectors, embeddings, shards: int) -> ShardedIndex:
+    groups = {}
+    for chunk, vector in zip(chunks, vectors):
+        groups.setdefault(shard_name(chunk, "hash", shards), []).append((chunk, vector))
+    index_shards = []
+    for name, members in sorted(groups.items()):
+        store = FAISS.from_embeddings(
+            [(chunk.page_content, vector) for chunk, vector in members],
+            embeddings,
+            metadatas=[chunk.metadata for chunk, _ in members],
+        )
+        index_shards.append(IndexShard(name, store))
+    return ShardedIndex(index_shards, embeddings, "hash")
+
+
+def run_queries(index: ShardedIndex, queries, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([(doc.metadata["source"], doc.page_content) for _, doc in hits])
+    latencies.sort()
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded FAISS search against a single index.")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    embeddings = get_embedder()
+    print("---LOADING corpus---")
+    chunks = get_text_splitter("legal").split_documents(load_documents())
+    print(f"---EMBEDDING {len(chunks)} chunks (once, shared by every layout)---")
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    print(f"Embedded in {time.perf_counter() - start:.1f}s")
+
+    # Golden queries, topped up with passages from the chunks themselves
+    queries = [item["query"] for item in load_golden_queries()]
+    rng = random.Random(5)
+    while len(queries) < args.queries:
+        queries.append(" ".join(rng.choice(chunks).page_content.split()[:30]))
+    queries = queries[: args.queries]
+    # Warm the query-embedding cache so every layout measures search only
+    for query in queries:
+        embeddings.embed_query(query)
+
+    baseline = None
+    rows = []
+    for shards in sorted(args.shards):
+        start = time.perf_counter()
+        index = build_index(chunks, vectors, embeddings, shards)
+        build_s = time.perf_counter() - start
+        run_queries(index, queries[:5], args.k)  # warm-up
+        latencies, results = run_queries(index, queries, args.k)
+        if baseline is None:
+            baseline = results
+        overlap = statistics.mean(
+            len(set(got) & set(expected)) / max(len(expected), 1) for got, expected in zip(results, baseline)
+        )
+        rows.append((len(index.shards), build_s, latencies, overlap))
+
+    print()
+    print("shards".ljust(8) + "build s".rjust(10) + "p50 ms".rjust(10) + "p95 ms".rjust(10) + "top-k overlap".rjust(15))
+    for shards, build_s, latencies, overlap in rows:
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(str(shards).ljust(8) + f"{build_s:10.2f}" + f"{p50:10.2f}" + f"{p95:10.2f}" + f"{overlap:14.0%}")
+
+
+if __name__ == "__main__":
+    main()
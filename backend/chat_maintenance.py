@@ -0,0 +1,63 @@
+"""
+Maintenance jobs for the chat history database (run from cron or by hand).
+
+    python chat_maintenance.py stats                 # compression ratio, archive and free space
+    python chat_maintenance.py train-dict            # train a zstd dictionary on recent bot messages
+    python chat_maintenance.py compress              # re-encode old rows with the current dictionary
+    python chat_maintenance.py archive --days 90     # move stale threads to compressed segments
+    python chat_maintenance.py vacuum                # reclaim free pages (full VACUUM the first time)
+    python chat_maintenance.py prune-usage --days 90 # drop old per-request token rows (rollups stay)
+
+A typical schedule: `archive` and `prune-usage` nightly, `train-dict` + `compress` once there are a few
+thousand analyses (and then every few months), `vacuum` weekly.
+"""
+
+import argparse
+import json
+
+import db
+
+
+def vacuum():
+    conn = db._connect()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()['auto_vacuum'] != 2:
+        # Databases created before incremental vacuum need one full rebuild to switch
+        print("⚙️ Converting to auto_vacuum=INCREMENTAL with a full VACUUM...")
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    else:
+        conn.execute('PRAGMA incremental_vacuum').fetchall()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat history database maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats")
+    train = commands.add_parser("train-dict")
+    train.add_argument("--samples", type=int, default=2000)
+    commands.add_parser("compress")
+    archive = commands.add_parser("archive")
+    archive.add_argument("--days", type=int, default=db.ARCHIVE_AFTER_DAYS)
+    commands.add_parser("vacuum")
+    prune = commands.add_parser("prune-usage")
+    prune.add_argument("--days", type=int, default=db.USAGE_DETAIL_DAYS)
+    args = parser.parse_args()
+
+    if args.command == "train-dict":
+        print(f"✅ Trained dictionary {db.train_compression_dictionary(args.samples)}; run `compress` to apply it to stored rows")
+    elif args.command == "compress":
+        print(f"✅ Re-encoded {db.recompress_messages()} messages")
+    elif args.command == "archive":
+        result = db.archive_stale_threads(args.days)
+        print(f"✅ Archived {result['threads']} threads ({result['messages']} messages) to {result['segment']}")
+    elif args.command == "vacuum":
+        vacuum()
+        print("✅ Free pages reclaimed")
+    elif args.command == "prune-usage":
+        print(f"✅ Deleted {db.prune_usage_details(args.days)} token usage rows older than {args.days} days")
+    print(json.dumps(db.storage_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
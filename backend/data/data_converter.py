@@ -1,63 +1,218 @@
 import os
 import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fitz  # PyMuPDF
 
-
-def convert_pdfs_to_txt(source_dir: str, dest_dir: str):
-    """Converts all PDF files in a source directory to text files."""
+# Records the fingerprint of every converted input so unchanged files are skipped on re-runs
+MANIFEST_NAME = ".conversion_manifest.json"
+JSON_READ_CHUNK = 1 << 20  # 1 MiB
+
+
+# ----------------------------
+#      HELPERS
+# ----------------------------
+
+def _sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(dest_dir: str) -> dict:
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(dest_dir: str, manifest: dict):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def iter_json_array(path: str, chunk_size: int = JSON_READ_CHUNK):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading the file in
+    chunks so that large Q&A dumps never have to be loaded into memory at once.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf.startswith("["):
+            raise ValueError("expected a top-level JSON array")
+        # Decode in place from idx; the consumed prefix is only dropped when refilling
+        idx, eof = 1, False
+        while True:
+            idx = _skip_whitespace(buf, idx)
+            if buf.startswith(",", idx):
+                idx = _skip_whitespace(buf, idx + 1)
+            if buf.startswith("]", idx):
+                return
+            try:
+                item, end = decoder.raw_decode(buf, idx)
+                # A number cut off at the end of the buffer still decodes; read on to be sure
+                complete = eof or end < len(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                more = f.read(chunk_size)
+                eof = not more
+                buf, idx = buf[idx:] + more, 0
+                continue
+            yield item
+            idx = end
+
+
+def _skip_whitespace(buf: str, idx: int) -> int:
+    while idx < len(buf) and buf[idx] in " \t\n\r":
+        idx += 1
+    return idx
+
+
+# ----------------------------
+#      WORKERS (run in the process pool)
+# ----------------------------
+
+def _convert_pdf(pdf_path: str, txt_path: str) -> int:
+    """
+    Streams page text straight to the .txt file and writes a .pages.json sidecar with
+    the character offsets of every page (matching the `start_index` of indexed chunks).
+    Returns the number of pages converted.
+    """
+    pages = []
+    offset = 0
+    with fitz.open(pdf_path) as doc, open(txt_path + ".tmp", "w", encoding="utf-8") as f:
+        for number, page in enumerate(doc, start=1):
+            text = page.get_text("text")
+            f.write(text)
+            pages.append({"page": number, "start": offset, "end": offset + len(text)})
+            offset += len(text)
+
+    os.replace(txt_path + ".tmp", txt_path)
+    with open(os.path.splitext(txt_path)[0] + ".pages.json", "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+    return len(pages)
+
+
+def _convert_json(json_path: str, txt_path: str) -> int:
+    """Streams Q&A pairs from a JSON array to text. Returns the number of pairs written."""
+    count = 0
+    with open(txt_path + ".tmp", "w", encoding="utf-8") as f:
+        for entry in iter_json_array(json_path):
+            if isinstance(entry, dict) and "question" in entry and "answer" in entry:
+                f.write(f"Question: {entry['question']}\nAnswer: {entry['answer']}\n\n")
+                count += 1
+    os.replace(txt_path + ".tmp", txt_path)
+    return count
+
+
+def _convert_file(kind: str, src_path: str, txt_path: str, previous: dict) -> dict:
+    """Converts one input unless its content hash matches the previous conversion."""
+    stat = os.stat(src_path)
+    fingerprint = {"mtime": stat.st_mtime, "size": stat.st_size}
+    digest = _sha1(src_path)
+    if previous.get("sha1") == digest and os.path.exists(txt_path):
+        # Touched but not modified: only the recorded mtime needs refreshing
+        return {"status": "unchanged", "units": 0, "sha1": digest, **fingerprint}
+
+    start = time.perf_counter()
+    units = _convert_pdf(src_path, txt_path) if kind == "pdf" else _convert_json(src_path, txt_path)
+    return {
+        "status": "converted",
+        "units": units,
+        "seconds": time.perf_counter() - start,
+        "sha1": digest,
+        **fingerprint,
+    }
+
+
+# ----------------------------
+#      DRIVER
+# ----------------------------
+
+def _convert_directory(kind: str, source_dir: str, dest_dir: str, workers: int = None):
+    extension = ".pdf" if kind == "pdf" else ".json"
+    unit = "pages" if kind == "pdf" else "Q&A pairs"
+    manifest = _load_manifest(dest_dir)
+
+    jobs = []
+    skipped = 0
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.lower().endswith(extension):
+            continue
+        src_path = os.path.join(source_dir, filename)
+        txt_path = os.path.join(dest_dir, os.path.splitext(filename)[0] + ".txt")
+        previous = manifest.get(filename, {})
+        stat = os.stat(src_path)
+        if (
+            previous.get("mtime") == stat.st_mtime
+            and previous.get("size") == stat.st_size
+            and os.path.exists(txt_path)
+        ):
+            skipped += 1
+            continue
+        jobs.append((filename, src_path, txt_path, previous))
+
+    start = time.perf_counter()
+    total_units = 0
+    converted = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_convert_file, kind, src_path, txt_path, previous): filename
+            for filename, src_path, txt_path, previous in jobs
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                print(f"⚠️ Error converting '{filename}': {e}")
+                continue
+
+            status = outcome.pop("status")
+            total_units += outcome.pop("units")
+            seconds = outcome.pop("seconds", None)
+            manifest[filename] = outcome
+            if status == "unchanged":
+                skipped += 1
+            else:
+                converted += 1
+                print(f"✅ Converted: {filename} ({seconds:.2f}s)")
+
+    _save_manifest(dest_dir, manifest)
+    elapsed = time.perf_counter() - start
+    rate = total_units / elapsed if elapsed > 0 else 0.0
+    print(
+        f"📊 {converted} file(s) converted, {skipped} unchanged skipped, "
+        f"{total_units} {unit} in {elapsed:.1f}s ({rate:.1f} {unit}/s)"
+    )
+
+
+def convert_pdfs_to_txt(source_dir: str, dest_dir: str, workers: int = None):
+    """Converts all PDF files in a source directory to text files, in parallel."""
     print("--- Converting PDF files to text... ---")
     if not os.path.exists(source_dir):
         print(f"❌ Source directory '{source_dir}' not found. Please place your PDF files here.")
         return
-
-    for filename in os.listdir(source_dir):
-        if filename.lower().endswith(".pdf"):
-            pdf_path = os.path.join(source_dir, filename)
-            txt_filename = os.path.splitext(filename)[0] + ".txt"
-            txt_path = os.path.join(dest_dir, txt_filename)
-
-            try:
-                doc = fitz.open(pdf_path)
-                text_content = ""
-                for page in doc:
-                    text_content += page.get_text("text")
-
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(text_content)
-
-                print(f"✅ Converted: {filename} → {txt_filename}")
-            except Exception as e:
-                print(f"⚠️ Error converting '{filename}': {e}")
+    _convert_directory("pdf", source_dir, dest_dir, workers)
 
 
-def convert_json_to_txt(source_dir: str, dest_dir: str):
-    """Converts all JSON files with Q&A pairs to text files."""
+def convert_json_to_txt(source_dir: str, dest_dir: str, workers: int = None):
+    """Converts all JSON files with Q&A pairs to text files, in parallel."""
     print("--- Converting JSON files to text... ---")
     if not os.path.exists(source_dir):
         print(f"⚠️ Source directory '{source_dir}' not found. Skipping JSON conversion.")
         return
-
-    for filename in os.listdir(source_dir):
-        if filename.lower().endswith(".json"):
-            json_path = os.path.join(source_dir, filename)
-            txt_filename = os.path.splitext(filename)[0] + ".txt"
-            txt_path = os.path.join(dest_dir, txt_filename)
-
-            try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                text_content = ""
-                for entry in data:
-                    if "question" in entry and "answer" in entry:
-                        text_content += f"Question: {entry['question']}\nAnswer: {entry['answer']}\n\n"
-
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(text_content)
-
-                print(f"✅ Converted JSON: {filename} → {txt_filename}")
-            except Exception as e:
-                print(f"⚠️ Error converting '{filename}': {e}")
+    _convert_directory("json", source_dir, dest_dir, workers)
 
 
 if __name__ == "__main__":
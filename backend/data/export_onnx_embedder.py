@@ -0,0 +1,65 @@
+"""
+Exports all-MiniLM-L6-v2 to ONNX and quantizes it to int8 for EMBEDDING_BACKEND=onnx.
+
+Writes model.onnx (fp32), model_int8.onnx (dynamic int8 quantization of the linear
+layers) and tokenizer.json into data/models/all-MiniLM-L6-v2-int8/. Needs torch,
+transformers and onnxruntime, and is only needed once per machine or model change.
+
+Usage (from the backend directory):
+    python data/export_onnx_embedder.py
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from legal_rag.embeddings import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR  # noqa: E402
+
+
+def export(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = ONNX_MODEL_DIR):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"⚙️ Exporting {model_name} to ONNX...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+
+    sample = tokenizer(["An example legal query about bail"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=14,
+        )
+
+    print("⚙️ Quantizing to int8...")
+    int8_path = os.path.join(output_dir, "model_int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    for path in (fp32_path, int8_path):
+        print(f"✅ {os.path.basename(path)}: {os.path.getsize(path) / 1e6:.1f} MB")
+    print(f"📁 Saved at: {os.path.abspath(output_dir)}")
+    print("🚀 Set EMBEDDING_BACKEND=onnx to use it, and check parity with benchmarks/embedder_benchmark.py")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the MiniLM embedder to int8 ONNX.")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    export(output_dir=args.output_dir)
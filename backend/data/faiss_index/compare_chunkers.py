@@ -0,0 +1,115 @@
+"""
+Compares the structure-aware legal chunker with the previous CharacterTextSplitter on
+our corpus: chunk count and size, redundant (overlapping) text, FAISS index size on
+disk and retrieval hit-rate.
+
+Hit-rate is measured on passages sampled from the documents themselves: each sampled
+sentence is used as a query, and it counts as a hit if one of the top-k chunks comes
+from the same document and covers the sentence's position. That checks whether a
+chunking keeps passages retrievable, independently of the rest of the pipeline.
+
+Usage (from the backend directory):
+    python data/faiss_index/compare_chunkers.py
+    python data/faiss_index/compare_chunkers.py --max-docs 10 --queries-per-doc 5 --output report.json
+"""
+
+import os
+import re
+import json
+import time
+import random
+import argparse
+import tempfile
+from langchain_community.vectorstores import FAISS
+
+from faiss_indexer import CHUNKERS, get_text_splitter, load_documents
+from legal_rag.embeddings import get_embedder
+
+SENTENCE_RE = re.compile(r"[A-Z][^.?!]{60,400}[.?!]")
+
+
+def sample_queries(documents, per_doc: int, seed: int = 13):
+    """(source, query text, character offset) for sentences sampled from every document."""
+    rng = random.Random(seed)
+    queries = []
+    for doc in documents:
+        candidates = [
+            m for m in SENTENCE_RE.finditer(doc.page_content)
+            if "Indian Kanoon" not in m.group(0) and 12 <= len(m.group(0).split()) <= 60
+        ]
+        for match in rng.sample(candidates, min(per_doc, len(candidates))):
+            queries.append((doc.metadata["source"], " ".join(match.group(0).split()), match.start()))
+    return queries
+
+
+def _chunk_end(doc) -> int:
+    return doc.metadata.get("end_index") or doc.metadata["start_index"] + len(doc.page_content)
+
+
+def evaluate_chunker(name, documents, queries, embeddings, k: int):
+    start = time.perf_counter()
+    chunks = get_text_splitter(name).split_documents(documents)
+    split_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    db = FAISS.from_documents(chunks, embeddings)
+    embed_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        db.save_local(tmp)
+        index_bytes = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+
+    hits = 0
+    reciprocal_ranks = 0.0
+    for source, query, offset in queries:
+        results = db.similarity_search(query, k=k)
+        for rank, doc in enumerate(results, start=1):
+            if doc.metadata.get("source") == source and doc.metadata["start_index"] <= offset < _chunk_end(doc):
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+
+    corpus_chars = sum(len(doc.page_content) for doc in documents)
+    chunk_chars = [len(chunk.page_content) for chunk in chunks]
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "mean_chunk_chars": round(sum(chunk_chars) / len(chunks)),
+        "max_chunk_chars": max(chunk_chars),
+        # > 1.0 means text is stored more than once (overlap); < 1.0 means furniture was dropped
+        "indexed_chars_ratio": round(sum(chunk_chars) / corpus_chars, 3),
+        "index_mb": round(index_bytes / 1e6, 2),
+        "split_seconds": round(split_seconds, 2),
+        "embed_seconds": round(embed_seconds, 1),
+        f"hit_rate@{k}": round(hits / len(queries), 3) if queries else None,
+        "mrr": round(reciprocal_ranks / len(queries), 3) if queries else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunkers on the legal corpus.")
+    parser.add_argument("--max-docs", type=int, default=None, help="Only use the first N documents")
+    parser.add_argument("--queries-per-doc", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    documents = load_documents()[: args.max_docs]
+    queries = sample_queries(documents, args.queries_per_doc)
+    print(f"\n📚 {len(documents)} documents, {len(queries)} sampled queries")
+
+    embeddings = get_embedder()
+    report = [evaluate_chunker(name, documents, queries, embeddings, args.k) for name in CHUNKERS]
+
+    columns = list(report[0])
+    print("\n" + " | ".join(columns))
+    for row in report:
+        print(" | ".join(str(row[c]) for c in columns))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📁 Report saved at: {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
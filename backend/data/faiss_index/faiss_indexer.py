@@ -1,12 +1,54 @@
 import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import CharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings  # ✅ updated import
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from legal_chunker import LegalChunker, detect_document_type
+
+# The summary step uses the app's LLM providers (legal_rag), which live in backend/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from legal_rag.index_versions import (  # noqa: E402
+    FAISS_INDEX_PATH,
+    VERSIONS_DIR,
+    SUMMARIES_FILE,
+    SUMMARY_INDEX_DIR,
+    new_version_id,
+    read_current,
+    version_dir,
+    publish_version,
+    prune_versions,
+)
+from legal_rag.vector_index import SHARD_MANIFEST, find_manifest  # noqa: E402
 
 # Define paths
 DOCS_PATH = "data/indian_law_docs"
-FAISS_INDEX_PATH = "data/faiss_index"
+SHARDS_DIR = "shards"
+
+# Sections are runs of whole lines of up to this many words, summarized once each
+SECTION_WORDS = 1500
+SUMMARY_WORKERS = 4
+
+# "legal": structure-aware chunker (legal_chunker.py); "character": the previous fixed-size splitter
+CHUNKERS = ("legal", "character")
+DEFAULT_CHUNKER = os.getenv("INDEX_CHUNKER", "legal")
+
+# Documents are split into independently built shards (a document never spans two):
+# "doc_type": statute / judgment / generic; "year": year in the file name;
+# "hash": INDEX_SHARDS even buckets by source path; "none": a single shard
+SHARD_STRATEGIES = ("doc_type", "year", "hash", "none")
+DEFAULT_SHARD_BY = os.getenv("INDEX_SHARD_BY", "doc_type")
+DEFAULT_SHARDS = int(os.getenv("INDEX_SHARDS", "4"))
+
+YEAR_RE = re.compile(r"(?<!\d)(19|20)\d{2}(?!\d)")
 
 
 def extract_case_metadata(filename: str, text: str):
@@ -18,24 +60,130 @@ def extract_case_metadata(filename: str, text: str):
     for token in ["IPC", "CrPC", "Article", "Section"]:
         if token.lower() in text.lower():
             sections.append(token)
-    return {"case_name": case_name, "keywords": sections}
+    # Judgment and Act file names end with the date / year ("..._on_2_May_2025", "..._Act_2025")
+    years = [m.group(0) for m in YEAR_RE.finditer(case_name)]
+    return {
+        "case_name": case_name,
+        "keywords": sections,
+        "doc_type": detect_document_type(text),
+        "year": int(years[-1]) if years else None,
+    }
+
+
+def split_sections(text: str, max_words: int = SECTION_WORDS):
+    """Groups whole lines into sections of at most ~max_words; returns (start, end) char offsets."""
+    sections = []
+    start = 0
+    words = 0
+    position = 0
+    for line in text.split("\n"):
+        line_words = len(line.split())
+        if words and words + line_words > max_words:
+            sections.append((start, position))
+            start, words = position, 0
+        words += line_words
+        position += len(line) + 1
+    if start < len(text):
+        sections.append((start, len(text)))
+    return sections
+
 
+def _summarize(llm, text: str, label: str) -> str:
+    from langchain.prompts import PromptTemplate
+    from legal_rag.providers import invoke_llm
 
-def create_faiss_index():
+    prompt = PromptTemplate(
+        template=f"""Summarize the following {label} of an Indian legal document (<150 words).
+        Name the acts, sections, parties, holdings and judgments it covers.
+
+        Text: {{text}}
+
+        Summary:""",
+        input_variables=["text"],
+    )
+    result = invoke_llm(prompt | llm, {"text": " ".join(text.split()[:2500])})
+    return getattr(result, "content", str(result)).strip()
+
+
+def summarize_document(llm, doc: Document) -> dict:
+    """Per-section summaries plus a document summary built from them."""
+    text = doc.page_content
+    sections = []
+    for start, end in split_sections(text):
+        sections.append({"start": start, "end": end, "summary": _summarize(llm, text[start:end], "section")})
+    if len(sections) <= 1:
+        summary = sections[0]["summary"] if sections else ""
+    else:
+        summary = _summarize(llm, "\n".join(s["summary"] for s in sections), "set of section summaries")
+    return {
+        "title": doc.metadata.get("case_name"),
+        "content_hash": hashlib.sha1(text.encode("utf-8")).hexdigest(),
+        "summary": summary,
+        "sections": sections,
+    }
+
+
+def build_summaries(documents, embeddings, output_dir: str, previous_dir: str = None):
     """
-    Processes legal documents, creates embeddings, and saves a FAISS index with metadata.
+    Precomputes document and section summaries (reused from the previous version for
+    unchanged documents) and builds the document-summary index used as the first
+    level of retrieval, both into output_dir.
     """
-    print("⚖️ Starting the FAISS index creation process...")
-    documents = []
+    from legal_rag.providers import get_llm, request_priority, PRIORITY_BATCH
 
-    if not os.path.exists(DOCS_PATH):
-        print(f"❌ Error: Directory '{DOCS_PATH}' not found. Please add legal documents.")
-        return
+    try:
+        with open(os.path.join(previous_dir, SUMMARIES_FILE), "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, TypeError):
+        previous = {}
 
-    # 1️⃣ Load documents
-    for filename in os.listdir(DOCS_PATH):
+    summaries = {}
+    pending = []
+    for doc in documents:
+        source = doc.metadata["source"]
+        content_hash = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        if previous.get(source, {}).get("content_hash") == content_hash:
+            summaries[source] = previous[source]
+        else:
+            pending.append(doc)
+    print(f"📝 Summarizing {len(pending)} documents ({len(summaries)} unchanged, reused)...")
+
+    llm = get_llm()
+
+    def summarize(doc):
+        # Index-time work must not delay interactive requests sharing the provider limits
+        with request_priority(PRIORITY_BATCH):
+            return doc.metadata["source"], summarize_document(llm, doc)
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        for source, entry in executor.map(summarize, pending):
+            summaries[source] = entry
+            print(f"✅ Summarized: {os.path.basename(source)} ({len(entry['sections'])} sections)")
+
+    with open(os.path.join(output_dir, SUMMARIES_FILE), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+    summary_docs = [
+        Document(page_content=entry["summary"], metadata={"source": source, "case_name": entry["title"]})
+        for source, entry in summaries.items()
+    ]
+    FAISS.from_documents(summary_docs, embeddings).save_local(os.path.join(output_dir, SUMMARY_INDEX_DIR))
+    print(f"📁 Summaries of {len(summaries)} documents saved")
+
+
+def get_text_splitter(chunker: str = DEFAULT_CHUNKER):
+    if chunker == "character":
+        # add_start_index keeps each chunk's character offset for source citations
+        return CharacterTextSplitter(chunk_size=1000, chunk_overlap=100, add_start_index=True)
+    return LegalChunker()
+
+
+def load_documents(docs_path: str = DOCS_PATH):
+    """Loads every .txt document with its case metadata."""
+    documents = []
+    for filename in sorted(os.listdir(docs_path)):
         if filename.endswith(".txt"):
-            file_path = os.path.join(DOCS_PATH, filename)
+            file_path = os.path.join(docs_path, filename)
             try:
                 loader = TextLoader(file_path, encoding="utf-8")
                 loaded_docs = loader.load()
@@ -49,33 +197,183 @@ def create_faiss_index():
                 print(f"✅ Loaded: {filename}")
             except Exception as e:
                 print(f"⚠️ Skipping '{filename}' due to error: {e}")
+    return documents
+
+
+def shard_name(doc: Document, shard_by: str, shards: int = DEFAULT_SHARDS) -> str:
+    if shard_by == "doc_type":
+        return doc.metadata["doc_type"]
+    if shard_by == "year":
+        return str(doc.metadata["year"] or "undated")
+    if shard_by == "hash":
+        digest = hashlib.sha1(doc.metadata["source"].encode("utf-8")).hexdigest()
+        return f"h{int(digest, 16) % shards:02d}"
+    return "all"
+
+
+def embedding_tag(embeddings) -> str:
+    """Model and backend of the embedder; vectors from different ones must never share an index."""
+    from legal_rag.embeddings import EMBEDDING_MODEL_NAME
+    return f"{EMBEDDING_MODEL_NAME}:{embeddings.backend}"
+
+
+def _fingerprint(documents, chunker: str, embedding: str) -> str:
+    """
+    Changes whenever a shard's documents, the chunker or the embedding model/backend
+    change; unchanged shards are reused.
+    """
+    digest = hashlib.sha1(f"{chunker}|{embedding}".encode("utf-8"))
+    for doc in sorted(documents, key=lambda d: d.metadata["source"]):
+        digest.update(doc.metadata["source"].encode("utf-8"))
+        digest.update(hashlib.sha1(doc.page_content.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def _copy_shard(source_dir: str, target_dir: str):
+    """Reuses a shard of the previous version; hard links, since versions are never modified."""
+    os.makedirs(target_dir)
+    for filename in os.listdir(source_dir):
+        try:
+            os.link(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+        except OSError:
+            shutil.copy2(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+
+
+def build_shards(
+    documents, embeddings, chunker: str, shard_by: str, shards: int, output_dir: str, previous_dir: str = None
+):
+    """
+    Splits the documents into shards and builds one FAISS index per shard under
+    <output_dir>/shards/. Shards whose documents did not change since the previous
+    version are carried over from it instead of being embedded again.
+    Returns the manifest entries of the shards.
+    """
+    try:
+        with open(find_manifest(previous_dir), "r", encoding="utf-8") as f:
+            previous = {info["name"]: info for info in json.load(f)["shards"]}
+    except (FileNotFoundError, TypeError, KeyError):
+        previous = {}
+
+    groups = {}
+    for doc in documents:
+        groups.setdefault(shard_name(doc, shard_by, shards), []).append(doc)
+
+    splitter = get_text_splitter(chunker)
+    entries = []
+    for name, shard_docs in sorted(groups.items()):
+        path = os.path.join(SHARDS_DIR, name)
+        fingerprint = _fingerprint(shard_docs, chunker, embedding_tag(embeddings))
+        old = previous.get(name)
+        if old and old["fingerprint"] == fingerprint and os.path.isdir(os.path.join(previous_dir, old["path"])):
+            print(f"♻️ Shard '{name}' unchanged ({old['chunks']} chunks), reusing it")
+            _copy_shard(os.path.join(previous_dir, old["path"]), os.path.join(output_dir, path))
+            entries.append({**old, "path": path})
+            continue
+
+        chunks = splitter.split_documents(shard_docs)
+        print(f"🧩 Shard '{name}': {len(shard_docs)} documents, {len(chunks)} chunks. Embedding...")
+        FAISS.from_documents(chunks, embeddings).save_local(os.path.join(output_dir, path))
+        entries.append({
+            "name": name,
+            "path": path,
+            "fingerprint": fingerprint,
+            "chunks": len(chunks),
+            "sources": sorted(doc.metadata["source"] for doc in shard_docs),
+            # Lets the server skip whole shards for a query's metadata filters
+            "doc_types": sorted({chunk.metadata.get("doc_type") for chunk in chunks} - {None}),
+            "years": sorted({chunk.metadata.get("year") for chunk in chunks} - {None}),
+        })
+    return entries
+
+
+def create_faiss_index(
+    with_summaries: bool = True,
+    chunker: str = DEFAULT_CHUNKER,
+    shard_by: str = DEFAULT_SHARD_BY,
+    shards: int = DEFAULT_SHARDS,
+):
+    """
+    Processes legal documents, creates embeddings, and saves a FAISS index with metadata.
+    With summaries, also precomputes per-document/per-section summaries and a summary index.
+
+    Each build is a new immutable version under data/faiss_index/versions/<version>/,
+    written to a hidden staging directory first and published by atomically replacing
+    the CURRENT pointer. A running server keeps answering from the previous version
+    until it has loaded and warmed this one, so a rebuild never touches files in use.
+    """
+    print("⚖️ Starting the FAISS index creation process...")
+
+    if not os.path.exists(DOCS_PATH):
+        print(f"❌ Error: Directory '{DOCS_PATH}' not found. Please add legal documents.")
+        return
+
+    # 1️⃣ Load documents
+    documents = load_documents()
 
     if not documents:
         print(f"⚠️ No valid text documents found in '{DOCS_PATH}'.")
         return
 
     print(f"\n📚 Total documents loaded: {len(documents)}")
-    print("🧩 Splitting into smaller chunks...")
-
-    # 2️⃣ Split documents for better embedding context
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = text_splitter.split_documents(documents)
+    print(f"🧩 Building shards by {shard_by} ({chunker} chunker)...")
 
-    print(f"✅ Split into {len(docs)} chunks. Generating embeddings...")
+    version = new_version_id()
+    previous = read_current()
+    previous_dir = version_dir(previous) if previous else None
+    staging_dir = os.path.join(FAISS_INDEX_PATH, VERSIONS_DIR, f".{version}.tmp")
+    os.makedirs(staging_dir)
+    print(f"🏗️ Building index version {version} (previous: {previous})")
 
-    # 3️⃣ Use legal-domain-tuned embeddings for better accuracy
+    # 2️⃣ Same embedder (and backend) as query time, so index and query vectors match
     # You can switch to "law-ai/InLegalBERT" if you have GPU or want Indian law-specific tuning
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    from legal_rag.embeddings import get_embedder
+    embeddings = get_embedder()
+
+    # 3️⃣ Split each shard's documents along sections / numbered paragraphs, embed and save
+    entries = build_shards(documents, embeddings, chunker, shard_by, shards, staging_dir, previous_dir)
+    print(f"✅ {len(entries)} shards, {sum(e['chunks'] for e in entries)} chunks in total")
+
+    # 4️⃣ Index-time summaries for two-level retrieval and reflection prompts
+    if with_summaries:
+        build_summaries(documents, embeddings, staging_dir, previous_dir)
 
-    # 4️⃣ Create FAISS index and save
-    db = FAISS.from_documents(docs, embeddings)
-    os.makedirs(FAISS_INDEX_PATH, exist_ok=True)
-    db.save_local(FAISS_INDEX_PATH)
+    # 5️⃣ Manifest, then publish: rename the finished directory, then swap the pointer
+    manifest = {
+        "version": version,
+        "previous": previous,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "chunker": chunker,
+        "embedding": embedding_tag(embeddings),
+        "shard_by": shard_by,
+        "documents": len(documents),
+        "shards": entries,
+        "summaries": SUMMARIES_FILE if with_summaries else None,
+    }
+    with open(os.path.join(staging_dir, SHARD_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging_dir, version_dir(version))
+    publish_version(version)
+    removed = prune_versions()
 
     print("\n🎯 FAISS index created successfully!")
-    print(f"📁 Saved at: {os.path.abspath(FAISS_INDEX_PATH)}")
+    print(f"📁 Version {version} saved at: {os.path.abspath(version_dir(version))}")
+    if removed:
+        print(f"🧹 Removed old versions: {', '.join(removed)}")
     print("🚀 You can now run your main app to query the legal cases.")
 
 
 if __name__ == "__main__":
-    create_faiss_index()
+    parser = argparse.ArgumentParser(description="Build the FAISS index of the legal documents.")
+    parser.add_argument("--skip-summaries", action="store_true",
+                        help="Only build the chunk index, without precomputed summaries")
+    parser.add_argument("--provider", choices=["live", "offline"], default=None,
+                        help="LLM used for summaries; 'offline' uses the local stand-in")
+    parser.add_argument("--chunker", choices=CHUNKERS, default=DEFAULT_CHUNKER)
+    parser.add_argument("--shard-by", choices=SHARD_STRATEGIES, default=DEFAULT_SHARD_BY)
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Number of shards for --shard-by hash")
+    args = parser.parse_args()
+    if args.provider:
+        os.environ["PROVIDER_MODE"] = args.provider
+    create_faiss_index(
+        with_summaries=not args.skip_summaries, chunker=args.chunker, shard_by=args.shard_by, shards=args.shards
+    )
@@ -0,0 +1,251 @@
+"""
+Structure-aware chunker for the Indian law corpus.
+
+Statutes are cut at Chapter/Part and Section boundaries (oversized sections at their
+sub-sections), judgments at their numbered paragraphs, everything else at blank lines.
+Oversized pieces fall back to sentence boundaries, tiny fragments are merged into a
+neighbour, and page furniture (Indian Kanoon headers, page numbers) is dropped.
+Every chunk gets a hierarchical ID such as "ch2/s7/ss3" or "para12-para14", unique
+within its document (repeats of the same structure get a "~2", "~3" suffix).
+"""
+
+import re
+import bisect
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+
+MAX_CHUNK_CHARS = 1500
+# Pieces shorter than this are merged into a neighbour instead of standing alone
+MIN_CHUNK_CHARS = 300
+
+CHAPTER_RE = re.compile(r"^(chapter|part)\s+([IVXLCDM]+|\d+[A-Z]?)\b", re.I)
+NUMBERED_RE = re.compile(r"^(\d{1,4}[A-Z]{0,3})\.\s*\S")
+SUBSECTION_RE = re.compile(r"(?:^|(?<=[.;:\-—–]))\s*\((\d{1,3}[A-Z]?)\)")
+SENTENCE_RE = re.compile(r"(?<=[.?!;])\s+")
+FURNITURE_RE = re.compile(r"^(Indian Kanoon - http\S*|\d{1,4}|\((?:[ivxl]+)\)|•)$", re.I)
+
+
+def detect_document_type(text: str, title: str = "") -> str:
+    """'statute', 'judgment' or 'generic', from the enacting formula and the title line."""
+    head = text[:20000]
+    first_line = title or text.strip().split("\n", 1)[0]
+    # The enacting formula is often glued to the preceding word ("theretoBe it enacted")
+    if re.search(r"be\s+it\s+enacted\b", head, re.I):
+        return "statute"
+    if re.search(r"\b(vs\.?|versus)\b", first_line, re.I) or re.search(r"IN THE (HIGH|SUPREME) COURT", head[:5000], re.I):
+        return "judgment"
+    return "generic"
+
+
+@dataclass
+class _Unit:
+    """A structural unit (section, paragraph, block) with the original offsets of its kept lines."""
+    label: str
+    chapter: str
+    kind: str
+    segments: List[Tuple[int, str]] = field(default_factory=list)  # (original offset, line text)
+
+    @property
+    def text(self) -> str:
+        return "".join(line for _, line in self.segments)
+
+    def original_offset(self, clean_offset: int) -> int:
+        """Maps an offset in `text` (furniture removed) back to the original document."""
+        starts, position = [], 0
+        for _, line in self.segments:
+            starts.append(position)
+            position += len(line)
+        i = max(0, bisect.bisect_right(starts, clean_offset) - 1)
+        return self.segments[i][0] + (clean_offset - starts[i])
+
+
+@dataclass
+class _Piece:
+    text: str
+    start: int
+    end: int
+    labels: List[str]
+    chapter: str
+    kind: str
+    heading: str
+
+
+class LegalChunker:
+    """Drop-in replacement for the LangChain text splitter used by the indexer."""
+
+    def __init__(self, max_chars: int = MAX_CHUNK_CHARS, min_chars: int = MIN_CHUNK_CHARS):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+
+    # ---- structure ----
+    def _units(self, text: str, doc_type: str) -> List[_Unit]:
+        title = text.strip().split("\n", 1)[0].strip()
+        units: List[_Unit] = []
+        chapter = ""
+        current = _Unit(label="preamble", chapter="", kind="preamble")
+        blocks = 0
+
+        def close():
+            if current.text.strip():
+                units.append(current)
+
+        offset = 0
+        for line in text.splitlines(keepends=True):
+            line_start, offset = offset, offset + len(line)
+            stripped = line.strip()
+            if not stripped:
+                if doc_type == "generic" and current.text.strip():
+                    close()
+                    blocks += 1
+                    current = _Unit(label=f"b{blocks}", chapter=chapter, kind="block")
+                continue
+            # Page headers repeat the title; page numbers and source URLs carry no content
+            if FURNITURE_RE.match(stripped) or (stripped == title and current.segments):
+                continue
+
+            chapter_match = CHAPTER_RE.match(stripped) if doc_type != "judgment" else None
+            numbered = NUMBERED_RE.match(stripped) if doc_type != "generic" else None
+            if chapter_match:
+                close()
+                chapter = f"{'ch' if chapter_match.group(1).lower() == 'chapter' else 'pt'}{chapter_match.group(2)}"
+                current = _Unit(label=chapter, chapter=chapter, kind="heading")
+            elif numbered:
+                close()
+                prefix = "s" if doc_type == "statute" else "para"
+                current = _Unit(label=f"{prefix}{numbered.group(1)}", chapter=chapter, kind="section")
+            current.segments.append((line_start, line))
+        close()
+        return units
+
+    def _split_points(self, text: str, doc_type: str) -> List[Tuple[int, Optional[str]]]:
+        """Candidate cut positions inside an oversized unit: sub-sections first, then sentences."""
+        points = {}
+        if doc_type == "statute":
+            for match in SUBSECTION_RE.finditer(text):
+                if match.start(1) > 1:
+                    points[match.start(1) - 1] = f"ss{match.group(1)}"
+        for match in SENTENCE_RE.finditer(text):
+            points.setdefault(match.end(), None)
+        return sorted(points.items())
+
+    def _spans(self, text: str, doc_type: str) -> List[Tuple[int, int, Optional[str]]]:
+        """
+        Cuts an oversized unit into (start, end, label) spans of at most max_chars, packing
+        whole sub-sections where possible and falling back to sentence boundaries.
+        """
+        if len(text) <= self.max_chars:
+            return [(0, len(text), None)]
+        # Continuation pieces are prefixed with the unit heading, which counts towards the limit
+        limit = self.max_chars - len(text.strip().split("\n", 1)[0][:120]) - len(" (contd.)\n")
+        spans = []
+        start, label = 0, None
+        last_subsection = last_sentence = None
+        for position, point_label in self._split_points(text, doc_type) + [(len(text), None)]:
+            while position - start > limit:
+                if last_subsection and last_subsection[0] - start >= self.min_chars:
+                    cut, next_label = last_subsection
+                elif last_sentence:
+                    cut, next_label = last_sentence
+                else:
+                    # No boundary inside the window: cut at the last space
+                    space = text.rfind(" ", start + 1, start + limit)
+                    cut = space if space > start else start + limit
+                    next_label = None
+                spans.append((start, cut, label))
+                start, label = cut, next_label
+                last_subsection = last_sentence = None
+            if position > start:
+                if point_label:
+                    last_subsection = (position, point_label)
+                last_sentence = (position, point_label)
+        if start < len(text):
+            spans.append((start, len(text), label))
+        return spans
+
+    def _pieces(self, unit: _Unit, doc_type: str) -> List[_Piece]:
+        text = unit.text
+        heading = text.strip().split("\n", 1)[0][:120]
+        spans = self._spans(text, doc_type)
+
+        pieces = []
+        for i, (start, end, label) in enumerate(spans):
+            piece_text = text[start:end].strip()
+            if not piece_text:
+                continue
+            # Labels are relative to the chapter, which _chunk_id prefixes once
+            local = "" if unit.kind == "heading" else unit.label
+            if len(spans) > 1:
+                local = "/".join(part for part in (local, label or f"p{i + 1}") if part)
+            labels = [local] if local else []
+            if i > 0:
+                piece_text = f"{heading} (contd.)\n{piece_text}"
+            pieces.append(_Piece(
+                text=piece_text,
+                start=unit.original_offset(start),
+                end=unit.original_offset(max(start, end - 1)) + 1,
+                labels=labels,
+                chapter=unit.chapter,
+                kind=unit.kind,
+                heading=heading,
+            ))
+        return pieces
+
+    # ---- merging ----
+    def _merge(self, pieces: List[_Piece]) -> List[_Piece]:
+        merged: List[_Piece] = []
+        for piece in pieces:
+            previous = merged[-1] if merged else None
+            if (
+                previous is not None
+                and len(previous.text) + len(piece.text) + 1 <= self.max_chars
+                and (len(previous.text) < self.min_chars or len(piece.text) < self.min_chars)
+                # Stay inside one chapter; a chapter heading joins its own first section only
+                and previous.chapter == piece.chapter
+            ):
+                previous.text = f"{previous.text}\n{piece.text}"
+                previous.end = piece.end
+                previous.labels.extend(piece.labels)
+                if previous.kind == "heading":
+                    previous.kind, previous.chapter, previous.heading = piece.kind, piece.chapter, piece.heading
+                continue
+            merged.append(piece)
+        return merged
+
+    @staticmethod
+    def _chunk_id(piece: _Piece) -> str:
+        labels = piece.labels
+        local = labels[0] if len(set(labels)) == 1 else f"{labels[0]}-{labels[-1]}" if labels else ""
+        return "/".join(part for part in (piece.chapter, local) if part) or "preamble"
+
+    # ---- public ----
+    def split_text(self, text: str, title: str = "") -> List[_Piece]:
+        doc_type = detect_document_type(text, title)
+        pieces = []
+        for unit in self._units(text, doc_type):
+            pieces.extend(self._pieces(unit, doc_type))
+        return self._merge(pieces)
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            doc_type = detect_document_type(text)
+            seen = {}
+            for piece in self.split_text(text):
+                # Repeated structure (a table of contents, a re-numbered schedule) reuses labels:
+                # later occurrences get a ~n suffix so (source, chunk_id) stays unique
+                chunk_id = self._chunk_id(piece)
+                seen[chunk_id] = seen.get(chunk_id, 0) + 1
+                if seen[chunk_id] > 1:
+                    chunk_id = f"{chunk_id}~{seen[chunk_id]}"
+                metadata = dict(doc.metadata)
+                metadata.update({
+                    "start_index": piece.start,
+                    "end_index": piece.end,
+                    "chunk_id": chunk_id,
+                    "heading": piece.heading,
+                    "doc_type": doc_type,
+                })
+                chunks.append(Document(page_content=piece.text, metadata=metadata))
+        return chunks
@@ -1,15 +1,54 @@
 import sqlite3
 import os
-from typing import List, Dict, Any
-from datetime import datetime
+import json
+import base64
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from legal_rag.tracing import traced
+from legal_rag.usage import cost_usd
+from message_codec import CODEC
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'chat_history.db')
+DB_PATH = os.getenv("CHAT_DB_PATH", os.path.join(os.path.dirname(__file__), 'chat_history.db'))
+
+# Cold storage: threads untouched for ARCHIVE_AFTER_DAYS move their messages into
+# compressed segment files here, and are rehydrated when opened again
+ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), 'chat_archive'))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Threads per archive batch; writers wait on the write lock while a batch is archived
+ARCHIVE_BATCH_THREADS = 100
+
+# Space freed by deletes/archival is returned to the OS a few MB at a time
+VACUUM_FREELIST_PAGES = 1024
+VACUUM_PAGES_PER_RUN = 2048
+
+# Keyset pagination of the sidebar thread list and of a thread's messages
+THREAD_PAGE_SIZE = 50
+MAX_THREAD_PAGE_SIZE = 200
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+# Bot messages are 5-10 KB each; a page stops early once its content reaches this
+MESSAGE_PAGE_MAX_CHARS = int(os.getenv("MESSAGE_PAGE_MAX_CHARS", "200000"))
+
+# Full-text search over messages
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+SNIPPET_TOKENS = 16
+
+# Token accounting: per-request detail rows are kept this long (rollups forever)
+USAGE_DETAIL_DAYS = int(os.getenv("USAGE_DETAIL_DAYS", "90"))
+USAGE_TOP_N = 10
+# Rollup rows with this node hold the whole request's totals (and the request count)
+USAGE_TOTAL_NODE = '*'
 
 def init_db():
     """Initialize the database and create tables if they don't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
 
+    # Only takes effect on a new database; existing ones are converted by a full
+    # VACUUM (python chat_maintenance.py vacuum)
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
     # Create threads table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS threads (
@@ -34,92 +73,857 @@ def init_db():
         )
     ''')
 
+    # Trained zstd dictionaries; rows keep the id of the one they were compressed with
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Where an archived thread's messages live: a byte range of a segment file
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS thread_archive (
+            thread_id TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            message_count INTEGER NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (thread_id) REFERENCES threads (thread_id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Composite indexes backing the keyset pagination (and the per-user join of search)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_threads_user_updated
+        ON threads (user_id, updated_at, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_thread_timestamp
+        ON messages (thread_id, timestamp, id)
+    ''')
+
+    # Full-text index over message content. External content: the text lives only in
+    # `messages`, the FTS table holds just the index, kept in sync by the triggers below.
+    # Content may be stored compressed, so the index reads it through message_text().
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS messages_text AS
+        SELECT id, message_text(content) AS content FROM messages
+    ''')
+    fts = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    ).fetchone()
+    if fts and 'messages_text' not in fts['sql']:
+        # Index from before compression, reading messages.content directly
+        cursor.executescript('''
+            DROP TRIGGER IF EXISTS messages_fts_insert;
+            DROP TRIGGER IF EXISTS messages_fts_delete;
+            DROP TRIGGER IF EXISTS messages_fts_update;
+            DROP TABLE messages_fts;
+        ''')
+        fts = None
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content,
+            content='messages_text',
+            content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    ''')
+    cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, message_text(new.content));
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content)
+            VALUES ('delete', old.id, message_text(old.content));
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages
+        WHEN message_text(old.content) IS NOT message_text(new.content) BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content)
+            VALUES ('delete', old.id, message_text(old.content));
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, message_text(new.content));
+        END;
+    ''')
+    if not fts:
+        # Existing databases: index the messages written before the FTS table existed
+        cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+    # LLM token usage: one detail row per (request, graph node, model)...
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trace_id TEXT NOT NULL,
+            thread_id TEXT NOT NULL,
+            node TEXT NOT NULL,
+            model TEXT NOT NULL,
+            input_tokens INTEGER NOT NULL,
+            output_tokens INTEGER NOT NULL,
+            calls INTEGER NOT NULL,
+            cost_usd REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_llm_usage_thread_created
+        ON llm_usage (thread_id, created_at)
+    ''')
+    # ...and running totals per (thread, UTC day, node), updated in the same transaction,
+    # so per-user / per-thread reports and quota checks never scan the detail rows.
+    # No foreign key: usage outlives deleted threads. user_id is '' until the frontend
+    # saves the thread, then filled in by save_thread.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS usage_rollup (
+            thread_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            node TEXT NOT NULL,
+            user_id TEXT NOT NULL DEFAULT '',
+            requests INTEGER NOT NULL DEFAULT 0,
+            input_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            calls INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (thread_id, day, node)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usage_rollup_user_day
+        ON usage_rollup (user_id, day, node)
+    ''')
+
+    # Passages behind the citations of saved answers (the in-memory registry is lost on
+    # restart). Keyed by source ID, shared by all threads that cite the same passage.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sources (
+            source_id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            url TEXT,
+            file TEXT,
+            title TEXT,
+            start INTEGER,
+            "end" INTEGER,
+            content_hash TEXT NOT NULL,
+            content NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+    for row in cursor.execute('SELECT id, data FROM compression_dicts ORDER BY id'):
+        CODEC.add_dictionary(row['id'], row['data'])
+
     conn.commit()
     conn.close()
 
+# ------------------------------
+# Connections & Pagination
+# ------------------------------
+def _dict_row(cursor, row):
+    """Row factory: plain dicts keyed by column name, ready for JSON responses."""
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = _dict_row
+    # Off by default in SQLite; needed for ON DELETE CASCADE to actually cascade
+    conn.execute('PRAGMA foreign_keys = ON')
+    # Used by the FTS view and triggers to read (possibly compressed) content
+    conn.create_function('message_text', 1, CODEC.decode, deterministic=True)
+    return conn
+
+def _load_dictionary(dictionary_id: int) -> Optional[bytes]:
+    # Dictionaries trained by another process (e.g. chat_maintenance.py) after startup
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute('SELECT data FROM compression_dicts WHERE id = ?', (dictionary_id,)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+CODEC.dictionary_loader = _load_dictionary
+
+def _reclaim_space(conn: sqlite3.Connection):
+    """Incremental vacuum once enough pages are free (a no-op unless auto_vacuum=INCREMENTAL)."""
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()['freelist_count']
+    if free_pages >= VACUUM_FREELIST_PAGES:
+        conn.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_RUN})').fetchall()
+
+def _without_id(row: Dict[str, Any]) -> Dict[str, Any]:
+    # The integer id is only a pagination tie-breaker; clients address rows by thread_id
+    row.pop('id', None)
+    return row
+
+def _encode_cursor(values: list) -> str:
+    """Opaque pagination cursor: the sort key of the last row of a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+# ------------------------------
+# Threads & Messages
+# ------------------------------
+@traced("sqlite")
 def save_thread(user_id: str, thread_id: str, title: str = None):
     """Save or update a thread."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
 
+    # An upsert, not INSERT OR REPLACE: with foreign keys on, REPLACE deletes the old
+    # row first, and the delete would cascade to the thread's messages
     cursor.execute('''
-        INSERT OR REPLACE INTO threads (thread_id, user_id, title, updated_at)
+        INSERT INTO threads (thread_id, user_id, title, updated_at)
         VALUES (?, ?, ?, ?)
+        ON CONFLICT (thread_id) DO UPDATE SET
+            user_id = excluded.user_id, title = excluded.title, updated_at = excluded.updated_at
     ''', (thread_id, user_id, title or f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}", datetime.now()))
+    # Tokens spent before the thread was saved (its first answer) now count for the user
+    cursor.execute('''
+        UPDATE usage_rollup SET user_id = ? WHERE thread_id = ? AND user_id != ?
+    ''', (user_id, thread_id, user_id))
 
     conn.commit()
     conn.close()
 
+@traced("sqlite")
 def save_message(thread_id: str, role: str, content: str):
     """Save a message to the database."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
 
+    # The frontend saves the thread after its first answer, so the row may not exist
+    # yet; a placeholder keeps the foreign key satisfied until save_thread fills it in
+    cursor.execute('''
+        INSERT OR IGNORE INTO threads (thread_id, user_id) VALUES (?, '')
+    ''', (thread_id,))
+    # A conversation picked up again after archival continues in the hot table
+    _rehydrate_if_archived(conn, thread_id)
     cursor.execute('''
         INSERT INTO messages (thread_id, role, content)
         VALUES (?, ?, ?)
-    ''', (thread_id, role, content))
+    ''', (thread_id, role, CODEC.encode(content)))
+    # A new message moves the thread to the top of the sidebar and into the next sync
+    cursor.execute('''
+        UPDATE threads SET updated_at = ? WHERE thread_id = ?
+    ''', (datetime.now(), thread_id))
 
     conn.commit()
     conn.close()
 
-def get_user_threads(user_id: str) -> List[Dict[str, Any]]:
-    """Get all threads for a user."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+@traced("sqlite")
+def save_sources(records: List[Dict[str, Any]]):
+    """Persists source records (SourceRegistry.export format); already stored IDs are kept."""
+    rows = [
+        (r['id'], r['type'], r.get('url'), r.get('file'), r.get('title'), r.get('start'), r.get('end'),
+         r['content_hash'], CODEC.encode(r['content']))
+        for r in records if r
+    ]
+    if not rows:
+        return
+    conn = _connect()
+    conn.executemany('''
+        INSERT OR IGNORE INTO sources (source_id, type, url, file, title, start, "end", content_hash, content)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
 
-    cursor.execute('''
-        SELECT thread_id, title, created_at, updated_at
-        FROM threads
-        WHERE user_id = ?
-        ORDER BY updated_at DESC
-    ''', (user_id,))
+@traced("sqlite")
+def get_source(source_id: str) -> Optional[Dict[str, Any]]:
+    """A persisted source in SourceRegistry.export format, or None."""
+    conn = _connect()
+    row = conn.execute('SELECT * FROM sources WHERE source_id = ?', (source_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    row['id'] = row.pop('source_id')
+    row.pop('created_at')
+    row['content'] = CODEC.decode(row['content'])
+    return row
 
-    threads = []
-    for row in cursor.fetchall():
-        threads.append({
-            'thread_id': row[0],
-            'title': row[1],
-            'created_at': row[2],
-            'updated_at': row[3]
-        })
+@traced("sqlite")
+def get_user_threads(
+    user_id: str,
+    limit: int = THREAD_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    One page of a user's threads, most recently updated first. Pass `next_cursor` back
+    as `cursor` for the next (older) page.
+    With `since` (a `sync_cursor` from an earlier call) it instead returns only threads
+    updated after that point, oldest change first, for incremental sidebar sync.
+    The first page and every `since` response carry the `sync_cursor` for the next
+    incremental call. Deleted threads are not reported by a sync.
+    Raises ValueError for an invalid cursor.
+    """
+    limit = max(1, min(limit, MAX_THREAD_PAGE_SIZE))
+    params: list = [user_id]
+    if since:
+        updated_at, row_id = _decode_cursor(since)
+        keyset, order = "AND (updated_at, id) > (?, ?)", "ASC"
+        params += [updated_at, row_id]
+    elif cursor:
+        updated_at, row_id = _decode_cursor(cursor)
+        keyset, order = "AND (updated_at, id) < (?, ?)", "DESC"
+        params += [updated_at, row_id]
+    else:
+        keyset, order = "", "DESC"
 
+    conn = _connect()
+    rows = conn.execute(f'''
+        SELECT id, thread_id, title, created_at, updated_at
+        FROM threads
+        WHERE user_id = ? {keyset}
+        ORDER BY updated_at {order}, id {order}
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
     conn.close()
-    return threads
 
-def get_thread_messages(thread_id: str) -> List[Dict[str, Any]]:
-    """Get all messages for a thread."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = _encode_cursor([rows[-1]['updated_at'], rows[-1]['id']]) if rows else None
+    if since:
+        # Incremental sync continues from the last change returned
+        sync_cursor = last or since
+    else:
+        # The first page starts with the newest thread; later pages leave it to the first
+        sync_cursor = _encode_cursor([rows[0]['updated_at'], rows[0]['id']]) if rows and not cursor else None
+    return {
+        "threads": [_without_id(row) for row in rows],
+        "next_cursor": last if has_more and not since else None,
+        "sync_cursor": sync_cursor,
+        "has_more": has_more,
+    }
 
-    cursor.execute('''
-        SELECT role, content, timestamp
+@traced("sqlite")
+def get_thread_messages(
+    thread_id: str,
+    limit: int = MESSAGE_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    The latest page of a thread's messages, in chronological order. Pass `next_cursor`
+    back as `cursor` for the page of older messages before it.
+    With `since` (a `sync_cursor` from an earlier call) it instead returns the messages
+    written after that point, for incremental sync (the first page and every `since`
+    response carry the `sync_cursor` for the next one).
+    Pages stop early once their content reaches MESSAGE_PAGE_MAX_CHARS (always at least
+    one message), so a page of long analyses stays bounded too.
+    Raises ValueError for an invalid cursor.
+    """
+    limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+    params: list = [thread_id]
+    if since:
+        timestamp, row_id = _decode_cursor(since)
+        keyset, order = "AND (timestamp, id) > (?, ?)", "ASC"
+        params += [timestamp, row_id]
+    elif cursor:
+        timestamp, row_id = _decode_cursor(cursor)
+        keyset, order = "AND (timestamp, id) < (?, ?)", "DESC"
+        params += [timestamp, row_id]
+    else:
+        keyset, order = "", "DESC"
+
+    conn = _connect()
+    _rehydrate_if_archived(conn, thread_id)
+    conn.commit()
+    query = conn.execute(f'''
+        SELECT id, role, content, timestamp
         FROM messages
-        WHERE thread_id = ?
-        ORDER BY timestamp ASC
-    ''', (thread_id,))
+        WHERE thread_id = ? {keyset}
+        ORDER BY timestamp {order}, id {order}
+        LIMIT ?
+    ''', params + [limit + 1])
+
+    rows, chars = [], 0
+    for row in query:
+        row['content'] = CODEC.decode(row['content'])
+        if len(rows) == limit or (rows and chars + len(row['content']) > MESSAGE_PAGE_MAX_CHARS):
+            has_more = True
+            break
+        rows.append(row)
+        chars += len(row['content'])
+    else:
+        has_more = False
+    conn.close()
+
+    if since:
+        sync_cursor = _encode_cursor([rows[-1]['timestamp'], rows[-1]['id']]) if rows else since
+    else:
+        sync_cursor = _encode_cursor([rows[0]['timestamp'], rows[0]['id']]) if rows and not cursor else None
+        # Read newest-first from the cursor, shown oldest-first
+        rows.reverse()
+    next_cursor = _encode_cursor([rows[0]['timestamp'], rows[0]['id']]) if has_more and not since else None
+    return {
+        "messages": [_without_id(row) for row in rows],
+        "next_cursor": next_cursor,
+        "sync_cursor": sync_cursor,
+        "has_more": has_more,
+    }
+
+def get_all_user_threads(user_id: str) -> List[Dict[str, Any]]:
+    """Every thread of a user, newest first (the unpaginated /get_chat_history response)."""
+    threads, cursor = [], None
+    while True:
+        page = get_user_threads(user_id, MAX_THREAD_PAGE_SIZE, cursor)
+        threads.extend(page["threads"])
+        if not page["has_more"]:
+            return threads
+        cursor = page["next_cursor"]
 
-    messages = []
-    for row in cursor.fetchall():
-        messages.append({
-            'role': row[0],
-            'content': row[1],
-            'timestamp': row[2]
-        })
+def get_all_thread_messages(thread_id: str) -> List[Dict[str, Any]]:
+    """Every message of a thread, oldest first (the unpaginated /get_thread_messages response)."""
+    pages, cursor = [], None
+    while True:
+        page = get_thread_messages(thread_id, MAX_MESSAGE_PAGE_SIZE, cursor)
+        pages.append(page["messages"])
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    # Pages were read newest to oldest
+    return [message for messages in reversed(pages) for message in messages]
 
+@traced("sqlite")
+def get_recent_messages(thread_id: str, count: int) -> List[Dict[str, Any]]:
+    """The last `count` messages of a thread, oldest first, whatever their size (agent context)."""
+    conn = _connect()
+    _rehydrate_if_archived(conn, thread_id)
+    conn.commit()
+    rows = conn.execute('''
+        SELECT role, content, timestamp FROM messages
+        WHERE thread_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    ''', (thread_id, count)).fetchall()
     conn.close()
-    return messages
+    for row in rows:
+        row['content'] = CODEC.decode(row['content'])
+    rows.reverse()
+    return rows
 
+@traced("sqlite")
 def delete_thread(thread_id: str):
-    """Delete a thread and its messages."""
-    conn = sqlite3.connect(DB_PATH)
+    """Delete a thread, its messages and its archive entry (ON DELETE CASCADE)."""
+    conn = _connect()
     cursor = conn.cursor()
 
     cursor.execute('DELETE FROM threads WHERE thread_id = ?', (thread_id,))
-    cursor.execute('DELETE FROM messages WHERE thread_id = ?', (thread_id,))
+    if cursor.rowcount == 0:
+        # Messages saved before threads rows were guaranteed have no parent to cascade from
+        cursor.execute('DELETE FROM messages WHERE thread_id = ?', (thread_id,))
+
+    conn.commit()
+    _reclaim_space(conn)
+    conn.close()
+
+# ------------------------------
+# Archival & Compression
+# ------------------------------
+def _segment_path(segment: str) -> str:
+    return os.path.join(ARCHIVE_DIR, segment)
+
+def _rehydrate_if_archived(conn: sqlite3.Connection, thread_id: str) -> bool:
+    """Moves an archived thread's messages back into `messages` (with their original ids)."""
+    entry = conn.execute(
+        'SELECT segment, offset, length FROM thread_archive WHERE thread_id = ?', (thread_id,)
+    ).fetchone()
+    if entry is None:
+        return False
+
+    with open(_segment_path(entry['segment']), 'rb') as f:
+        f.seek(entry['offset'])
+        record = json.loads(CODEC.decode(f.read(entry['length'])))
+
+    # Another request may be rehydrating the same thread; re-check under the write lock
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    if conn.execute('SELECT 1 FROM thread_archive WHERE thread_id = ?', (thread_id,)).fetchone() is None:
+        return False
+    conn.executemany('''
+        INSERT INTO messages (id, thread_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (m['id'], thread_id, m['role'], CODEC.encode(m['content']), m['timestamp'])
+        for m in record['messages']
+    ])
+    conn.execute('DELETE FROM thread_archive WHERE thread_id = ?', (thread_id,))
+    print(f"Rehydrated thread {thread_id} ({len(record['messages'])} messages) from {entry['segment']}")
+    return True
+
+@traced("sqlite")
+def archive_stale_threads(days: int = ARCHIVE_AFTER_DAYS) -> Dict[str, Any]:
+    """
+    Moves the messages of threads not updated for `days` into a new compressed segment
+    file, one zstd record per thread, and indexes each record in `thread_archive`.
+    The threads rows stay, so the sidebar still lists them; opening or continuing one
+    rehydrates it. Archived messages are not full-text searchable.
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    segment = f"segment-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zst"
+
+    conn = _connect()
+    stale = [row['thread_id'] for row in conn.execute('''
+        SELECT t.thread_id FROM threads t
+        WHERE t.updated_at < ?
+          AND NOT EXISTS (SELECT 1 FROM thread_archive a WHERE a.thread_id = t.thread_id)
+          AND EXISTS (SELECT 1 FROM messages m WHERE m.thread_id = t.thread_id)
+    ''', (cutoff,))]
+
+    archived = messages = 0
+    with open(_segment_path(segment), 'ab') as f:
+        for start in range(0, len(stale), ARCHIVE_BATCH_THREADS):
+            # Hold the write lock from reading a batch until its rows are deleted, so a
+            # message saved meanwhile can neither be missed by the segment nor deleted
+            conn.execute('BEGIN IMMEDIATE')
+            entries, message_ids = [], []
+            for thread_id in stale[start:start + ARCHIVE_BATCH_THREADS]:
+                # Skip threads continued (or archived) since the stale list was read
+                still_stale = conn.execute('''
+                    SELECT 1 FROM threads t WHERE t.thread_id = ? AND t.updated_at < ?
+                      AND NOT EXISTS (SELECT 1 FROM thread_archive a WHERE a.thread_id = t.thread_id)
+                ''', (thread_id, cutoff)).fetchone()
+                if still_stale is None:
+                    continue
+                rows = conn.execute('''
+                    SELECT id, role, content, timestamp FROM messages
+                    WHERE thread_id = ? ORDER BY timestamp, id
+                ''', (thread_id,)).fetchall()
+                if not rows:
+                    continue
+                for row in rows:
+                    row['content'] = CODEC.decode(row['content'])
+                blob = CODEC.compress(json.dumps({'thread_id': thread_id, 'messages': rows}, default=str))
+                entries.append((thread_id, segment, f.tell(), len(blob), len(rows)))
+                message_ids.extend((row['id'],) for row in rows)
+                f.write(blob)
+            # The records must be on disk before the rows they replace are deleted
+            f.flush()
+            os.fsync(f.fileno())
+            conn.executemany('''
+                INSERT INTO thread_archive (thread_id, segment, offset, length, message_count)
+                VALUES (?, ?, ?, ?, ?)
+            ''', entries)
+            # Only the messages written to the segment
+            conn.executemany('DELETE FROM messages WHERE id = ?', message_ids)
+            conn.commit()
+            archived += len(entries)
+            messages += sum(e[4] for e in entries)
+
+    _reclaim_space(conn)
+    conn.close()
+    # A run in the same second appends to the earlier segment, which must stay
+    if not archived and os.path.getsize(_segment_path(segment)) == 0:
+        os.remove(_segment_path(segment))
+    return {"threads": archived, "messages": messages, "segment": segment if archived else None}
+
+@traced("sqlite")
+def train_compression_dictionary(samples: int = 2000) -> int:
+    """Trains a zstd dictionary on recent long messages and makes it the active one."""
+    conn = _connect()
+    texts = [row['text'] for row in conn.execute('''
+        SELECT message_text(content) AS text FROM messages
+        WHERE role = 'bot' ORDER BY id DESC LIMIT ?
+    ''', (samples,))]
+    if len(texts) < 100:
+        conn.close()
+        raise ValueError(f"Need at least 100 bot messages to train a dictionary, found {len(texts)}")
+    data = CODEC.train(texts)
+    cursor = conn.execute('INSERT INTO compression_dicts (data) VALUES (?)', (data,))
+    conn.commit()
+    conn.close()
+    CODEC.add_dictionary(cursor.lastrowid, data)
+    return cursor.lastrowid
+
+@traced("sqlite")
+def recompress_messages(batch_size: int = 1000) -> int:
+    """
+    Re-encodes stored messages with the current settings and dictionary: compresses
+    plain rows written before compression and moves rows to the newest dictionary.
+    The text doesn't change, so the FTS update trigger skips them.
+    """
+    conn = _connect()
+    updated, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, content FROM messages WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        changes = []
+        for row in rows:
+            if CODEC.dictionary_id_of(row['content']) == CODEC.active_dictionary_id:
+                continue
+            encoded = CODEC.encode(CODEC.decode(row['content']))
+            if encoded != row['content']:
+                changes.append((encoded, row['id']))
+        conn.executemany('UPDATE messages SET content = ? WHERE id = ?', changes)
+        conn.commit()
+        updated += len(changes)
+    _reclaim_space(conn)
+    conn.close()
+    return updated
+
+def storage_stats() -> Dict[str, Any]:
+    """Compression ratio and archive size; scans the whole table, so for maintenance only."""
+    conn = _connect()
+    row = conn.execute('''
+        SELECT COUNT(*) AS messages,
+               SUM(typeof(content) = 'blob') AS compressed,
+               SUM(length(CAST(content AS BLOB))) AS stored_bytes,
+               SUM(length(CAST(message_text(content) AS BLOB))) AS text_bytes
+        FROM messages
+    ''').fetchone()
+    archive = conn.execute(
+        'SELECT COUNT(*) AS threads, SUM(message_count) AS messages, SUM(length) AS bytes FROM thread_archive'
+    ).fetchone()
+    pages = conn.execute('PRAGMA page_count').fetchone()['page_count']
+    page_size = conn.execute('PRAGMA page_size').fetchone()['page_size']
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()['freelist_count']
+    auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()['auto_vacuum']
+    conn.close()
+    return {
+        "messages": row['messages'],
+        "compressed_messages": row['compressed'] or 0,
+        "stored_mb": round((row['stored_bytes'] or 0) / 1e6, 2),
+        "text_mb": round((row['text_bytes'] or 0) / 1e6, 2),
+        "compression_ratio": round((row['text_bytes'] or 0) / row['stored_bytes'], 2) if row['stored_bytes'] else None,
+        "active_dictionary": CODEC.active_dictionary_id,
+        "archived_threads": archive['threads'],
+        "archived_messages": archive['messages'] or 0,
+        "archive_mb": round((archive['bytes'] or 0) / 1e6, 2),
+        "database_mb": round(pages * page_size / 1e6, 2),
+        "free_mb": round(free_pages * page_size / 1e6, 2),
+        "incremental_vacuum": auto_vacuum == 2,
+    }
+
+# ------------------------------
+# Full-text Search
+# ------------------------------
+def _fts_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query: every word is quoted, so user input can't use
+    (or break on) FTS syntax, and all words must appear. "Section 138" matches messages
+    containing both "section" and "138"; a trailing * keeps prefix search ("dishono*").
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+@traced("sqlite")
+def search_messages(
+    user_id: str, query: str, limit: int = SEARCH_PAGE_SIZE, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Searches a user's messages, best match first (BM25), with highlighted snippets.
+    Pages are keyset-paginated on (score, message id): pass back `next_cursor` to get
+    the next page. Raises ValueError for an empty query or an invalid cursor.
+    """
+    match = _fts_query(query)
+    if not match:
+        raise ValueError("Search query is empty")
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+
+    after = ""
+    params: list = [match, user_id]
+    if cursor:
+        last_score, last_id = _decode_cursor(cursor)
+        after = "AND (score > ? OR (score = ? AND id > ?))"
+        params += [last_score, last_score, last_id]
+
+    conn = _connect()
+    rows = conn.execute(f'''
+        SELECT * FROM (
+            SELECT m.id, m.thread_id, t.title, m.role, m.timestamp,
+                   bm25(messages_fts) AS score,
+                   snippet(messages_fts, 0, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN threads t ON t.thread_id = m.thread_id
+            WHERE messages_fts MATCH ? AND t.user_id = ?
+        )
+        WHERE 1 = 1 {after}
+        ORDER BY score, id
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    conn.close()
+
+    # One extra row tells whether there is a next page without a COUNT(*)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results = [
+        {
+            'message_id': row['id'],
+            'thread_id': row['thread_id'],
+            'thread_title': row['title'],
+            'role': row['role'],
+            'timestamp': row['timestamp'],
+            'score': round(-row['score'], 4),  # bm25() is lower-is-better; report higher-is-better
+            'snippet': row['snippet'],
+        }
+        for row in rows
+    ]
+    next_cursor = _encode_cursor([rows[-1]['score'], rows[-1]['id']]) if has_more else None
+    return {"results": results, "next_cursor": next_cursor}
+
+# ------------------------------
+# Token Usage
+# ------------------------------
+def _utc_day(offset_days: int = 0) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=offset_days)).strftime('%Y-%m-%d')
+
+def _usage_totals(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'requests': row.get('requests') or 0,
+        'input_tokens': row['input_tokens'] or 0,
+        'output_tokens': row['output_tokens'] or 0,
+        'llm_calls': row['calls'] or 0,
+        'cost_usd': round(row['cost_usd'] or 0, 6),
+    }
+
+@traced("sqlite")
+def record_usage(trace_id: str, thread_id: str, token_usage: List[Dict[str, Any]], user_id: str = None):
+    """
+    Stores the LLM usage of one request (Trace.summary()["token_usage"]: one entry per
+    graph node and model) and adds it to the thread/day rollups.
+    """
+    if not token_usage:
+        return
+    day = _utc_day()
+    rows = [
+        (trace_id, thread_id, u['node'], u['model'], u['input_tokens'], u['output_tokens'], u['calls'],
+         cost_usd(u['model'], u['input_tokens'], u['output_tokens']))
+        for u in token_usage
+    ]
+    conn = _connect()
+    cursor = conn.cursor()
+    if user_id is None:
+        owner = cursor.execute('SELECT user_id FROM threads WHERE thread_id = ?', (thread_id,)).fetchone()
+        user_id = owner['user_id'] if owner else ''
+
+    cursor.executemany('''
+        INSERT INTO llm_usage (trace_id, thread_id, node, model, input_tokens, output_tokens, calls, cost_usd)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+    by_node: Dict[str, list] = {}
+    for _, _, node, _, input_tokens, output_tokens, calls, cost in rows:
+        for key in (node, USAGE_TOTAL_NODE):
+            totals = by_node.setdefault(key, [0, 0, 0, 0.0])
+            totals[0] += input_tokens
+            totals[1] += output_tokens
+            totals[2] += calls
+            totals[3] += cost
+    cursor.executemany('''
+        INSERT INTO usage_rollup
+            (thread_id, day, node, user_id, requests, input_tokens, output_tokens, calls, cost_usd)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT (thread_id, day, node) DO UPDATE SET
+            requests = requests + 1,
+            input_tokens = input_tokens + excluded.input_tokens,
+            output_tokens = output_tokens + excluded.output_tokens,
+            calls = calls + excluded.calls,
+            cost_usd = cost_usd + excluded.cost_usd
+    ''', [(thread_id, day, node, user_id or '', *totals) for node, totals in by_node.items()])
+
+    conn.commit()
+    conn.close()
+
+@traced("sqlite")
+def user_tokens_today(user_id: str) -> int:
+    """Input + output tokens the user spent today (UTC); for quota checks, one index range read."""
+    conn = _connect()
+    row = conn.execute('''
+        SELECT SUM(input_tokens + output_tokens) AS tokens FROM usage_rollup
+        WHERE user_id = ? AND day = ? AND node = ?
+    ''', (user_id, _utc_day(), USAGE_TOTAL_NODE)).fetchone()
+    conn.close()
+    return row['tokens'] or 0
+
+def thread_owner(thread_id: str) -> Optional[str]:
+    """user_id of a saved thread; None for unknown threads and unsaved placeholders."""
+    conn = _connect()
+    row = conn.execute('SELECT user_id FROM threads WHERE thread_id = ?', (thread_id,)).fetchone()
+    conn.close()
+    return (row['user_id'] or None) if row else None
+
+@traced("sqlite")
+def get_usage(user_id: str = None, thread_id: str = None, days: int = 30) -> Dict[str, Any]:
+    """
+    Token and cost report over the last `days` UTC days: totals, per day and per graph
+    node, plus the most expensive threads (for a user), requests (for a thread) or
+    users (with neither, across everyone).
+    """
+    since = _utc_day(days - 1)
+    if thread_id is not None:
+        scope, params = 'thread_id = ?', [thread_id]
+    elif user_id is not None:
+        scope, params = 'user_id = ?', [user_id]
+    else:
+        scope, params = '1 = 1', []
+    sums = '''SUM(requests) AS requests, SUM(input_tokens) AS input_tokens,
+        SUM(output_tokens) AS output_tokens, SUM(calls) AS calls, SUM(cost_usd) AS cost_usd'''
+
+    conn = _connect()
+    totals = conn.execute(f'''
+        SELECT {sums} FROM usage_rollup WHERE {scope} AND day >= ? AND node = ?
+    ''', params + [since, USAGE_TOTAL_NODE]).fetchone()
+    daily = conn.execute(f'''
+        SELECT day, {sums} FROM usage_rollup WHERE {scope} AND day >= ? AND node = ?
+        GROUP BY day ORDER BY day
+    ''', params + [since, USAGE_TOTAL_NODE]).fetchall()
+    by_node = conn.execute(f'''
+        SELECT node, {sums} FROM usage_rollup WHERE {scope} AND day >= ? AND node != ?
+        GROUP BY node ORDER BY SUM(input_tokens + output_tokens) DESC
+    ''', params + [since, USAGE_TOTAL_NODE]).fetchall()
+
+    if thread_id is not None:
+        top = conn.execute('''
+            SELECT trace_id, 1 AS requests, SUM(input_tokens) AS input_tokens,
+                   SUM(output_tokens) AS output_tokens, SUM(calls) AS calls, SUM(cost_usd) AS cost_usd
+            FROM llm_usage WHERE thread_id = ? AND created_at >= ?
+            GROUP BY trace_id ORDER BY SUM(input_tokens + output_tokens) DESC LIMIT ?
+        ''', (thread_id, since, USAGE_TOP_N)).fetchall()
+        top_key, top_field = 'top_requests', 'trace_id'
+    else:
+        top_field = 'thread_id' if user_id is not None else 'user_id'
+        top = conn.execute(f'''
+            SELECT {top_field}, {sums} FROM usage_rollup WHERE {scope} AND day >= ? AND node = ?
+            GROUP BY {top_field} ORDER BY SUM(input_tokens + output_tokens) DESC LIMIT ?
+        ''', params + [since, USAGE_TOTAL_NODE, USAGE_TOP_N]).fetchall()
+        top_key = 'top_threads' if user_id is not None else 'top_users'
+    conn.close()
+
+    return {
+        'since': since,
+        'totals': _usage_totals(totals),
+        'daily': [{'day': row['day'], **_usage_totals(row)} for row in daily],
+        'by_node': [{'node': row['node'], **_usage_totals(row)} for row in by_node],
+        top_key: [{top_field: row[top_field], **_usage_totals(row)} for row in top],
+    }
 
+@traced("sqlite")
+def prune_usage_details(days: int = USAGE_DETAIL_DAYS) -> int:
+    """Drops per-request detail rows older than `days`; the rollups are kept."""
+    conn = _connect()
+    # created_at is SQLite's CURRENT_TIMESTAMP, i.e. UTC
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    deleted = conn.execute('DELETE FROM llm_usage WHERE created_at < ?', (cutoff,)).rowcount
     conn.commit()
+    _reclaim_space(conn)
     conn.close()
+    return deleted
 
 # Initialize DB on import
 init_db()
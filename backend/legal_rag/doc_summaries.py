@@ -0,0 +1,86 @@
+# LARA/legal_rag/doc_summaries.py
+
+import os
+from typing import List, Dict, Any, Optional
+from langchain_community.vectorstores import FAISS
+from legal_rag.sources import SOURCE_REGISTRY
+from legal_rag.index_versions import INDEX, IndexVersion
+
+# ------------------------------
+# Config
+# ------------------------------
+# Two-level retrieval: search document summaries first, then chunks of the top documents
+HIERARCHICAL_RETRIEVAL = os.getenv("HIERARCHICAL_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+SUMMARY_TOP_DOCS = int(os.getenv("SUMMARY_TOP_DOCS", "3"))
+
+
+# ------------------------------
+# Loading
+# ------------------------------
+def load_summaries() -> Dict[str, Any]:
+    """
+    Precomputed summaries of the live index version, keyed by document source path:
+    {source: {"title", "content_hash", "summary", "sections": [{"start", "end", "summary"}]}}
+    Empty if the index was built without summaries (or there is no index).
+    """
+    try:
+        return INDEX.current().summaries
+    except FileNotFoundError:
+        return {}
+
+
+def get_summary_store(version: IndexVersion = None) -> Optional[FAISS]:
+    """
+    The document-summary index (first retrieval level) of `version` (default: the live
+    one), or None if it was not built.
+    """
+    if not HIERARCHICAL_RETRIEVAL:
+        return None
+    return (version or INDEX.current()).summary_store
+
+
+# ------------------------------
+# Lookup
+# ------------------------------
+def section_summary(source: str, start: Optional[int]) -> Optional[str]:
+    """Summary of the section of `source` that contains character offset `start`."""
+    entry = load_summaries().get(source)
+    if not entry or start is None:
+        return None
+    for section in entry["sections"]:
+        if section["start"] <= start < section["end"]:
+            return section["summary"]
+    return None
+
+
+def corpus_digest(source_ids: List[str]) -> Optional[str]:
+    """
+    Builds the reflection-prompt digest of FAISS results from precomputed document and
+    section summaries, replacing the per-cycle LLM summarization of raw chunks.
+    Returns None if any result has no precomputed summary, so the caller falls back.
+    """
+    if not source_ids:
+        return None
+    summaries = load_summaries()
+    if not summaries:
+        return None
+
+    documents: Dict[str, List[str]] = {}
+    for source_id in source_ids:
+        record = SOURCE_REGISTRY.get(source_id)
+        if record is None or record["type"] != "document":
+            return None
+        summary = section_summary(record.get("file"), record.get("start"))
+        if summary is None:
+            return None
+        sections = documents.setdefault(record["file"], [])
+        if summary not in sections:
+            sections.append(summary)
+
+    parts = []
+    for source, sections in documents.items():
+        entry = summaries[source]
+        lines = [f"{entry.get('title') or os.path.basename(source)}: {entry['summary']}"]
+        lines.extend(f"- {summary}" for summary in sections)
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts)
@@ -0,0 +1,295 @@
+# LARA/legal_rag/embeddings.py
+
+import os
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from legal_rag.tracing import METRICS, record_cache
+
+# ------------------------------
+# Config
+# ------------------------------
+backend_dir = Path(__file__).resolve().parent.parent
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# "torch": SentenceTransformer on PyTorch; "onnx": int8-quantized ONNX export on onnxruntime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Written by data/export_onnx_embedder.py
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(backend_dir / "data" / "models" / "all-MiniLM-L6-v2-int8"))
+# Intra-op threads of the embedder. Unset: torch keeps its process-wide default (all
+# cores) and the ONNX session uses ONNX_DEFAULT_THREADS. Setting it for the torch
+# backend changes torch's thread count for the whole process.
+EMBEDDING_THREADS = int(os.environ["EMBEDDING_THREADS"]) if os.getenv("EMBEDDING_THREADS") else None
+ONNX_DEFAULT_THREADS = 2
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# MiniLM was trained on 256 word pieces; longer inputs are truncated
+EMBEDDING_MAX_TOKENS = 256
+
+# Text -> vector cache in front of every backend (queries repeat across cycles and users)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+# Long texts (research context, analyses) are practically never repeated; don't cache them
+EMBEDDING_CACHE_MAX_CHARS = int(os.getenv("EMBEDDING_CACHE_MAX_CHARS", "2000"))
+# Optional .npz file the cache is loaded from at startup and saved to at exit
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+
+# ------------------------------
+# Embedding Cache
+# ------------------------------
+def _text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of text -> vector keyed by the text's SHA-1. Vectors live in one
+    preallocated float16 matrix (384 dims * 2 bytes per entry); the LRU order only maps
+    keys to row numbers. Vectors are unit length, so float16 keeps cosine error ~1e-3.
+    """
+
+    def __init__(self, capacity: int = EMBEDDING_CACHE_SIZE, tag: str = ""):
+        self.capacity = capacity
+        self.tag = tag  # backend/model the vectors came from; persisted caches must match
+        self._vectors: Optional[np.ndarray] = None  # allocated on the first put, once dim is known
+        self._slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free: List[int] = []
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get_many(self, keys: List[bytes]) -> Dict[int, np.ndarray]:
+        """Returns {position in keys: float32 vector} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is None:
+                    continue
+                self._slots.move_to_end(key)
+                found[i] = self._vectors[slot].astype(np.float32)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        if self.capacity <= 0 or not len(keys):
+            return
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float16)
+                self._free = list(range(self.capacity - 1, -1, -1))
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self._vectors[slot] = vector
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_mb": round(self._vectors.nbytes / 1e6, 2) if self._vectors is not None else 0.0,
+        }
+
+    # ---- persistence ----
+    def save(self, path: str):
+        with self._lock:
+            if not self._slots:
+                return
+            keys = list(self._slots)  # least recently used first
+            rows = [self._slots[key] for key in keys]
+            keys_array = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), -1)
+            vectors = self._vectors[rows]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys_array, vectors=vectors, tag=np.array(self.tag))
+        os.replace(tmp_path, path)
+        print(f"Embedding cache saved ({len(keys)} entries) to {path}")
+
+    def load(self, path: str):
+        if not os.path.exists(path):
+            return
+        try:
+            data = np.load(path)
+            if str(data["tag"]) != self.tag:
+                print(f"Embedding cache at {path} is from '{data['tag']}', not '{self.tag}'; ignoring it.")
+                return
+            keys = [key.tobytes() for key in data["keys"]][-self.capacity:]
+            self.put_many(keys, data["vectors"][-self.capacity:])
+            print(f"Embedding cache loaded ({len(keys)} entries) from {path}")
+        except Exception as e:
+            print(f"Error loading embedding cache: {e}")
+
+
+# ------------------------------
+# Embedder Backends
+# ------------------------------
+class Embedder(Embeddings):
+    """
+    One embedding interface for the whole backend: FAISS uses it as a LangChain
+    `Embeddings`, evaluation calls `encode` directly. Vectors are L2-normalized float32,
+    like the sentence-transformers MiniLM pipeline, so dot product == cosine similarity.
+    """
+
+    backend = "base"
+    cache: Optional[EmbeddingCache] = None
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def _encode_uncached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        batches = [
+            self._encode_batch(texts[i : i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        return np.vstack(batches).astype(np.float32, copy=False)
+
+    def encode(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE, use_cache: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if not use_cache or self.cache is None:
+            return self._encode_uncached(texts, batch_size)
+
+        cacheable = [i for i, text in enumerate(texts) if len(text) <= EMBEDDING_CACHE_MAX_CHARS]
+        keys = [_text_key(texts[i]) for i in cacheable]
+        cached = {cacheable[i]: vector for i, vector in self.cache.get_many(keys).items()}
+        for i in cacheable:
+            record_cache("embedding", "hit" if i in cached else "miss")
+
+        # Encode each distinct missing text once
+        encoded = {}
+        missing = list(dict.fromkeys(texts[i] for i in range(len(texts)) if i not in cached))
+        if missing:
+            encoded = dict(zip(missing, self._encode_uncached(missing, batch_size)))
+            new = [text for text in missing if len(text) <= EMBEDDING_CACHE_MAX_CHARS]
+            self.cache.put_many([_text_key(text) for text in new], np.array([encoded[text] for text in new]))
+        return np.array([
+            cached[i] if i in cached else encoded[text] for i, text in enumerate(texts)
+        ], dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Bulk document embedding (index builds) would only flush the query cache
+        return self.encode(list(texts), use_cache=False).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class TorchEmbedder(Embedder):
+    backend = "torch"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, threads: Optional[int] = EMBEDDING_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+        )
+
+
+class OnnxEmbedder(Embedder):
+    """MiniLM exported to ONNX with int8 dynamic quantization; mean pooling + L2 norm as in the original."""
+
+    backend = "onnx"
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, threads: Optional[int] = EMBEDDING_THREADS):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx needs the 'onnxruntime' and 'tokenizers' packages"
+            ) from e
+
+        model_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No ONNX embedder at {model_path}. Run: python data/export_onnx_embedder.py"
+            )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or ONNX_DEFAULT_THREADS
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+def create_embedder(backend: str = EMBEDDING_BACKEND, with_cache: bool = False) -> Embedder:
+    if backend == "onnx":
+        embedder = OnnxEmbedder()
+    elif backend == "torch":
+        embedder = TorchEmbedder()
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'torch' or 'onnx')")
+    if with_cache:
+        embedder.cache = EmbeddingCache(tag=f"{EMBEDDING_MODEL_NAME}:{backend}")
+        if EMBEDDING_CACHE_PATH:
+            embedder.cache.load(EMBEDDING_CACHE_PATH)
+            atexit.register(embedder.cache.save, EMBEDDING_CACHE_PATH)
+    return embedder
+
+
+_embedder: Optional[Embedder] = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    """The process-wide embedder shared by retrieval, indexing and evaluation."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = create_embedder(with_cache=True)
+                print(f"Embedding model loaded ({_embedder.backend} backend).")
+    return _embedder
+
+
+def get_embedding_cache_stats() -> Dict[str, float]:
+    if _embedder is None or _embedder.cache is None:
+        return {}
+    return _embedder.cache.stats()
+
+
+METRICS.gauge_callback(
+    "lara_embedding_cache_entries", "Vectors held in the shared query embedding cache.",
+    lambda: {(): len(_embedder.cache) if _embedder is not None and _embedder.cache is not None else 0},
+)
@@ -0,0 +1,233 @@
+# LARA/legal_rag/index_versions.py
+
+import os
+import json
+import time
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from legal_rag.embeddings import get_embedder
+from legal_rag.tracing import span
+from legal_rag.vector_index import ShardedIndex, find_manifest
+
+# ------------------------------
+# Config
+# ------------------------------
+# Layout written by data/faiss_index/faiss_indexer.py:
+#   data/faiss_index/versions/<version>/   immutable: shards, manifest.json, summaries
+#   data/faiss_index/CURRENT               name of the live version (replaced atomically)
+# An index built before versioning (files directly in data/faiss_index) loads as "legacy".
+FAISS_INDEX_PATH = "data/faiss_index"
+VERSIONS_DIR = "versions"
+CURRENT_POINTER = "CURRENT"
+LEGACY_VERSION = "legacy"
+SUMMARIES_FILE = "summaries.json"
+SUMMARY_INDEX_DIR = "summary_index"
+# How often the server checks CURRENT for a newly published version (0 disables)
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "30"))
+# Published versions kept on disk (the live one is never removed)
+KEEP_INDEX_VERSIONS = int(os.getenv("KEEP_INDEX_VERSIONS", "3"))
+# Queries run against a new version before it takes traffic, so its pages are in memory
+WARMUP_QUERIES = ["Section 302 IPC murder", "bail under CrPC", "Article 21 right to life"]
+
+
+# ------------------------------
+# Pointer and directories
+# ------------------------------
+def new_version_id() -> str:
+    # Microseconds keep two builds in the same second apart (and IDs still sort by time)
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+
+
+def version_dir(version: str, root: str = FAISS_INDEX_PATH) -> str:
+    return root if version == LEGACY_VERSION else os.path.join(root, VERSIONS_DIR, version)
+
+
+def read_current(root: str = FAISS_INDEX_PATH) -> Optional[str]:
+    """The published version, LEGACY_VERSION for an unversioned index, None if there is no index."""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        legacy = os.path.exists(os.path.join(root, "index.faiss")) or find_manifest(root) is not None
+        return LEGACY_VERSION if legacy else None
+
+
+def publish_version(version: str, root: str = FAISS_INDEX_PATH):
+    """Points CURRENT at a fully written version; readers see the old or the new name, never half of one."""
+    tmp_path = os.path.join(root, CURRENT_POINTER + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_POINTER))
+
+
+def prune_versions(root: str = FAISS_INDEX_PATH, keep: int = KEEP_INDEX_VERSIONS) -> List[str]:
+    """Removes all but the newest `keep` versions (and leftovers of interrupted builds)."""
+    versions_root = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_root):
+        return []
+    current = read_current(root)
+    names = sorted(os.listdir(versions_root))
+    stale = [name for name in names if name.startswith(".")]
+    published = [name for name in names if not name.startswith(".")]
+    stale += [name for name in published[: max(0, len(published) - keep)] if name != current]
+    for name in stale:
+        shutil.rmtree(os.path.join(versions_root, name), ignore_errors=True)
+    return stale
+
+
+# ------------------------------
+# A loaded version
+# ------------------------------
+class IndexVersion:
+    """Everything retrieval reads from one index build: chunk shards, summaries and summary index."""
+
+    def __init__(self, version: str, path: str, index: ShardedIndex, summaries: Dict[str, Any],
+                 summary_store: Optional[FAISS], manifest: Dict[str, Any]):
+        self.version = version
+        self.path = path
+        self.index = index
+        self.summaries = summaries
+        self.summary_store = summary_store
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, version: str, embeddings, root: str = FAISS_INDEX_PATH) -> "IndexVersion":
+        path = version_dir(version, root)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Index version '{version}' not found at {path}")
+        manifest_path = find_manifest(path)
+        manifest = {}
+        if manifest_path is not None:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        index = ShardedIndex.load(path, embeddings)
+
+        try:
+            with open(os.path.join(path, SUMMARIES_FILE), "r", encoding="utf-8") as f:
+                summaries = json.load(f)
+        except FileNotFoundError:
+            summaries = {}
+
+        summary_store = None
+        if os.path.exists(os.path.join(path, SUMMARY_INDEX_DIR)):
+            try:
+                summary_store = FAISS.load_local(
+                    os.path.join(path, SUMMARY_INDEX_DIR), embeddings, allow_dangerous_deserialization=True
+                )
+            except Exception as e:
+                print(f"Summary index of version {version} unavailable, using flat retrieval: {e}")
+        print(f"Loaded index version {version}: {len(index)} chunks, summaries for {len(summaries)} documents.")
+        return cls(version, path, index, summaries, summary_store, manifest)
+
+    def warm(self):
+        """Touches every shard (and the summary index) so the first real query isn't the slow one."""
+        embeddings = self.index.embeddings
+        vectors = np.array([embeddings.embed_query(q) for q in WARMUP_QUERIES], dtype=np.float32)
+        self.index.search_batch(vectors, 5)
+        if self.summary_store is not None:
+            self.summary_store.index.search(vectors, 3)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "created_at": self.manifest.get("created_at"),
+            "embedding": self.manifest.get("embedding"),
+            "chunks": len(self.index),
+            "shards": len(self.index.shards),
+            "documents": len(self.summaries) or None,
+        }
+
+
+# ------------------------------
+# Blue-green switching
+# ------------------------------
+class IndexManager:
+    """
+    Holds the live IndexVersion. A new version is loaded and warmed on the side while
+    requests keep using the old one, then swapped in with a single reference update;
+    searches already holding the old version finish on it. Listeners registered with
+    on_swap drop per-version caches.
+    """
+
+    def __init__(self, root: str = FAISS_INDEX_PATH):
+        self.root = root
+        self._active: Optional[IndexVersion] = None
+        self._lock = threading.Lock()  # serializes loads, never held by searches
+        self._listeners: List[Callable[[IndexVersion], None]] = []
+        self._poller: Optional[threading.Thread] = None
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+
+    def on_swap(self, listener: Callable[[IndexVersion], None]):
+        self._listeners.append(listener)
+
+    def current(self) -> IndexVersion:
+        active = self._active
+        if active is None:
+            with self._lock:
+                if self._active is None:
+                    version = read_current(self.root)
+                    if version is None:
+                        raise FileNotFoundError(f"FAISS index not found at {self.root}")
+                    self._active = IndexVersion.load(version, get_embedder(), self.root)
+                active = self._active
+        return active
+
+    def active_version(self) -> Optional[str]:
+        return self._active.version if self._active is not None else None
+
+    def refresh(self) -> bool:
+        """Swaps to the published version if it changed; returns True on a swap."""
+        version = read_current(self.root)
+        if version is None or version == self.active_version():
+            return False
+        with self._lock:
+            if version == self.active_version():
+                return False
+            with span("faiss", "load_version", version=version):
+                candidate = IndexVersion.load(version, get_embedder(), self.root)
+                candidate.warm()
+            previous = self._active
+            self._active = candidate
+            self.swaps += 1
+        print(f"---INDEX: switched from {previous.version if previous else None} to {version}---")
+        for listener in self._listeners:
+            listener(candidate)
+        return True
+
+    def _poll(self):
+        # The first pass loads (and warms) the published version before traffic needs it
+        while True:
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # A broken build never takes traffic; keep serving the current version
+                self.last_error = str(e)
+                print(f"Index refresh failed, still serving {self.active_version()}: {e}")
+            time.sleep(INDEX_POLL_SECONDS)
+
+    def start_polling(self):
+        if INDEX_POLL_SECONDS <= 0 or self._poller is not None:
+            return
+        self._poller = threading.Thread(target=self._poll, daemon=True, name="index-poller")
+        self._poller.start()
+
+    def stats(self) -> Dict[str, Any]:
+        active = self._active
+        return {
+            **(active.describe() if active is not None else {"version": None}),
+            "published": read_current(self.root),
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
+
+
+INDEX = IndexManager()
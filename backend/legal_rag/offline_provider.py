@@ -0,0 +1,93 @@
+# LARA/legal_rag/offline_provider.py
+
+import re
+import json
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def _count_tokens(text: str) -> int:
+    # Rough word-piece estimate, close enough for relative comparisons between runs
+    return int(len(text.split()) * 1.3) + 1
+
+
+class OfflineChatModel(BaseChatModel):
+    """
+    Deterministic local stand-in for ChatGroq. It recognises the prompts used by the
+    pipeline (rewrite, reflection, evaluation) and answers them in the expected shape,
+    and echoes the supplied material for everything else. Used for benchmarks, load
+    tests and index-time jobs that must not depend on the network.
+    """
+
+    latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def _respond(self, prompt: str) -> str:
+        if '"rewritten_query"' in prompt:
+            match = re.search(r"Original (?:Query|Case Details):\s*(.*?)\s*JSON Output:", prompt, re.S)
+            query = match.group(1).strip() if match else prompt.strip()[:200]
+            return json.dumps({"rewritten_query": f"{query} Indian law relevant acts sections judgments"})
+        if '"relevance_score"' in prompt:
+            return json.dumps({
+                "relevance_score": 4,
+                "context_faithfulness_score": 4,
+                "clarity_score": 4,
+                "justification": "Offline evaluator stand-in.",
+            })
+        if '"follow_up_queries"' in prompt:
+            return json.dumps({
+                "findings": ["Relevant provisions were identified in the retrieved material."],
+                "gaps": [],
+                "follow_up_queries": [],
+                "research_complete": True,
+            })
+        if "Research complete?" in prompt or "Is the research complete?" in prompt:
+            return (
+                "1. Key findings: Relevant provisions were identified in the retrieved material.\n"
+                "2. Knowledge Gaps: None significant.\n"
+                "3. Research complete? YES"
+            )
+        # Summaries and analyses: the tail of the prompt, i.e. the supplied material
+        words = prompt.split()
+        return " ".join(words[-150:])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        text = self._respond(prompt)
+        input_tokens, output_tokens = _count_tokens(prompt), _count_tokens(text)
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": "offline"},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class OfflineWebSearch:
+    """Stand-in for TavilySearch that never touches the network."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+
+    def invoke(self, query: str) -> dict:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return {"query": query, "results": []}
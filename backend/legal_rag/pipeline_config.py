@@ -0,0 +1,99 @@
+# LARA/legal_rag/pipeline_config.py
+
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+from langchain_core.runnables import RunnableConfig
+
+
+# ------------------------------
+# Pipeline Profiles
+# ------------------------------
+@dataclass(frozen=True)
+class PipelineProfile:
+    """
+    A named latency/quality trade-off for one request. Turned into graph settings by
+    `to_settings` and read by the nodes through `pipeline_setting`.
+    """
+    name: str
+    # None keeps the agent's own cap (citizen 3, lawyer 5)
+    max_research_cycles: Optional[int]
+    # "trim": one summarization call on a token-budgeted extract of the evidence
+    # (legal_rag/prompt_compression.py); "chunked": per-chunk summaries + merge
+    summarization: str
+    chunk_size: int
+    max_chunks: int
+    search_k: int
+    # Rerank a larger FAISS candidate pool by MMR (capped per document) before keeping the top k
+    rerank: bool
+    evaluate: bool
+    # p95 end-to-end latency target, checked by benchmarks/profile_slo.py
+    latency_slo_seconds: float
+    # "single": one JSON reflection call per cycle; None keeps REFLECTION_MODE (legal_rag/reflection.py)
+    reflection_mode: Optional[str] = None
+
+    def to_settings(self, overrides: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Graph settings for this profile. Overrides (e.g. admission-control degradation)
+        can only make the run cheaper: the research cycle cap never goes above the profile's.
+        """
+        settings = {
+            "profile": self.name,
+            "max_research_cycles": self.max_research_cycles,
+            "fast_mode": self.summarization == "trim",
+            "chunk_size": self.chunk_size,
+            "max_chunks": self.max_chunks,
+            "search_k": self.search_k,
+            "rerank": self.rerank,
+            "skip_evaluation": not self.evaluate,
+        }
+        if self.reflection_mode:
+            settings["reflection_mode"] = self.reflection_mode
+        for name, value in (overrides or {}).items():
+            if name == "max_research_cycles" and settings[name] is not None:
+                value = min(value, settings[name])
+            settings[name] = value
+        return settings
+
+    def describe(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+PROFILES: Dict[str, PipelineProfile] = {
+    "instant": PipelineProfile(
+        name="instant", max_research_cycles=1, summarization="trim", chunk_size=1200,
+        max_chunks=1, search_k=3, rerank=False, evaluate=False, latency_slo_seconds=15,
+        reflection_mode="single",
+    ),
+    "balanced": PipelineProfile(
+        name="balanced", max_research_cycles=None, summarization="trim", chunk_size=1200,
+        max_chunks=3, search_k=5, rerank=False, evaluate=True, latency_slo_seconds=60,
+    ),
+    "deep": PipelineProfile(
+        name="deep", max_research_cycles=6, summarization="chunked", chunk_size=1200,
+        max_chunks=5, search_k=8, rerank=True, evaluate=True, latency_slo_seconds=180,
+    ),
+}
+
+# Profile used when a request does not name one
+DEFAULT_PROFILE = os.getenv("PIPELINE_PROFILE", "balanced")
+
+
+def get_profile(name: Optional[str] = None) -> PipelineProfile:
+    """Looks up a profile by name (case-insensitive); raises ValueError for unknown names."""
+    key = (name or DEFAULT_PROFILE).strip().lower()
+    if key not in PROFILES:
+        raise ValueError(f"Unknown pipeline profile '{name}'. Available: {', '.join(PROFILES)}")
+    return PROFILES[key]
+
+
+def pipeline_setting(config: Optional[RunnableConfig], name: str, default: Any) -> Any:
+    """
+    Reads a per-request pipeline setting (e.g. "fast_mode", "max_research_cycles",
+    "skip_evaluation") from the graph config, falling back to the module default.
+    Settings are passed by route_query under config["configurable"].
+    """
+    if not config:
+        return default
+    value = config.get("configurable", {}).get(name)
+    return default if value is None else value
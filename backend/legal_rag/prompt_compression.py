@@ -0,0 +1,126 @@
+# LARA/legal_rag/prompt_compression.py
+
+import os
+import re
+from typing import List, Tuple
+import numpy as np
+from legal_rag.embeddings import get_embedder
+from legal_rag.tracing import METRICS, span
+
+# ------------------------------
+# Config
+# ------------------------------
+# "extractive": keep the sentences closest to the query (embedding similarity), in document order
+# "trim": keep the first budget_tokens / 1.3 words of the text
+PROMPT_COMPRESSION = os.getenv("PROMPT_COMPRESSION", "extractive").lower()
+# Estimated tokens of evidence sent to one fast-mode summarization call. The default
+# (2000 words) makes "trim" exactly the previous fast mode
+COMPRESSION_BUDGET_TOKENS = int(os.getenv("COMPRESSION_BUDGET_TOKENS", "2600"))
+# Sentences longer than this (web text without punctuation, tables) are cut into windows
+MAX_SENTENCE_WORDS = 80
+# Sentences shorter than this (headings, "Ibid.", page numbers) are never worth a slot on their own
+MIN_SENTENCE_WORDS = 4
+
+COMPRESSION_TOKENS = METRICS.counter(
+    "lara_prompt_compression_tokens_total",
+    "Estimated evidence tokens before (input) and after (kept) prompt compression, by mode.",
+)
+
+# Abbreviations common in Indian legal text that end in a period but not a sentence
+_ABBREVIATIONS = re.compile(
+    r"\b(Sec|Secs|S|Ss|Art|Arts|Cl|No|Nos|Vol|Ch|Para|Paras|Sub|r|rr|O|v|vs|Hon'ble|Hon|Mr|Mrs|Ms|Dr|Ltd|Co|Pvt|Govt|etc|viz|i\.e|e\.g|cf|Cr\.P\.C|I\.P\.C|C\.P\.C|U\.O\.I|A\.I\.R|S\.C\.C)\.",
+    re.I,
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[\"'(\[]?[A-Z0-9])|\n\s*\n|\n(?=\s*(?:\d+[.)]|[-*•]|\([a-z0-9]+\))\s)")
+_PLACEHOLDER = "\x00"
+
+
+def estimate_tokens(text: str) -> int:
+    # Same word-piece estimate the offline provider reports, so savings line up with traces
+    return int(len(text.split()) * 1.3) + 1
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits evidence into sentences (and list items), keeping legal citations like 'Sec. 302' intact."""
+    protected = _ABBREVIATIONS.sub(lambda m: m.group(0)[:-1] + _PLACEHOLDER, text)
+    sentences = []
+    for part in _SENTENCE_END.split(protected):
+        words = part.replace(_PLACEHOLDER, ".").split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i : i + MAX_SENTENCE_WORDS]))
+    return [s for s in sentences if s]
+
+
+def trim_words(text: str, budget_tokens: int) -> str:
+    return " ".join(text.split()[: max(1, int(budget_tokens / 1.3))])
+
+
+def select_sentences(scores: np.ndarray, costs: np.ndarray, budget_tokens: int) -> np.ndarray:
+    """
+    Indices of the highest-scoring sentences whose costs fit the budget, in document order.
+    Greedy by score; a sentence that does not fit is skipped so shorter ones further down
+    the ranking can still use the remaining budget.
+    """
+    order = np.argsort(-scores, kind="stable")
+    # Fast path: the whole prefix of the ranking that fits, in one cumulative sum
+    fits = np.cumsum(costs[order]) <= budget_tokens
+    cut = int(np.argmin(fits)) if not fits.all() else len(order)
+    chosen = list(order[:cut])
+    remaining = budget_tokens - int(costs[order[:cut]].sum())
+    for i in order[cut:]:
+        if costs[i] <= remaining:
+            chosen.append(i)
+            remaining -= costs[i]
+    return np.sort(np.array(chosen, dtype=np.int64))
+
+
+def extract_relevant(text: str, query: str, budget_tokens: int) -> Tuple[str, int]:
+    """
+    Extractive compression: embeds every sentence and the query in one batch, scores them by
+    cosine similarity (vectors are normalized, so one matrix-vector product) and keeps the best
+    sentences that fit the token budget, in their original order. Returns (text, sentences kept).
+    """
+    sentences = split_sentences(text)
+    # Duplicate sentences (the same passage from two chunks or two sites) are scored once
+    unique = list(dict.fromkeys(sentences))
+    costs = np.array([estimate_tokens(s) for s in unique], dtype=np.int64)
+
+    vectors = get_embedder().encode([query] + unique)
+    scores = vectors[1:] @ vectors[0]
+    # Fragments only win a slot if nothing else fits
+    short = np.array([len(s.split()) < MIN_SENTENCE_WORDS for s in unique])
+    scores = np.where(short, scores - 1.0, scores)
+
+    keep = select_sentences(scores, costs, budget_tokens)
+    if not len(keep):
+        return trim_words(text, budget_tokens), 0
+    return " ".join(unique[i] for i in keep), len(keep)
+
+
+def compress_evidence(text: str, query: str, budget_tokens: int = COMPRESSION_BUDGET_TOKENS,
+                      mode: str = PROMPT_COMPRESSION, label: str = "evidence") -> str:
+    """
+    Fits evidence into `budget_tokens` for a summarization prompt. Text already under the
+    budget is returned unchanged; if the embedder fails, falls back to trimming.
+    """
+    input_tokens = estimate_tokens(text)
+    if input_tokens <= budget_tokens:
+        return text
+
+    with span("compression", mode, label=label) as attrs:
+        if mode == "extractive":
+            try:
+                compressed, kept = extract_relevant(text, query, budget_tokens)
+                attrs["sentences"] = kept
+            except Exception as e:
+                print(f"Extractive compression failed, trimming instead: {e}")
+                mode = "trim"
+        if mode != "extractive":
+            compressed = trim_words(text, budget_tokens)
+        kept_tokens = estimate_tokens(compressed)
+        attrs["input_tokens"] = input_tokens
+        attrs["kept_tokens"] = kept_tokens
+
+    COMPRESSION_TOKENS.inc(input_tokens, kind="input", mode=mode)
+    COMPRESSION_TOKENS.inc(kept_tokens, kind="kept", mode=mode)
+    return compressed
@@ -0,0 +1,293 @@
+# LARA/legal_rag/providers.py
+
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+from langchain_groq import ChatGroq
+from langchain_tavily import TavilySearch
+from dotenv import load_dotenv
+from legal_rag.offline_provider import OfflineChatModel, OfflineWebSearch
+from legal_rag.tracing import METRICS, span
+
+load_dotenv()
+
+# ------------------------------
+# Config
+# ------------------------------
+# "live" calls Groq/Tavily; "offline" swaps in deterministic local stand-ins
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+OFFLINE_LLM_LATENCY_SECONDS = float(os.getenv("OFFLINE_LLM_LATENCY_SECONDS", "0"))
+OFFLINE_WEB_LATENCY_SECONDS = float(os.getenv("OFFLINE_WEB_LATENCY_SECONDS", "0"))
+
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+TAVILY_REQUESTS_PER_MINUTE = float(os.getenv("TAVILY_REQUESTS_PER_MINUTE", "100"))
+TAVILY_BURST = int(os.getenv("TAVILY_BURST", "5"))
+TAVILY_MAX_CONCURRENCY = int(os.getenv("TAVILY_MAX_CONCURRENCY", "4"))
+
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# ------------------------------
+# Priority Classes
+# ------------------------------
+# Lower value is served first when callers are queued for the same provider.
+PRIORITY_LAWYER = 0
+PRIORITY_CITIZEN = 1
+PRIORITY_BATCH = 2
+
+_current_priority = contextvars.ContextVar("provider_priority", default=PRIORITY_CITIZEN)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Runs the enclosed graph execution with the given provider priority class."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+# ------------------------------
+# Rate Limiting
+# ------------------------------
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """Takes one token if available. Returns 0.0 on success, otherwise seconds to wait."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        """Empties the bucket, e.g. after the provider reported a rate limit."""
+        self._refill(time.monotonic())
+        self.tokens = 0.0
+
+
+class ProviderScheduler:
+    """
+    Admits calls to one provider in priority order, within its request rate and a cap
+    on concurrent calls. Rate-limit and transient errors are retried with exponential
+    backoff and full jitter instead of being surfaced to the request.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+        # Metrics
+        self.total_calls = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _acquire(self, priority: int) -> float:
+        entry = (priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                if self._waiting[0] == entry and self._in_flight < self.max_concurrency:
+                    delay = self._bucket.try_take()
+                    if delay == 0.0:
+                        heapq.heappop(self._waiting)
+                        self._in_flight += 1
+                        # The next waiter may be able to go as well
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(timeout=delay)
+                else:
+                    self._cond.wait()
+            waited = time.monotonic() - start
+            self.total_calls += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)` under this provider's scheduling and retry policy."""
+        priority = _current_priority.get()
+        attempt = 0
+        while True:
+            self._acquire(priority)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= PROVIDER_MAX_RETRIES:
+                    with self._cond:
+                        self.failures += 1
+                    raise
+                with self._cond:
+                    self.retries += 1
+                    if _is_rate_limit(e):
+                        self.rate_limited += 1
+                        self._bucket.drain()
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                print(f"---{self.name.upper()} CALL FAILED ({e}); RETRYING IN {delay:.1f}s---")
+                attempt += 1
+            finally:
+                self._release()
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "in_flight": self._in_flight,
+                "total_calls": self.total_calls,
+                "avg_wait_seconds": round(self.total_wait_seconds / self.total_calls, 4) if self.total_calls else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 4),
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+def _status_code(e: Exception):
+    code = getattr(e, "status_code", None)
+    if code is None and getattr(e, "response", None) is not None:
+        code = getattr(e.response, "status_code", None)
+    return code
+
+
+def _is_rate_limit(e: Exception) -> bool:
+    return _status_code(e) == 429 or "rate limit" in str(e).lower()
+
+
+def _is_retryable(e: Exception) -> bool:
+    code = _status_code(e)
+    if code is not None:
+        return code == 429 or code >= 500
+    text = str(e).lower()
+    return "rate limit" in text or "timed out" in text or "timeout" in text or "connection" in text
+
+
+def _retry_after(e: Exception):
+    """Honours a Retry-After header from the provider when it sends one."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return min(float(value), BACKOFF_MAX_SECONDS) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+GROQ_SCHEDULER = ProviderScheduler("groq", GROQ_REQUESTS_PER_MINUTE, GROQ_BURST, LLM_MAX_CONCURRENCY)
+TAVILY_SCHEDULER = ProviderScheduler("tavily", TAVILY_REQUESTS_PER_MINUTE, TAVILY_BURST, TAVILY_MAX_CONCURRENCY)
+
+
+# ------------------------------
+# Shared Client Pool
+# ------------------------------
+_clients: Dict[Any, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm(temperature: float = 0.2) -> ChatGroq:
+    """Returns the process-wide Groq client for the given temperature."""
+    if PROVIDER_MODE == "offline":
+        key = ("offline-llm",)
+        if key not in _clients:
+            _clients[key] = OfflineChatModel(latency_seconds=OFFLINE_LLM_LATENCY_SECONDS)
+        return _clients[key]
+
+    key = ("groq", GROQ_MODEL, temperature)
+    if key not in _clients:
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        if not groq_api_key:
+            raise ValueError("GROQ_API_KEY environment variable not set.")
+        with _clients_lock:
+            if key not in _clients:
+                # Retries are handled by GROQ_SCHEDULER so they respect the shared rate limit
+                _clients[key] = ChatGroq(
+                    model=GROQ_MODEL, temperature=temperature, groq_api_key=groq_api_key, max_retries=0
+                )
+    return _clients[key]
+
+
+def get_web_search_tool(max_results: int = 5) -> TavilySearch:
+    """Returns the process-wide Tavily search client."""
+    if PROVIDER_MODE == "offline":
+        key = ("offline-web",)
+        if key not in _clients:
+            _clients[key] = OfflineWebSearch(latency_seconds=OFFLINE_WEB_LATENCY_SECONDS)
+        return _clients[key]
+
+    key = ("tavily", max_results)
+    if key not in _clients:
+        tavily_api_key = os.getenv("TAVILY_API_KEY")
+        if not tavily_api_key:
+            raise ValueError("TAVILY_API_KEY environment variable not set.")
+        with _clients_lock:
+            if key not in _clients:
+                _clients[key] = TavilySearch(max_results=max_results, tavily_api_key=tavily_api_key)
+    return _clients[key]
+
+
+def invoke_llm(runnable, vars: dict):
+    """Invokes a chain that ends in a Groq call through the shared scheduler."""
+    with span("llm", GROQ_MODEL if PROVIDER_MODE == "live" else "offline"):
+        return GROQ_SCHEDULER.call(runnable.invoke, vars)
+
+
+def invoke_web_search(query: str):
+    """Runs a Tavily search through the shared scheduler."""
+    with span("web", "tavily" if PROVIDER_MODE == "live" else "offline"):
+        return TAVILY_SCHEDULER.call(get_web_search_tool().invoke, query)
+
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    return {"groq": GROQ_SCHEDULER.stats(), "tavily": TAVILY_SCHEDULER.stats()}
+
+
+def _provider_gauge(field: str):
+    return lambda: {
+        (("provider", name),): stats[field] for name, stats in get_provider_stats().items()
+    }
+
+
+METRICS.gauge_callback("lara_provider_queue_depth", "Calls waiting for a provider slot.", _provider_gauge("queue_depth"))
+METRICS.gauge_callback("lara_provider_in_flight", "Provider calls currently running.", _provider_gauge("in_flight"))
+METRICS.gauge_callback("lara_provider_avg_wait_seconds", "Mean scheduler wait per provider call.", _provider_gauge("avg_wait_seconds"))
+METRICS.gauge_callback("lara_provider_retries", "Provider calls retried after an error.", _provider_gauge("retries"))
@@ -1,12 +1,11 @@
 # LARA/legal_rag/query_rewriter.py
 
-import os
-from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from typing import TypedDict, Annotated, List, Any
 import operator
 from dotenv import load_dotenv
+from legal_rag.providers import get_llm, invoke_llm
 
 load_dotenv()
 
@@ -18,6 +17,7 @@ class AgentState(TypedDict):
     faiss_search_results: str
     final_analysis: str
     role: str  # <-- NEW: Add a role field
+    rewritten_query: str
 
 
 def rewrite_query(state: AgentState) -> dict:
@@ -29,11 +29,7 @@ def rewrite_query(state: AgentState) -> dict:
     query = state["query"]
     role = state.get("role", "Common Citizen")  # <-- Use the new role field
 
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0.2,
-        groq_api_key=os.getenv("GROQ_API_KEY"),
-    )
+    llm = get_llm()
 
     if role == "Lawyer":
         # Prompt specifically for lawyers seeking precedents and arguments
@@ -68,7 +64,7 @@ JSON Output:
 
     try:
         rewriter_chain = rewrite_prompt | llm | JsonOutputParser()
-        rewritten_query = rewriter_chain.invoke({"query": query})
+        rewritten_query = invoke_llm(rewriter_chain, {"query": query})
     except Exception as e:
         print(f"JSON parsing failed, using raw string. Error: {e}")
 
@@ -77,10 +73,13 @@ JSON Output:
             PromptTemplate(template="{query}", input_variables=["query"]) | llm
         )
 
-        rewritten_text = raw_text_chain.invoke({"query": query})
+        rewritten_text = invoke_llm(raw_text_chain, {"query": query})
 
         # Ensure the output is a string before putting it in the dictionary
         rewritten_query = {"rewritten_query": str(rewritten_text.content)}
 
     print(f"Rewritten Query: {rewritten_query}")
-    return rewritten_query
+    # Only the rewritten query goes back into the graph state; fall back to the original
+    if not isinstance(rewritten_query, dict) or not rewritten_query.get("rewritten_query"):
+        return {"rewritten_query": query}
+    return {"rewritten_query": str(rewritten_query["rewritten_query"])}
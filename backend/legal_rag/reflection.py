@@ -0,0 +1,116 @@
+# LARA/legal_rag/reflection.py
+
+import os
+import re
+from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from langchain.prompts import PromptTemplate
+from legal_rag.providers import get_llm, invoke_llm
+from legal_rag.sources import format_numbered_sources
+from legal_rag.tracing import METRICS
+
+# ------------------------------
+# Config
+# ------------------------------
+# "multi": summarize FAISS results, summarize web results, then reflect (3 LLM calls per cycle)
+# "single": one call over token-budgeted raw evidence returning strict JSON, multi as fallback
+REFLECTION_MODE = os.getenv("REFLECTION_MODE", "multi").lower()
+# Word budget for all raw evidence excerpts in the single-call prompt
+REFLECTION_EVIDENCE_BUDGET_WORDS = int(os.getenv("REFLECTION_EVIDENCE_BUDGET_WORDS", "2400"))
+
+REFLECTIONS = METRICS.counter(
+    "lara_reflections_total", "Research-cycle reflections by mode and outcome."
+)
+
+
+class ReflectionResult(BaseModel):
+    """Schema the single-call reflection must satisfy."""
+    findings: List[str] = Field(min_length=1)
+    gaps: List[str] = []
+    follow_up_queries: List[str] = Field(default=[], max_length=3)
+    research_complete: bool
+
+
+PERSPECTIVES = {
+    "citizen": (
+        "You are a legal research assistant helping a common citizen understand Indian law.",
+        "key findings: the relevant acts, sections and judgments in plain terms",
+    ),
+    "lawyer": (
+        "You are a legal research assistant for a lawyer.",
+        "key legal findings: relevant statutes, case names and legal principles",
+    ),
+}
+
+SINGLE_CALL_TEMPLATE = """{persona}
+Read the raw search evidence below for the query and reflect on the research so far.
+
+Original Query: {query}
+
+Evidence:
+{evidence}
+
+Return ONLY a JSON object, with no text before or after it, in exactly this shape:
+{{{{
+  "findings": ["<{findings_hint}>", ...],
+  "gaps": ["<missing information, e.g. conflicting judgments or lack of recent precedents>", ...],
+  "follow_up_queries": ["<at most 3 search queries that would close the gaps>", ...],
+  "research_complete": true or false
+}}}}
+JSON Output:"""
+
+
+def parse_reflection(text: str) -> Optional[ReflectionResult]:
+    """Extracts and validates the JSON object in an LLM reply; None if it does not fit the schema."""
+    match = re.search(r"\{.*\}", text or "", re.S)
+    if not match:
+        return None
+    try:
+        return ReflectionResult.model_validate_json(match.group(0))
+    except ValidationError:
+        return None
+
+
+def render_reflection(result: ReflectionResult) -> str:
+    """Same layout as the multi-call reflection, so research_context reads both alike."""
+    findings = "\n".join(f"- {finding}" for finding in result.findings)
+    gaps = "\n".join(f"- {gap}" for gap in result.gaps) or "- None"
+    return (
+        f"1. Key findings:\n{findings}\n"
+        f"2. Knowledge Gaps:\n{gaps}\n"
+        f"3. Research complete? {'YES' if result.research_complete else 'NO'}"
+    )
+
+
+def single_call_reflection(query: str, source_ids: List[str], perspective: str = "citizen") -> Optional[dict]:
+    """
+    One LLM call over the cycle's raw evidence instead of summarize + summarize + reflect.
+    Returns the node update, or None when the reply does not validate so the caller can
+    fall back to the multi-call path.
+    """
+    persona, findings_hint = PERSPECTIVES[perspective]
+    template = SINGLE_CALL_TEMPLATE.format(persona=persona, findings_hint=findings_hint, query="{query}", evidence="{evidence}")
+    prompt = PromptTemplate(template=template, input_variables=["query", "evidence"])
+    evidence = format_numbered_sources(source_ids, budget_words=REFLECTION_EVIDENCE_BUDGET_WORDS)
+
+    try:
+        reply = invoke_llm(prompt | get_llm(), {"query": query, "evidence": evidence})
+        result = parse_reflection(getattr(reply, "content", str(reply)))
+    except Exception as e:
+        print(f"Single-call reflection failed: {e}")
+        result = None
+
+    if result is None:
+        REFLECTIONS.inc(mode="single", outcome="fallback")
+        print("---REFLECTION: single-call reply did not validate, falling back to multi-call---")
+        return None
+
+    REFLECTIONS.inc(mode="single", outcome="ok")
+    update = {
+        "intermediate_steps": [render_reflection(result)],
+        "research_complete": result.research_complete,
+    }
+    # The next cycle searches for what is still missing instead of repeating the same query
+    if not result.research_complete and result.follow_up_queries:
+        update["rewritten_query"] = result.follow_up_queries[0]
+    return update
@@ -1,17 +1,27 @@
 # LARA/legal_rag/retrieval.py
 
 import os
+import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from langchain_core.tools import tool
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_tavily import TavilySearch
-from langchain_core.runnables import RunnableParallel
+import numpy as np
+from langchain_core.runnables import RunnableParallel, RunnableConfig
 from langchain_core.documents import Document  # <-- NEW: Import Document
 from langchain_core.messages import BaseMessage  # <-- FIX: Import BaseMessage
-from typing import TypedDict, Annotated, List, Any
+from typing import TypedDict, Annotated, List, Any, Optional, Dict
 import operator
 from dotenv import load_dotenv
+from legal_rag.query_rewriter import rewrite_query
+from legal_rag.web_cache import cached_web_search, normalize_query
+from legal_rag.sources import register_document, register_web_result, merge_source_ids
+from legal_rag.tracing import span, record_cache
+from legal_rag.pipeline_config import pipeline_setting
+from legal_rag.doc_summaries import get_summary_store, SUMMARY_TOP_DOCS
+from legal_rag.embeddings import get_embedder
+from legal_rag.vector_index import validate_filters, mmr_select
+from legal_rag.index_versions import INDEX, FAISS_INDEX_PATH
 
 # Load .env from the backend directory
 backend_dir = Path(__file__).resolve().parent.parent
@@ -24,38 +34,184 @@ load_dotenv(backend_dir / '.env')
 class AgentState(TypedDict):
     query: str
     intermediate_steps: Annotated[List[Any], operator.add]
-    web_search_results: str
-    faiss_search_results: str
+    web_search_results: List[str]  # source IDs of the current cycle's web results
+    faiss_search_results: List[str]  # source IDs of the current cycle's FAISS results
     final_analysis: str
     research_complete: bool
     chat_history: List[BaseMessage]
-    sources: Annotated[List[dict], operator.add]  # <-- NEW: To store source metadata
+    sources: Annotated[List[str], merge_source_ids]  # <-- source IDs, text lives in the registry
+    role: str
+    rewritten_query: str
+    speculation: dict
+
+
+# -------------------------
+# Shared FAISS Vector Store
+# -------------------------
+# The live index version (shards + summaries) comes from legal_rag/index_versions.INDEX
+SEARCH_K = 5
+# Candidates fetched per kept result when a profile turns reranking on (at least MMR_FETCH_K)
+RERANK_FETCH_FACTOR = 4
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "50"))
+# 1.0 = pure relevance, 0.0 = pure diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+# Most chunks one document may contribute to a reranked result while other documents
+# have candidates left (0 = no cap); keeps adjacent overlapping chunks of one judgment
+# from filling every slot. Slots the capped pool can't fill are filled without the cap.
+MMR_PER_DOCUMENT_CAP = int(os.getenv("MMR_PER_DOCUMENT_CAP", "2"))
+MAX_PREFETCHED_QUERIES = 2048
+
+# Speculative mode: retrieve on the raw query while the rewrite LLM call is in flight.
+# Off by default until the "speculation" state shows a net latency saving on real traffic.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+# Rewritten queries at least this similar to the raw query reuse its results as-is
+SPECULATION_SIMILARITY_THRESHOLD = 0.92
+
+# Results seeded by prefetch_legal_search(), keyed by (exact query string, top documents
+# of the hierarchical first level or None) -> (version, k, docs)
+_prefetched_results: "OrderedDict[str, tuple]" = OrderedDict()
+_prefetched_lock = threading.Lock()
+
+
+def _clear_prefetched(_version=None):
+    # Results of the previous index version must not be served after a swap
+    with _prefetched_lock:
+        _prefetched_results.clear()
+
+
+INDEX.on_swap(_clear_prefetched)
+
+
+def _prefetch_key(query: str, top_sources: Optional[set]) -> tuple:
+    return (query, frozenset(top_sources) if top_sources is not None else None)
+
+
+def _top_document_sources_batch(active, vectors: np.ndarray) -> List[Optional[set]]:
+    """_top_document_sources for a whole query matrix, in one summary-index call."""
+    summary_store = get_summary_store(active)
+    if summary_store is None:
+        return [None] * len(vectors)
+    with span("faiss", "summary_batch_search", queries=len(vectors)):
+        _, indices = summary_store.index.search(vectors, SUMMARY_TOP_DOCS)
+    docstore, ids = summary_store.docstore, summary_store.index_to_docstore_id
+    return [
+        {docstore.search(ids[i]).metadata.get("source") for i in row if i != -1} or None
+        for row in indices
+    ]
+
+
+def prefetch_legal_search(queries: List[str], k: int = SEARCH_K) -> int:
+    """
+    Runs the FAISS search for many queries at once: all queries are embedded in one
+    batch, the document-summary level (if built) is searched for all of them in one
+    call, and the whole query matrix goes through a single index `search` call,
+    restricted per query to its top documents exactly as `legal_database_search` does.
+    The results are kept so that `legal_database_search` can serve them directly.
+    Returns the number of queries that were prefetched.
+    """
+    pending = list(dict.fromkeys(query for query in queries if query))
+    if not pending:
+        return 0
+
+    active = INDEX.current()
+    with span("faiss", "batch_search", queries=len(pending)):
+        vectors = get_embedder().encode(pending)
+        top_sources = _top_document_sources_batch(active, vectors)
+        results = active.index.search_batch(vectors, k, top_sources)
+
+    stored = 0
+    with _prefetched_lock:
+        for query, sources, docs in zip(pending, top_sources, results):
+            # No chunk of the top documents: the live path falls back to an unrestricted
+            # search, so leave this query to it
+            if not docs:
+                continue
+            key = _prefetch_key(query, sources)
+            _prefetched_results[key] = (active.version, k, docs)
+            _prefetched_results.move_to_end(key)
+            stored += 1
+        while len(_prefetched_results) > MAX_PREFETCHED_QUERIES:
+            _prefetched_results.popitem(last=False)
+
+    print(f"---PREFETCHED FAISS RESULTS FOR {stored} QUERIES---")
+    return stored
+
+
+def _top_document_sources(active, query: str) -> Optional[set]:
+    """First retrieval level: the documents whose precomputed summaries best match the query."""
+    summary_store = get_summary_store(active)
+    if summary_store is None:
+        return None
+    with span("faiss", "summary_search"):
+        summary_docs = summary_store.similarity_search(query, k=SUMMARY_TOP_DOCS)
+    return {doc.metadata.get("source") for doc in summary_docs} or None
 
 
 # -------------------------
 # FAISS Legal DB Tool (Updated to return Document objects)
 # -------------------------
 @tool
-def legal_database_search(query: str) -> List[Document]:
+def legal_database_search(
+    query: str,
+    k: int = SEARCH_K,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    per_document_cap: int = MMR_PER_DOCUMENT_CAP,
+) -> List[Document]:
     """
     Search against a pre-indexed FAISS vector store of Indian laws and cases.
     Returns a list of Document objects with page content and metadata.
+    With rerank, a pool of max(MMR_FETCH_K, k * RERANK_FETCH_FACTOR) candidates is
+    reranked by maximal marginal relevance, with at most per_document_cap chunks per
+    document while others are available, so near-duplicate chunks do not crowd out
+    other sources (and a pool of few documents still yields k results).
+    When the summary index exists, only chunks of the top-matching documents are searched.
+    Filters ({"doc_type": "statute", "year": [2024, 2025]}) restrict the chunks, and
+    shards that hold no matching chunks are not searched at all.
     """
     try:
-        FAISS_INDEX_PATH = "data/faiss_index"
-        embedding_model = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
-        db = FAISS.load_local(
-            FAISS_INDEX_PATH, embedding_model, allow_dangerous_deserialization=True
-        )
+        # One version for the whole search, even if a new one is swapped in meanwhile
+        active = INDEX.current()
+        index = active.index
+        filters = validate_filters(filters)
+
+        # Second level: restrict the chunk search to the top documents
+        top_sources = _top_document_sources(active, query)
 
-        retrieved_docs = db.similarity_search_with_score(query, k=5)
+        if not rerank and not filters:
+            with _prefetched_lock:
+                prefetched = _prefetched_results.get(_prefetch_key(query, top_sources))
+            if prefetched is not None and prefetched[0] == active.version and prefetched[1] >= k:
+                record_cache("faiss_prefetch", "hit")
+                return list(prefetched[2][:k])
+
+        if rerank:
+            fetch_k = max(MMR_FETCH_K, k * RERANK_FETCH_FACTOR)
+            with span("faiss", "mmr_search", k=k, pool=fetch_k):
+                candidates = index.search(query, fetch_k, filters, top_sources, with_vectors=True)
+                if not candidates and top_sources is not None:
+                    candidates = index.search(query, fetch_k, filters, with_vectors=True)
+                if not candidates:
+                    return []
+                selected = mmr_select(
+                    np.array(get_embedder().embed_query(query), dtype=np.float32),
+                    np.stack([vector for _, _, vector in candidates]),
+                    k,
+                    lambda_mult=MMR_LAMBDA,
+                    groups=[doc.metadata.get("source") for _, doc, _ in candidates],
+                    per_group_cap=per_document_cap,
+                )
+            return [candidates[i][1] for i in selected]
+
+        with span("faiss", "similarity_search", hierarchical=top_sources is not None):
+            retrieved_docs = index.search(query, k, filters, top_sources) if top_sources else []
+            if not retrieved_docs:
+                retrieved_docs = index.search(query, k, filters)
 
         # You'll need to ensure your FAISS index stores metadata for each document,
         # such as the file name, case name, or source.
 
-        return [doc[0] for doc in retrieved_docs]  # Return list of Document objects
+        return [doc for _, doc in retrieved_docs]  # Return list of Document objects
 
     except FileNotFoundError:
         return [Document(page_content=f"FAISS index not found at {FAISS_INDEX_PATH}.")]
@@ -66,62 +222,139 @@ def legal_database_search(query: str) -> List[Document]:
 # -------------------------
 # Research Function (Updated to handle structured output and sources)
 # -------------------------
-def perform_research(state: AgentState) -> dict:
-    """Performs both FAISS and web searches in parallel."""
-    print("---PERFORMING RESEARCH---")
-    query = state["query"]
-
-    tavily_api_key = os.getenv("TAVILY_API_KEY")
-    if not tavily_api_key:
-        raise ValueError("TAVILY_API_KEY environment variable not set.")
-
-    # This is the updated TavilySearch class name
-    web_search_tool = TavilySearch(max_results=5, tavily_api_key=tavily_api_key)
-
+def _retrieve(
+    query: str,
+    k: int = SEARCH_K,
+    rerank: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    per_document_cap: int = MMR_PER_DOCUMENT_CAP,
+):
+    """Runs the FAISS and web searches for one query in parallel."""
     rag_chain = RunnableParallel(
         {
-            "faiss_search_results": lambda x: legal_database_search.invoke(x["query"]),
-            "web_search_results": lambda x: web_search_tool.invoke(x["query"]),
+            "faiss_search_results": lambda x: legal_database_search.invoke({
+                "query": x["query"],
+                "k": k,
+                "rerank": rerank,
+                "filters": filters,
+                "per_document_cap": per_document_cap,
+            }),
+            # Served from the persistent web cache; Tavily is only called on a miss
+            "web_search_results": lambda x: cached_web_search(x["query"]),
         }
     )
 
     results = rag_chain.invoke({"query": query})
 
     faiss_docs = results.get("faiss_search_results", [])
-    # This is now a list of strings
-    web_results_list_of_strings = results.get("web_search_results", [])
-
-    # --- THIS IS THE CORRECTED LOGIC ---
-    sources = []
-
-    # Process FAISS sources
-    faiss_content = ""
-    for doc in faiss_docs:
-        faiss_content += doc.page_content + "\n\n"
-        if doc.metadata:
-            sources.append({"type": "document", "metadata": doc.metadata})
-
-    # Process web sources (now correctly handles a list of strings)
-    web_content = ""
-    for result_string in web_results_list_of_strings:
-        web_content += result_string + "\n\n"
-        # Since we only get the content string, we can't extract a separate URL/title.
-        # We'll just add the content as the source.
-        sources.append(
-            {
-                "type": "web",
-                "content": result_string,
-            }
-        )
+    # List of {"url", "title", "content"} dicts
+    web_results = results.get("web_search_results", [])
+
+    # Passage text is stored once in the source registry; state only carries IDs
+    faiss_ids = [register_document(doc) for doc in faiss_docs]
+    web_ids = [register_web_result(result) for result in web_results]
+    return faiss_ids, web_ids
+
+
+def _search_options(config: RunnableConfig = None) -> dict:
+    """Retrieval depth, reranking and metadata filters of the current request."""
+    return {
+        "k": pipeline_setting(config, "search_k", SEARCH_K),
+        "rerank": pipeline_setting(config, "rerank", False),
+        "filters": pipeline_setting(config, "search_filters", None),
+        "per_document_cap": pipeline_setting(config, "per_document_cap", MMR_PER_DOCUMENT_CAP),
+    }
+
+
+def perform_research(state: AgentState, config: RunnableConfig = None) -> dict:
+    """Performs both FAISS and web searches in parallel."""
+    print("---PERFORMING RESEARCH---")
+    query = state.get("rewritten_query") or state["query"]
+
+    faiss_ids, web_ids = _retrieve(query, **_search_options(config))
 
     print("---RESEARCH COMPLETE---")
 
     return {
-        "faiss_search_results": faiss_content,
-        "web_search_results": web_content,
-        "sources": sources,
-        "intermediate_steps": [
-            f"FAISS Results: {faiss_content}",
-            f"Web Results: {web_content}",
-        ],
-    }
\ No newline at end of file
+        "faiss_search_results": faiss_ids,
+        "web_search_results": web_ids,
+        "sources": faiss_ids + web_ids,
+    }
+
+
+def _query_similarity(a: str, b: str) -> float:
+    """Cosine similarity of two queries under the index's embedding model."""
+    try:
+        a_vec, b_vec = get_embedder().encode([a, b])
+        return float(a_vec @ b_vec)
+    except Exception as e:
+        print(f"Query similarity unavailable, running delta retrieval: {e}")
+        return 0.0
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _faiss_delta(query: str, known_ids: List[str], options: dict) -> List[str]:
+    """FAISS-only retrieval for the rewritten query, keeping just the chunks not already retrieved."""
+    docs = legal_database_search.invoke({"query": query, **options})
+    known = set(known_ids)
+    return [source_id for source_id in map(register_document, docs) if source_id not in known]
+
+
+def speculative_rewrite_and_research(state: AgentState, config: RunnableConfig = None) -> dict:
+    """
+    First research cycle with speculation: the raw query is searched (FAISS + web) while
+    the query rewrite is still in flight. Once the rewrite lands, only a FAISS search is
+    run for the rewritten query (skipped if it is nearly identical to the raw query) and
+    its new chunks are added; the web results of the raw query are kept, so speculation
+    never costs a second web search.
+    """
+    print("---SPECULATIVE REWRITE + RESEARCH---")
+    query = state["query"]
+    options = _search_options(config)
+
+    parallel = RunnableParallel(
+        {
+            "rewrite": lambda x: _timed(rewrite_query, x),
+            "research": lambda x: _timed(lambda q: _retrieve(q, **options), x["query"]),
+        }
+    )
+    results = parallel.invoke(state)
+    rewrite_result, rewrite_seconds = results["rewrite"]
+    (faiss_ids, web_ids), research_seconds = results["research"]
+    rewritten = rewrite_result.get("rewritten_query") or query
+
+    delta_seconds = 0.0
+    delta_ids: List[str] = []
+    delta_used = False
+    if normalize_query(rewritten) != normalize_query(query) and (
+        _query_similarity(query, rewritten) < SPECULATION_SIMILARITY_THRESHOLD
+    ):
+        delta_ids, delta_seconds = _timed(_faiss_delta, rewritten, faiss_ids, options)
+        faiss_ids = merge_source_ids(faiss_ids, delta_ids)
+        delta_used = True
+
+    # Sequential baseline: rewrite, then a full retrieval (as long as the speculative one)
+    sequential_seconds = rewrite_seconds + research_seconds
+    actual_seconds = max(rewrite_seconds, research_seconds) + delta_seconds
+    speculation = {
+        "rewrite_seconds": round(rewrite_seconds, 3),
+        "speculative_retrieval_seconds": round(research_seconds, 3),
+        "delta_retrieval_seconds": round(delta_seconds, 3),
+        "delta_retrieval": delta_used,
+        "delta_new_chunks": len(delta_ids),
+        "latency_saved_seconds": round(sequential_seconds - actual_seconds, 3),
+    }
+    print(f"---SPECULATION: saved {speculation['latency_saved_seconds']}s on the first cycle---")
+
+    return {
+        "rewritten_query": rewritten,
+        "faiss_search_results": faiss_ids,
+        "web_search_results": web_ids,
+        "sources": faiss_ids + web_ids,
+        "speculation": speculation,
+    }
@@ -0,0 +1,188 @@
+# LARA/legal_rag/sources.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from langchain_core.documents import Document
+
+# ------------------------------
+# Config
+# ------------------------------
+MAX_SOURCE_PASSAGES = int(os.getenv("MAX_SOURCE_PASSAGES", "50000"))
+# Word budget for all source excerpts shown to the LLM in one prompt
+SOURCE_EXCERPT_BUDGET_WORDS = 1200
+
+
+# ------------------------------
+# Source Registry
+# ------------------------------
+class SourceRegistry:
+    """
+    Stores every retrieved passage once, keyed by a hash of its location and content.
+    Graph state only carries the IDs; the text is fetched from here when a prompt
+    actually needs it. Cited sources are also persisted with the chat (db.save_sources),
+    so citation IDs in saved answers keep resolving after a restart.
+    """
+
+    def __init__(self, max_passages: int = MAX_SOURCE_PASSAGES):
+        self.max_passages = max_passages
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._passages: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        source_type: str,
+        text: str,
+        url: Optional[str] = None,
+        file: Optional[str] = None,
+        title: Optional[str] = None,
+        start: Optional[int] = None,
+    ) -> str:
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        # The same passage from two files or URLs is two sources, each citing its own location
+        location = f"{source_type}|{url or file or ''}|{start}|{content_hash}"
+        source_id = f"src_{hashlib.sha1(location.encode('utf-8')).hexdigest()[:12]}"
+        with self._lock:
+            if source_id in self._records:
+                self._records.move_to_end(source_id)
+                return source_id
+            self._records[source_id] = {
+                "id": source_id,
+                "type": source_type,
+                "url": url,
+                "file": file,
+                "title": title,
+                "start": start,
+                "end": start + len(text) if start is not None else None,
+                "content_hash": content_hash,
+            }
+            self._passages[source_id] = text
+            while len(self._records) > self.max_passages:
+                evicted, _ = self._records.popitem(last=False)
+                self._passages.pop(evicted, None)
+        return source_id
+
+    def export(self, source_id: str) -> Optional[Dict[str, Any]]:
+        """The record with its passage text, as persisted by db.save_sources."""
+        with self._lock:
+            record = self._records.get(source_id)
+            return {**record, "content": self._passages[source_id]} if record else None
+
+    def restore(self, record: Dict[str, Any]):
+        """Puts a persisted source (export format) back under its original ID."""
+        record = dict(record)
+        text = record.pop("content")
+        with self._lock:
+            self._records[record["id"]] = record
+            self._records.move_to_end(record["id"])
+            self._passages[record["id"]] = text
+            while len(self._records) > self.max_passages:
+                evicted, _ = self._records.popitem(last=False)
+                self._passages.pop(evicted, None)
+
+    def get(self, source_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(source_id)
+            return dict(record) if record else None
+
+    def get_text(self, source_id: str) -> str:
+        with self._lock:
+            return self._passages.get(source_id, "")
+
+
+SOURCE_REGISTRY = SourceRegistry()
+
+
+def register_document(doc: Document) -> str:
+    """Registers a FAISS chunk, keeping its file and character offset for citation."""
+    metadata = doc.metadata or {}
+    return SOURCE_REGISTRY.register(
+        "document",
+        doc.page_content,
+        file=metadata.get("source"),
+        title=metadata.get("case_name"),
+        start=metadata.get("start_index"),
+    )
+
+
+def register_web_result(result: Dict[str, str]) -> str:
+    """Registers a structured web search result."""
+    return SOURCE_REGISTRY.register(
+        "web", result.get("content", ""), url=result.get("url"), title=result.get("title")
+    )
+
+
+# ------------------------------
+# State Helpers
+# ------------------------------
+def merge_source_ids(existing: List[str], new: List[str]) -> List[str]:
+    """LangGraph reducer for `sources`: appends new IDs, skipping ones already present."""
+    merged = list(existing or [])
+    seen = set(merged)
+    for source_id in new or []:
+        if source_id not in seen:
+            seen.add(source_id)
+            merged.append(source_id)
+    return merged
+
+
+def sources_text(source_ids: List[str]) -> str:
+    """Fetches and joins the passage text behind a list of source IDs."""
+    return "".join(SOURCE_REGISTRY.get_text(source_id) + "\n\n" for source_id in source_ids)
+
+
+def _label(record: Dict[str, Any]) -> str:
+    if record["type"] == "web":
+        return f"{record.get('title') or 'Web result'} — {record.get('url') or 'unknown URL'}"
+    label = record.get("title") or os.path.basename(record.get("file") or "") or "Legal database"
+    if record.get("start") is not None:
+        label += f" (chars {record['start']}-{record['end']})"
+    return label
+
+
+def format_numbered_sources(source_ids: List[str], budget_words: int = SOURCE_EXCERPT_BUDGET_WORDS) -> str:
+    """Renders sources as a numbered list with short excerpts for citation in prompts."""
+    if not source_ids:
+        return "No sources retrieved."
+    excerpt_words = max(20, budget_words // len(source_ids))
+    lines = []
+    for n, source_id in enumerate(source_ids, start=1):
+        record = SOURCE_REGISTRY.get(source_id)
+        if record is None:
+            continue
+        excerpt = " ".join(SOURCE_REGISTRY.get_text(source_id).split()[:excerpt_words])
+        lines.append(f"[{n}] {_label(record)}\n{excerpt}")
+    return "\n\n".join(lines)
+
+
+def build_citations(source_ids: List[str]) -> List[Dict[str, Any]]:
+    """Numbered citations ([1], [2], ...) resolving to source IDs and their locations."""
+    citations = []
+    for n, source_id in enumerate(source_ids, start=1):
+        record = SOURCE_REGISTRY.get(source_id)
+        if record is None:
+            continue
+        citations.append({
+            "number": n,
+            "source_id": source_id,
+            "type": record["type"],
+            "title": record.get("title"),
+            "url": record.get("url"),
+            "file": record.get("file"),
+            "start": record.get("start"),
+            "end": record.get("end"),
+        })
+    return citations
+
+
+def format_references(citations: List[Dict[str, Any]]) -> str:
+    """Reference list appended to the final analysis so every [n] resolves to an ID."""
+    if not citations:
+        return ""
+    lines = ["**References**"]
+    for citation in citations:
+        lines.append(f"[{citation['number']}] {_label(citation)} ({citation['source_id']})")
+    return "\n".join(lines)
@@ -4,19 +4,32 @@ import asyncio  # noqa: F401
 import json
 from typing import TypedDict, Annotated, List, Any
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import BaseMessage  # noqa: F401
-
-# Imports for Hybrid Evaluation
-from sentence_transformers import SentenceTransformer, util
+from langchain_core.runnables import RunnableConfig
+from legal_rag.providers import get_llm, invoke_llm
+from legal_rag.pipeline_config import pipeline_setting
+from legal_rag.doc_summaries import corpus_digest
+from legal_rag.reflection import REFLECTION_MODE, REFLECTIONS, single_call_reflection
+from legal_rag.prompt_compression import PROMPT_COMPRESSION, COMPRESSION_BUDGET_TOKENS, compress_evidence
+from legal_rag.sources import (
+    merge_source_ids,
+    sources_text,
+    format_numbered_sources,
+    build_citations,
+    format_references,
+)
+
+# Shared embedder for Hybrid Evaluation (torch or int8 ONNX backend)
+from legal_rag.embeddings import get_embedder
 
 load_dotenv()
 
 # ------------------------------
 # Config
 # ------------------------------
-FAST_MODE = True  # ✅ Toggle True = faster (trims), False = detailed chunking
+# Defaults when a request carries no pipeline profile (see legal_rag/pipeline_config.py)
+FAST_MODE = True  # ✅ Toggle True = faster (one call on compressed text), False = detailed chunking
 CHUNK_SIZE = 1200
 MAX_CHUNKS = 3
 
@@ -25,7 +38,7 @@ MAX_CHUNKS = 3
 # ------------------------------
 # Load the model once when the server starts
 try:
-    EMBEDDING_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    EMBEDDING_MODEL = get_embedder()
     print("Embedding model for evaluation loaded successfully.")
 except Exception as e:
     print(f"Error loading embedding model: {e}")
@@ -39,34 +52,28 @@ except Exception as e:
 class AgentState(TypedDict):
     query: str
     intermediate_steps: Annotated[List[Any], operator.add]
-    web_search_results: str
-    faiss_search_results: str
+    web_search_results: List[str]
+    faiss_search_results: List[str]
     final_analysis: str
     research_complete: bool
     chat_history: List[BaseMessage]
-    sources: Annotated[List[dict], operator.add]
+    sources: Annotated[List[str], merge_source_ids]
+    citations: List[dict]
     role: str
+    rewritten_query: str
     research_cycles: Annotated[int, operator.add]
     evaluation_score: str # This will store the formatted evaluation string
+    evaluation_metrics: dict  # Numeric scores behind evaluation_score
+    research_context: str  # Context the final analysis was generated from, reused by evaluation
 
 
 # ------------------------------
 # Utility Functions
 # ------------------------------
-def get_llm():
-    """Initialize Groq LLM with env key."""
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if not groq_api_key:
-        raise ValueError("GROQ_API_KEY environment variable not set.")
-    return ChatGroq(
-        model="llama-3.1-8b-instant", temperature=0.2, groq_api_key=groq_api_key
-    )
-
-
 def safe_invoke(llm, prompt, vars):
     """Run a prompt safely and return text content."""
     chain = prompt | llm
-    result = chain.invoke(vars)
+    result = invoke_llm(chain, vars)
     return getattr(result, "content", str(result))
 
 
@@ -81,16 +88,36 @@ def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, max_chunks: int = MAX_CH
     return chunks
 
 
-def summarize_long_text(text: str, label: str, query: str) -> str:
+def summary_options(config: RunnableConfig = None) -> dict:
+    """Summarization strategy of the current request's pipeline profile."""
+    return {
+        "fast_mode": pipeline_setting(config, "fast_mode", FAST_MODE),
+        "chunk_size": pipeline_setting(config, "chunk_size", CHUNK_SIZE),
+        "max_chunks": pipeline_setting(config, "max_chunks", MAX_CHUNKS),
+        "compression": pipeline_setting(config, "prompt_compression", PROMPT_COMPRESSION),
+        "budget_tokens": pipeline_setting(config, "compression_budget_tokens", COMPRESSION_BUDGET_TOKENS),
+    }
+
+
+def summarize_long_text(
+    text: str,
+    label: str,
+    query: str,
+    fast_mode: bool = FAST_MODE,
+    chunk_size: int = CHUNK_SIZE,
+    max_chunks: int = MAX_CHUNKS,
+    compression: str = PROMPT_COMPRESSION,
+    budget_tokens: int = COMPRESSION_BUDGET_TOKENS,
+) -> str:
     """Summarize text with fast or detailed strategy."""
     if not text:
         return f"No {label} found."
 
     llm = get_llm()
 
-    # ✅ Fast mode: just trim input
-    if FAST_MODE:
-        trimmed = " ".join(text.split()[:2000])
+    # ✅ Fast mode: one call on the query-relevant sentences (or the first words, for "trim")
+    if fast_mode:
+        trimmed = compress_evidence(text, query, budget_tokens, compression, label)
         prompt = PromptTemplate(
             template=f"""Summarize the following {label} (<200 words), focusing on acts, sections, judgments.
 
@@ -104,7 +131,7 @@ def summarize_long_text(text: str, label: str, query: str) -> str:
 
     # ✅ Detailed mode: chunk + merge
     chunk_summaries = []
-    for chunk in chunk_text(text):
+    for chunk in chunk_text(text, chunk_size, max_chunks):
         prompt = PromptTemplate(
             template=f"""Summarize this {label} chunk (<120 words),
             focusing only on acts, sections, judgments.
@@ -134,18 +161,44 @@ def summarize_long_text(text: str, label: str, query: str) -> str:
     )
 
 
+def research_context(state: AgentState, config: RunnableConfig = None) -> str:
+    """
+    Reflections from every research cycle (compressed if too long) plus the numbered sources
+    they were based on. Used as the context for the final analysis and its evaluation.
+    """
+    all_steps = "\n".join(state["intermediate_steps"])
+
+    # Compress steps if too long; the numbered sources stay intact so [n] citations resolve
+    if len(all_steps.split()) > 1500:
+        all_steps = summarize_long_text(
+            all_steps, "research steps", state["query"], **summary_options(config)
+        )
+    return all_steps + "\n\nNumbered Sources:\n" + format_numbered_sources(state.get("sources", []))
+
+
 # ------------------------------
 # Citizen-focused Functions
 # ------------------------------
-def summarize_and_reflect(state: AgentState) -> dict:
+def summarize_and_reflect(state: AgentState, config: RunnableConfig = None) -> dict:
     """Summarizes the findings and reflects on the research to identify gaps."""
     print("---SUMMARIZING & REFLECTING---")
     query = state["query"]
 
-    faiss_summary = summarize_long_text(
-        state["faiss_search_results"], "FAISS results", query
+    if pipeline_setting(config, "reflection_mode", REFLECTION_MODE) == "single":
+        update = single_call_reflection(
+            query, state["faiss_search_results"] + state["web_search_results"], "citizen"
+        )
+        if update is not None:
+            return update
+
+    options = summary_options(config)
+    # Corpus results come with index-time summaries; only fall back to an LLM call without them
+    faiss_summary = corpus_digest(state["faiss_search_results"]) or summarize_long_text(
+        sources_text(state["faiss_search_results"]), "FAISS results", query, **options
+    )
+    web_summary = summarize_long_text(
+        sources_text(state["web_search_results"]), "Web results", query, **options
     )
-    web_summary = summarize_long_text(state["web_search_results"], "Web results", query)
 
     llm = get_llm()
     summary_prompt = PromptTemplate(
@@ -170,22 +223,20 @@ def summarize_and_reflect(state: AgentState) -> dict:
     )
 
     is_complete = "YES" in summary.upper()
+    REFLECTIONS.inc(mode="multi", outcome="ok")
 
+    # intermediate_steps is an additive channel, so only the new reflection is returned
     return {
-        "intermediate_steps": state["intermediate_steps"] + [summary],
+        "intermediate_steps": [summary],
         "research_complete": is_complete,
     }
 
 
-def generate_final_analysis(state: AgentState) -> dict:
+def generate_final_analysis(state: AgentState, config: RunnableConfig = None) -> dict:
     """Generates the final, structured legal analysis."""
     print("---GENERATING FINAL ANALYSIS---")
     query = state["query"]
-    all_steps = "\n".join(state["intermediate_steps"])
-
-    # Compress steps if too long
-    if len(all_steps.split()) > 1500:
-        all_steps = summarize_long_text(all_steps, "research steps", query)
+    all_steps = research_context(state, config)
 
     llm = get_llm()
     analysis_prompt = PromptTemplate(
@@ -196,7 +247,8 @@ def generate_final_analysis(state: AgentState) -> dict:
         - **Legal Context**
         - **Case Law Summary**
         - **Analysis and Recommendations**
-        - **Sources**
+
+        Cite the numbered sources inline as [1], [2], ... wherever they support a point.
 
         Query: {query}
         Research Steps: {all_steps}
@@ -209,13 +261,18 @@ def generate_final_analysis(state: AgentState) -> dict:
         llm, analysis_prompt, {"query": query, "all_steps": all_steps}
     )
 
-    return {"final_analysis": final_analysis}
+    citations = build_citations(state.get("sources", []))
+    references = format_references(citations)
+    if references:
+        final_analysis = f"{final_analysis}\n\n{references}"
+
+    return {"final_analysis": final_analysis, "citations": citations, "research_context": all_steps}
 
 
 # ------------------------------
 # New Lawyer-focused Functions
 # ------------------------------
-def summarize_and_reflect_lawyer(state: AgentState) -> dict:
+def summarize_and_reflect_lawyer(state: AgentState, config: RunnableConfig = None) -> dict:
     """
     Summarizes findings and reflects on the research from a lawyer's perspective.
     Identifies if enough legal precedents and arguments have been found.
@@ -223,10 +280,21 @@ def summarize_and_reflect_lawyer(state: AgentState) -> dict:
     print("---SUMMARIZING & REFLECTING FOR LAWYER---")
     query = state["query"]
 
-    faiss_summary = summarize_long_text(
-        state["faiss_search_results"], "FAISS results", query
+    if pipeline_setting(config, "reflection_mode", REFLECTION_MODE) == "single":
+        update = single_call_reflection(
+            query, state["faiss_search_results"] + state["web_search_results"], "lawyer"
+        )
+        if update is not None:
+            return update
+
+    options = summary_options(config)
+    # Corpus results come with index-time summaries; only fall back to an LLM call without them
+    faiss_summary = corpus_digest(state["faiss_search_results"]) or summarize_long_text(
+        sources_text(state["faiss_search_results"]), "FAISS results", query, **options
+    )
+    web_summary = summarize_long_text(
+        sources_text(state["web_search_results"]), "Web results", query, **options
     )
-    web_summary = summarize_long_text(state["web_search_results"], "Web results", query)
 
     llm = get_llm()
     summary_prompt = PromptTemplate(
@@ -251,22 +319,20 @@ def summarize_and_reflect_lawyer(state: AgentState) -> dict:
     )
 
     is_complete = "YES" in summary.upper()
+    REFLECTIONS.inc(mode="multi", outcome="ok")
 
+    # intermediate_steps is an additive channel, so only the new reflection is returned
     return {
-        "intermediate_steps": state["intermediate_steps"] + [summary],
+        "intermediate_steps": [summary],
         "research_complete": is_complete,
     }
 
 
-def generate_lawyer_analysis(state: AgentState) -> dict:
+def generate_lawyer_analysis(state: AgentState, config: RunnableConfig = None) -> dict:
     """Generates a structured legal analysis report for a lawyer."""
     print("---GENERATING LAWYER ANALYSIS REPORT---")
     query = state["query"]
-    all_steps = "\n".join(state["intermediate_steps"])
-
-    # Compress steps if too long
-    if len(all_steps.split()) > 1500:
-        all_steps = summarize_long_text(all_steps, "research steps", query)
+    all_steps = research_context(state, config)
 
     llm = get_llm()
     analysis_prompt = PromptTemplate(
@@ -277,7 +343,8 @@ def generate_lawyer_analysis(state: AgentState) -> dict:
         - **Relevant Statutes & Acts**: List of key legal provisions from Indian Law.
         - **Past Case Precedents & Judgments**: A detailed summary of related case studies with names and citations.
         - **Key Legal Arguments & Points**: Actionable points and arguments derived from the research.
-        - **Sources**: A clear list of all web pages and internal documents used.
+
+        Cite the numbered sources inline as [1], [2], ... for every statute, case and argument they support.
 
         Case Details: {query}
         Research Steps: {all_steps}
@@ -290,18 +357,24 @@ def generate_lawyer_analysis(state: AgentState) -> dict:
         llm, analysis_prompt, {"query": query, "all_steps": all_steps}
     )
 
-    return {"final_analysis": final_analysis}
+    citations = build_citations(state.get("sources", []))
+    references = format_references(citations)
+    if references:
+        final_analysis = f"{final_analysis}\n\n{references}"
+
+    return {"final_analysis": final_analysis, "citations": citations, "research_context": all_steps}
 
 
 # ----------------------------------------------------
 # HYBRID EVALUATION HELPER FUNCTION
 # ----------------------------------------------------
-def evaluate_analysis(llm, query: str, all_steps: str, analysis: str) -> str:
+def score_analysis(llm, query: str, all_steps: str, analysis: str) -> dict:
     """
     Evaluates the generated analysis using a hybrid method:
     - Gets LLM-based scores (Relevance, Context Faithfulness, Clarity)
     - Computes semantic similarity between query/context and analysis
     - Combines them into a final confidence score
+    Returns the individual scores as numbers.
     """
 
     print("---EVALUATING FINAL ANALYSIS (HYBRID CONFIDENCE METHOD)---")
@@ -346,12 +419,11 @@ def evaluate_analysis(llm, query: str, all_steps: str, analysis: str) -> str:
 
     # Step 2: Compute semantic similarities (Using GLOBAL model for performance)
     if EMBEDDING_MODEL:
-        emb_query = EMBEDDING_MODEL.encode(query, convert_to_tensor=True)
-        emb_context = EMBEDDING_MODEL.encode(all_steps, convert_to_tensor=True)
-        emb_analysis = EMBEDDING_MODEL.encode(analysis, convert_to_tensor=True)
+        # One batched call; vectors are normalized, so the dot product is the cosine
+        emb_query, emb_context, emb_analysis = EMBEDDING_MODEL.encode([query, all_steps, analysis])
 
-        relevance_sim = util.cos_sim(emb_analysis, emb_query).item()
-        context_sim = util.cos_sim(emb_analysis, emb_context).item()
+        relevance_sim = float(emb_analysis @ emb_query)
+        context_sim = float(emb_analysis @ emb_context)
         
         # Step 3: Compute normalized semantic similarity (scale 1–5)
         semantic_confidence = ((relevance_sim + context_sim) / 2) * 5
@@ -363,41 +435,59 @@ def evaluate_analysis(llm, query: str, all_steps: str, analysis: str) -> str:
     final_confidence = (0.6 * llm_score + 0.4 * semantic_confidence)
     final_confidence = round(min(final_confidence, 5.0), 2)
 
-    # Step 5: Return formatted result
+    return {
+        "relevance_score": relevance,
+        "context_faithfulness_score": faithfulness,
+        "clarity_score": clarity,
+        "llm_score": round(llm_score, 2),
+        "semantic_confidence": round(semantic_confidence, 2),
+        "confidence": final_confidence,
+        "justification": justification,
+    }
+
+
+def format_evaluation(scores: dict) -> str:
+    """Formats the scores from score_analysis as the summary appended to the analysis."""
     result = f"""
     --- Evaluation Summary ---
-    🔹 Relevance Score: {relevance}/5
-    🔹 Context Faithfulness Score: {faithfulness}/5
-    🔹 Clarity Score: {clarity}/5
-    🔹 LLM Weighted Average: {round(llm_score, 2)}/5
+    🔹 Relevance Score: {scores['relevance_score']}/5
+    🔹 Context Faithfulness Score: {scores['context_faithfulness_score']}/5
+    🔹 Clarity Score: {scores['clarity_score']}/5
+    🔹 LLM Weighted Average: {scores['llm_score']}/5
 
-    🔸 Semantic Similarity (Query + Context): {round(semantic_confidence, 2)}/5
-    ✅ Overall Confidence Score: {final_confidence} / 5
+    🔸 Semantic Similarity (Query + Context): {scores['semantic_confidence']}/5
+    ✅ Overall Confidence Score: {scores['confidence']} / 5
 
-    💬 Justification: {justification}
+    💬 Justification: {scores['justification']}
     """
     return result
 
 
+def evaluate_analysis(llm, query: str, all_steps: str, analysis: str) -> str:
+    """Scores the analysis with the hybrid method and returns the formatted summary."""
+    return format_evaluation(score_analysis(llm, query, all_steps, analysis))
+
+
 # ----------------------------------------------------
 # HYBRID EVALUATION GRAPH NODE
 # ----------------------------------------------------
-def evaluate_hybrid_response(state: AgentState) -> dict:
+def evaluate_hybrid_response(state: AgentState, config: RunnableConfig = None) -> dict:
     """
     Graph node to evaluate the final analysis using the hybrid method.
     Calls the 'evaluate_analysis' helper function.
     """
     print("---STARTING HYBRID EVALUATION NODE---")
+
+    # Off for profiles without evaluation and for requests degraded by admission control
+    if pipeline_setting(config, "skip_evaluation", False):
+        print("---EVALUATION: Skipped for this request.---")
+        return {"evaluation_score": "", "evaluation_metrics": {}}
     
     query = state["query"]
     final_analysis = state["final_analysis"]
     
-    # Re-create 'all_steps' from intermediate steps
-    all_steps = "\n".join(state["intermediate_steps"])
-    
-    # Compress steps if too long (matching logic in generate_final_analysis)
-    if len(all_steps.split()) > 1500:
-        all_steps = summarize_long_text(all_steps, "research steps", query)
+    # The context generate_final_analysis saw (rebuilt only if the state predates it)
+    all_steps = state.get("research_context") or research_context(state, config)
 
     if not final_analysis:
         print("---EVALUATION: No final analysis to evaluate.---")
@@ -405,15 +495,15 @@ def evaluate_hybrid_response(state: AgentState) -> dict:
 
     llm = get_llm() # Get the LLM instance
     
-    # Call the helper function to get the formatted string
-    evaluation_summary = evaluate_analysis(
+    # Score once, keeping the numbers for benchmarks alongside the formatted string
+    scores = score_analysis(
         llm, 
         query=query, 
         all_steps=all_steps, 
         analysis=final_analysis
     )    
     # Return the raw summary string to be stored in the state
-    return {"evaluation_score": evaluation_summary}
+    return {"evaluation_score": format_evaluation(scores), "evaluation_metrics": scores}
 
 
 # ----------------------------------------------------
@@ -428,6 +518,9 @@ def combine_analysis_and_evaluation(state: AgentState) -> dict:
     
     final_analysis = state.get("final_analysis", "No analysis was generated.")
     evaluation_summary = state.get("evaluation_score", "No evaluation was performed.")
+    if not evaluation_summary:
+        # Evaluation was skipped for this request; return the analysis unchanged
+        return {"final_analysis": final_analysis}
     
     # Combine them with clear separation
     combined_response = f"{final_analysis}\n\n{evaluation_summary}"
@@ -0,0 +1,284 @@
+# LARA/legal_rag/tracing.py
+
+import time
+import uuid
+import functools
+import bisect
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+
+# ------------------------------
+# Config
+# ------------------------------
+# Latency buckets (seconds) shared by every span histogram: 1ms .. 2min
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_STORED_TRACES = 1000
+
+
+# ------------------------------
+# Metrics Registry (Prometheus text format)
+# ------------------------------
+def _escape_label_value(value: Any) -> str:
+    # Exposition format: backslash, double quote and line feed must be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = _format_labels(key + (("le", str(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, Any]" = OrderedDict()
+        self._gauge_callbacks: List[Tuple[str, str, Callable[[], Dict[tuple, float]]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help))
+
+    def histogram(self, name: str, help: str) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help))
+
+    def gauge_callback(self, name: str, help: str, fn: Callable[[], Dict[tuple, float]]):
+        """Registers a gauge evaluated at scrape time; fn returns {label pairs: value}."""
+        self._gauge_callbacks.append((name, help, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for name, help, fn in self._gauge_callbacks:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+            try:
+                for key, value in fn().items():
+                    lines.append(f"{name}{_format_labels(tuple(key))} {value}")
+            except Exception as e:
+                print(f"Metrics: gauge '{name}' failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+SPAN_SECONDS = METRICS.histogram("lara_span_duration_seconds", "Duration of traced operations by kind and name.")
+LLM_TOKENS = METRICS.counter("lara_llm_tokens_total", "LLM tokens consumed, by token type and graph node.")
+CACHE_REQUESTS = METRICS.counter("lara_cache_requests_total", "Cache lookups by cache and result.")
+
+
+def record_cache(cache: str, result: str):
+    CACHE_REQUESTS.inc(cache=cache, result=result)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.cache_events.append((cache, result))
+
+
+# ------------------------------
+# Traces & Spans
+# ------------------------------
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.cache_events: List[Tuple[str, str]] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # (node, model) -> [input tokens, output tokens, LLM calls]
+        self.token_usage: Dict[Tuple[str, str], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def add_tokens(self, input_tokens: int, output_tokens: int, node: str = "other", model: str = "unknown"):
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            usage = self.token_usage.setdefault((node, model), [0, 0, 0])
+            usage[0] += input_tokens
+            usage[1] += output_tokens
+            usage[2] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "started": self.started,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "token_usage": [
+                {"node": node, "model": model, "input_tokens": i, "output_tokens": o, "calls": calls}
+                for (node, model), (i, o, calls) in self.token_usage.items()
+            ],
+            "cache_events": list(self.cache_events),
+            "spans": list(self.spans),
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("lara_trace", default=None)
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+@contextmanager
+def start_trace(trace_id: str = None):
+    """Collects every span of the enclosed request under one trace ID."""
+    trace = Trace(trace_id or uuid.uuid4().hex)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        with _traces_lock:
+            _traces[trace.trace_id] = trace
+            while len(_traces) > MAX_STORED_TRACES:
+                _traces.popitem(last=False)
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _traces_lock:
+        return _traces.get(trace_id)
+
+
+def _record_span(kind: str, name: str, start: float, seconds: float, attrs: Dict[str, Any]):
+    SPAN_SECONDS.observe(seconds, kind=kind, name=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append({
+            "kind": kind,
+            "name": name,
+            "offset_ms": round((start - trace.started) * 1000, 2),
+            "duration_ms": round(seconds * 1000, 2),
+            **attrs,
+        })
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """Times the enclosed block as a span of `kind` (node, llm, faiss, web, sqlite, ...)."""
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except Exception:
+        attrs["error"] = True
+        raise
+    finally:
+        _record_span(kind, name, wall_start, time.perf_counter() - start, attrs)
+
+
+def traced(kind: str, name: str = None):
+    """Decorator form of `span` for functions that are always timed as one operation."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Emits a span for every LangGraph node and counts LLM tokens from the responses,
+    attributed to the node that made the call.
+    """
+
+    def __init__(self):
+        self._starts: Dict[Any, tuple] = {}
+        self._llm_nodes: Dict[Any, str] = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._llm_nodes[run_id] = (metadata or {}).get("langgraph_node") or "other"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._llm_nodes[run_id] = (metadata or {}).get("langgraph_node") or "other"
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the chains nested inside it
+        if node and kwargs.get("name") == node:
+            self._starts[run_id] = (node, time.time(), time.perf_counter())
+
+    def _end(self, run_id, error: bool):
+        started = self._starts.pop(run_id, None)
+        if started:
+            node, wall_start, start = started
+            attrs = {"error": True} if error else {}
+            _record_span("node", node, wall_start, time.perf_counter() - start, attrs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, error=False)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs):
+        node = self._llm_nodes.pop(run_id, "other")
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                model = (getattr(message, "response_metadata", None) or {}).get("model_name", "unknown")
+                input_tokens = usage.get("input_tokens", 0)
+                output_tokens = usage.get("output_tokens", 0)
+                LLM_TOKENS.inc(input_tokens, type="input", node=node)
+                LLM_TOKENS.inc(output_tokens, type="output", node=node)
+                trace = _current_trace.get()
+                if trace is not None:
+                    trace.add_tokens(input_tokens, output_tokens, node, model)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs):
+        self._llm_nodes.pop(run_id, None)
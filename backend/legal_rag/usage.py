@@ -0,0 +1,45 @@
+# LARA/legal_rag/usage.py
+
+import os
+import json
+from typing import Any, Dict
+from legal_rag.tracing import Trace
+
+# ------------------------------
+# Config
+# ------------------------------
+# USD per million (input, output) tokens, by the model name the provider reports.
+# Override / extend with LLM_PRICES_PER_MTOK='{"model": [input, output]}'.
+LLM_PRICES_PER_MTOK = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "offline": (0.0, 0.0),
+    **{model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES_PER_MTOK", "{}")).items()},
+}
+# Tokens (input + output) a user may spend per UTC day; 0 = no quota
+USER_DAILY_TOKEN_QUOTA = int(os.getenv("USER_DAILY_TOKEN_QUOTA", "0"))
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Price of one call; models without a known price count as free (and show up as such)."""
+    input_price, output_price = LLM_PRICES_PER_MTOK.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def request_usage(trace: Trace) -> Dict[str, Any]:
+    """Token and cost totals of one traced request, with the per-node breakdown."""
+    by_node: Dict[str, Dict[str, Any]] = {}
+    for (node, model), (input_tokens, output_tokens, calls) in trace.token_usage.items():
+        entry = by_node.setdefault(node, {"input_tokens": 0, "output_tokens": 0, "llm_calls": 0, "cost_usd": 0.0})
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["llm_calls"] += calls
+        entry["cost_usd"] += cost_usd(model, input_tokens, output_tokens)
+    for entry in by_node.values():
+        entry["cost_usd"] = round(entry["cost_usd"], 6)
+    return {
+        "input_tokens": sum(e["input_tokens"] for e in by_node.values()),
+        "output_tokens": sum(e["output_tokens"] for e in by_node.values()),
+        "llm_calls": sum(e["llm_calls"] for e in by_node.values()),
+        "cost_usd": round(sum(e["cost_usd"] for e in by_node.values()), 6),
+        "by_node": by_node,
+    }
@@ -0,0 +1,274 @@
+# LARA/legal_rag/vector_index.py
+
+import os
+import json
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from legal_rag.tracing import span
+
+# ------------------------------
+# Config
+# ------------------------------
+# Written by data/faiss_index/faiss_indexer.py into each index version: one FAISS index
+# per shard plus this manifest (see legal_rag/index_versions.py)
+SHARD_MANIFEST = "manifest.json"
+# Name of the manifest in sharded indexes built before versioning (same shard format)
+LEGACY_SHARD_MANIFEST = "shards.json"
+# Shards are searched in parallel; FAISS releases the GIL while it scans
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "8"))
+# Chunk metadata that queries can filter on, and the shard-manifest field listing its values
+FILTERABLE_FIELDS = {"doc_type": "doc_types", "year": "years"}
+
+_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix="faiss-shard")
+
+
+def _as_set(value) -> set:
+    return set(value) if isinstance(value, (list, tuple, set)) else {value}
+
+
+def validate_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, set]]:
+    """Normalizes {"doc_type": "statute", "year": [2024, 2025]}; raises ValueError for unknown fields."""
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTERABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown search filter(s) {sorted(unknown)}. Available: {sorted(FILTERABLE_FIELDS)}")
+    return {field: _as_set(value) for field, value in filters.items()}
+
+
+# ------------------------------
+# Shards
+# ------------------------------
+class IndexShard:
+    """One independently built FAISS index and what its manifest says it contains."""
+
+    def __init__(self, name: str, store: FAISS, info: Dict[str, Any] = None):
+        info = info or {}
+        self.name = name
+        self.store = store
+        # None = unknown (e.g. a legacy single index): the shard is never skipped
+        self.sources: Optional[Set[str]] = set(info["sources"]) if "sources" in info else None
+        self.values = {
+            field: set(info[key]) for field, key in FILTERABLE_FIELDS.items() if key in info
+        }
+
+    def __len__(self) -> int:
+        return self.store.index.ntotal
+
+    def may_match(self, filters: Optional[Dict[str, set]], sources: Optional[set]) -> bool:
+        """False only if the manifest proves no chunk of this shard can pass the filters."""
+        if sources is not None and self.sources is not None and not (self.sources & sources):
+            return False
+        for field, allowed in (filters or {}).items():
+            values = self.values.get(field)
+            if values is not None and not (values & allowed):
+                return False
+        return True
+
+
+def chunk_filter(filters: Optional[Dict[str, set]], sources: Optional[set]) -> Optional[Callable]:
+    """Per-chunk metadata predicate for the shards that are searched."""
+    if not filters and sources is None:
+        return None
+
+    def matches(metadata: Dict[str, Any]) -> bool:
+        if sources is not None and metadata.get("source") not in sources:
+            return False
+        return all(metadata.get(field) in allowed for field, allowed in (filters or {}).items())
+
+    return matches
+
+
+def find_manifest(path: str) -> Optional[str]:
+    """Path of the shard manifest in an index directory (current or pre-versioning name), or None."""
+    for name in (SHARD_MANIFEST, LEGACY_SHARD_MANIFEST):
+        if os.path.exists(os.path.join(path, name)):
+            return os.path.join(path, name)
+    return None
+
+
+class ShardedIndex:
+    """
+    The chunk index as a set of shards (by document type, year or hash of the source).
+    A search embeds the query once, fans out to the shards that can match its filters
+    in parallel and merges each shard's top-k by distance with a heap. All shards use
+    the same embedder and L2 metric, so their distances are directly comparable.
+    """
+
+    def __init__(self, shards: List[IndexShard], embeddings, shard_by: str = "none"):
+        self.shards = shards
+        self.embeddings = embeddings
+        self.shard_by = shard_by
+
+    @classmethod
+    def load(cls, path: str, embeddings) -> "ShardedIndex":
+        manifest_path = find_manifest(path)
+        if manifest_path is None:
+            # Index built before sharding: the whole directory is one FAISS index
+            store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+            return cls([IndexShard("all", store)], embeddings)
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        shards = []
+        for info in manifest["shards"]:
+            store = FAISS.load_local(
+                os.path.join(path, info["path"]), embeddings, allow_dangerous_deserialization=True
+            )
+            shards.append(IndexShard(info["name"], store, info))
+        print(f"Loaded {len(shards)} index shards (by {manifest.get('shard_by')}).")
+        return cls(shards, embeddings, manifest.get("shard_by", "none"))
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def _fan_out(self, fn: Callable[[IndexShard], Any], shards: List[IndexShard]) -> List[Any]:
+        if len(shards) == 1:
+            return [fn(shards[0])]
+        return list(_executor.map(fn, shards))
+
+    def select_shards(self, filters: Optional[Dict[str, set]] = None, sources: Optional[set] = None) -> List[IndexShard]:
+        return [shard for shard in self.shards if shard.may_match(filters, sources)]
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        filters: Optional[Dict[str, set]] = None,
+        sources: Optional[set] = None,
+        fetch_k: int = None,
+        with_vectors: bool = False,
+    ) -> List[Tuple]:
+        """
+        Top-k (L2 distance, document) pairs across the matching shards, nearest first;
+        (distance, document, vector) triples with `with_vectors` (for diversity reranking).
+        """
+        shards = self.select_shards(filters, sources)
+        if not shards:
+            return []
+        vector = np.array([self.embeddings.embed_query(query)], dtype=np.float32)
+        predicate = chunk_filter(filters, sources)
+        # Filtering happens after the vector search, so look further down the ranking
+        depth = k if predicate is None else (fetch_k or max(50, k * 10))
+
+        def search_shard(shard: IndexShard):
+            store = shard.store
+            distances, indices = store.index.search(vector, min(depth, len(shard)))
+            hits, ids = [], []
+            for distance, i in zip(distances[0], indices[0]):
+                if i == -1:
+                    continue
+                doc = store.docstore.search(store.index_to_docstore_id[i])
+                if predicate is not None and not predicate(doc.metadata):
+                    continue
+                hits.append((float(distance), doc))
+                ids.append(i)
+                if len(hits) == k:
+                    break
+            if not with_vectors or not hits:
+                return [(distance, doc, None) for distance, doc in hits]
+            # One call for the whole candidate pool instead of a reconstruct() per hit
+            vectors = store.index.reconstruct_batch(np.array(ids, dtype=np.int64))
+            return [(distance, doc, vec) for (distance, doc), vec in zip(hits, vectors)]
+
+        with span("faiss", "sharded_search", shards=len(shards), skipped=len(self.shards) - len(shards)):
+            per_shard = self._fan_out(search_shard, shards)
+        nearest = heapq.nsmallest(k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[0])
+        return nearest if with_vectors else [(distance, doc) for distance, doc, _ in nearest]
+
+    def search_batch(
+        self, vectors: np.ndarray, k: int, sources: Optional[List[Optional[Set[str]]]] = None
+    ) -> List[List[Document]]:
+        """
+        Top-k documents for each row of a query matrix (one index call per shard).
+        `sources` optionally restricts each row to chunks of its own set of documents
+        (None for a row = unrestricted), like `search(..., sources=...)`.
+        """
+        restricted = sources is not None and any(row is not None for row in sources)
+        # Filtering happens after the vector search, so look further down the ranking
+        depth = max(50, k * 10) if restricted else k
+
+        def search_shard(shard: IndexShard):
+            distances, indices = shard.store.index.search(vectors, min(depth, len(shard)))
+            return shard, distances, indices
+
+        per_query: List[List[Tuple[float, int, Document]]] = [[] for _ in range(len(vectors))]
+        for shard, distances, indices in self._fan_out(search_shard, self.shards):
+            for row, (row_distances, row_indices) in enumerate(zip(distances, indices)):
+                predicate = chunk_filter(None, sources[row]) if restricted else None
+                kept = 0
+                for distance, i in zip(row_distances, row_indices):
+                    if i == -1:
+                        continue
+                    doc = shard.store.docstore.search(shard.store.index_to_docstore_id[i])
+                    if predicate is not None and not predicate(doc.metadata):
+                        continue
+                    per_query[row].append((float(distance), id(doc), doc))
+                    kept += 1
+                    if kept == k:
+                        break
+        return [[doc for _, _, doc in heapq.nsmallest(k, hits)] for hits in per_query]
+
+
+# ------------------------------
+# Diversity selection
+# ------------------------------
+def mmr_select(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    groups: Optional[List[Any]] = None,
+    per_group_cap: Optional[int] = None,
+) -> List[int]:
+    """
+    Maximal marginal relevance over a candidate pool, as matrix operations: one
+    matrix-vector product for relevance, then one per pick to update each candidate's
+    highest similarity to anything already selected (O(k * n * d), no n x n matrix).
+    With `groups` (e.g. each candidate's source document) at most `per_group_cap`
+    candidates of a group are selected while other groups still have candidates; once
+    the capped pool runs dry the remaining slots are filled without the cap, so the
+    result is only shorter than k if the pool is. Returns candidate positions in pick order.
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if not len(candidates) or k <= 0:
+        return []
+    # Cosine similarity throughout, like the rest of the pipeline
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    # Candidates of groups that reached the cap; only picked if nothing else is left
+    over_cap = np.zeros(len(candidates), dtype=bool)
+    if groups is not None and per_group_cap:
+        numbering: Dict[Any, int] = {}
+        group_ids = np.array([numbering.setdefault(group, len(numbering)) for group in groups])
+        group_counts = np.zeros(len(numbering), dtype=np.int32)
+    else:
+        group_ids = None
+
+    selected: List[int] = []
+    while len(selected) < k and available.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        eligible = available & ~over_cap
+        scores[~(eligible if eligible.any() else available)] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[pick])
+        if group_ids is not None:
+            group = group_ids[pick]
+            group_counts[group] += 1
+            if group_counts[group] >= per_group_cap:
+                over_cap[group_ids == group] = True
+    return selected
@@ -0,0 +1,224 @@
+# LARA/legal_rag/web_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from legal_rag.providers import PROVIDER_MODE, invoke_web_search, request_priority, PRIORITY_BATCH
+from legal_rag.tracing import record_cache
+
+# ------------------------------
+# Config
+# ------------------------------
+backend_dir = Path(__file__).resolve().parent.parent
+# The offline provider gets its own file, so benchmark runs never answer for live traffic
+WEB_CACHE_PATH = os.getenv(
+    "WEB_CACHE_PATH",
+    str(backend_dir / "data" / ("web_cache.offline.db" if PROVIDER_MODE == "offline" else "web_cache.db")),
+)
+# Fresh entries are served without touching the network
+WEB_CACHE_TTL_SECONDS = float(os.getenv("WEB_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Expired entries younger than this are still served while a refresh runs in the background
+WEB_CACHE_STALE_SECONDS = float(os.getenv("WEB_CACHE_STALE_SECONDS", str(30 * 24 * 3600)))
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", "5000"))
+# Replay mode: answer only from the cache and never call Tavily (offline regression runs)
+WEB_SEARCH_OFFLINE = os.getenv("WEB_SEARCH_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search query: case- and whitespace-insensitive, trailing punctuation dropped."""
+    return " ".join((query or "").lower().split()).rstrip("?.!")
+
+
+def normalize_tavily_results(raw: Any) -> List[Dict[str, str]]:
+    """
+    Converts whatever the Tavily tool returned (a response dict, a list of result
+    dicts or a list of strings) into a list of {"url", "title", "content"} dicts.
+    """
+    if isinstance(raw, dict):
+        raw = raw.get("results", [])
+    if isinstance(raw, str):
+        raw = [raw]
+
+    results = []
+    for item in raw or []:
+        if isinstance(item, dict):
+            results.append({
+                "url": item.get("url", ""),
+                "title": item.get("title", ""),
+                "content": item.get("content", ""),
+            })
+        else:
+            results.append({"url": "", "title": "", "content": str(item)})
+    return results
+
+
+# ------------------------------
+# Persistent Cache
+# ------------------------------
+class WebSearchCache:
+    """SQLite-backed search cache with per-entry TTL and least-recently-used eviction."""
+
+    def __init__(self, path: str = WEB_CACHE_PATH, max_entries: int = WEB_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS web_search_cache (
+                query_key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                results TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                ttl REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_web_cache_last_accessed ON web_search_cache (last_accessed)"
+        )
+        conn.commit()
+        conn.close()
+
+    def get(self, query_key: str) -> Optional[Dict[str, Any]]:
+        """Returns {"results", "age", "ttl"} for a cached query and marks it as recently used."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT results, fetched_at, ttl FROM web_search_cache WHERE query_key = ?",
+            (query_key,),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE web_search_cache SET last_accessed = ? WHERE query_key = ?",
+                (time.time(), query_key),
+            )
+            conn.commit()
+        conn.close()
+        if row is None:
+            return None
+        return {"results": json.loads(row[0]), "age": time.time() - row[1], "ttl": row[2]}
+
+    def put(self, query_key: str, query: str, results: List[Dict[str, str]], ttl: float = WEB_CACHE_TTL_SECONDS):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO web_search_cache (query_key, query, results, fetched_at, ttl, last_accessed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (query_key, query, json.dumps(results, ensure_ascii=False), now, ttl, now))
+        # Evict least recently used entries beyond the size limit
+        conn.execute('''
+            DELETE FROM web_search_cache WHERE query_key IN (
+                SELECT query_key FROM web_search_cache
+                ORDER BY last_accessed DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "background_refreshes": self.refreshes,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache: Optional[WebSearchCache] = None
+_cache_lock = threading.Lock()
+_refreshing = set()
+
+
+def get_web_cache() -> WebSearchCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = WebSearchCache()
+    return _cache
+
+
+def _fetch_and_store(cache: WebSearchCache, query_key: str, query: str) -> List[Dict[str, str]]:
+    results = normalize_tavily_results(invoke_web_search(query))
+    # An empty answer (outage, offline stand-in) must not hide real results for a TTL
+    if results:
+        cache.put(query_key, query, results)
+    return results
+
+
+def _revalidate(cache: WebSearchCache, query_key: str, query: str):
+    """Background refresh of a stale entry; lowest provider priority, one refresh per key."""
+    try:
+        with request_priority(PRIORITY_BATCH):
+            _fetch_and_store(cache, query_key, query)
+        with cache._lock:
+            cache.refreshes += 1
+    except Exception as e:
+        print(f"Web cache refresh failed for '{query}': {e}")
+    finally:
+        with cache._lock:
+            _refreshing.discard(query_key)
+
+
+def cached_web_search(query: str) -> List[Dict[str, str]]:
+    """
+    Tavily search with a persistent cache in front of it.
+    - fresh hit: served from the cache
+    - stale hit (expired, within WEB_CACHE_STALE_SECONDS): served, refreshed in the background
+    - miss or too old: fetched synchronously and stored
+    """
+    cache = get_web_cache()
+    query_key = normalize_query(query)
+    entry = cache.get(query_key)
+
+    if WEB_SEARCH_OFFLINE:
+        with cache._lock:
+            if entry is None:
+                cache.misses += 1
+            else:
+                cache.hits += 1
+        record_cache("web", "miss" if entry is None else "hit")
+        return entry["results"] if entry else []
+
+    if entry is not None and entry["age"] <= entry["ttl"]:
+        with cache._lock:
+            cache.hits += 1
+        record_cache("web", "hit")
+        return entry["results"]
+
+    if entry is not None and entry["age"] <= entry["ttl"] + WEB_CACHE_STALE_SECONDS:
+        with cache._lock:
+            cache.stale_hits += 1
+            start_refresh = query_key not in _refreshing
+            _refreshing.add(query_key)
+        record_cache("web", "stale")
+        if start_refresh:
+            threading.Thread(target=_revalidate, args=(cache, query_key, query), daemon=True).start()
+        return entry["results"]
+
+    with cache._lock:
+        cache.misses += 1
+    record_cache("web", "miss")
+    return _fetch_and_store(cache, query_key, query)
+
+
+def get_web_cache_stats() -> Dict[str, Any]:
+    return get_web_cache().stats()
@@ -0,0 +1,104 @@
+import os
+import struct
+import threading
+from typing import Callable, Dict, List, Optional, Union
+import zstandard
+
+# ------------------------------
+# Config
+# ------------------------------
+# "zstd": long messages are stored zstd-compressed (with the trained dictionary, once
+# there is one); "none": new messages are stored as plain text. Either way both kinds
+# of rows are read back transparently.
+MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "zstd").lower()
+COMPRESSION_LEVEL = int(os.getenv("MESSAGE_COMPRESSION_LEVEL", "9"))
+# Short messages (most user questions) gain little and stay readable in the raw table
+COMPRESS_MIN_CHARS = int(os.getenv("COMPRESS_MIN_CHARS", "512"))
+# zstd's recommended dictionary size (~110 KB); trained on a sample of bot messages
+DICTIONARY_SIZE = 112_640
+
+# Compressed values are BLOBs: codec byte + dictionary id (0 = none) + zstd frame.
+# Plain text stays TEXT, so rows written before compression need no migration.
+_HEADER = struct.Struct(">BI")
+CODEC_ZSTD = 1
+
+
+class MessageCodec:
+    """
+    Compresses message content for storage and restores it on read. Dictionaries are
+    kept by id, so rows compressed with an older dictionary stay readable after a new
+    one is trained; `dictionary_loader` fetches ids this process hasn't seen yet.
+    zstd (de)compressor objects aren't thread-safe, so each thread keeps its own.
+    """
+
+    def __init__(self, level: int = COMPRESSION_LEVEL):
+        self.level = level
+        self.active_dictionary_id = 0
+        self.dictionary_loader: Optional[Callable[[int], Optional[bytes]]] = None
+        self._dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add_dictionary(self, dictionary_id: int, data: bytes, activate: bool = True):
+        with self._lock:
+            self._dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(data)
+            if activate and dictionary_id > self.active_dictionary_id:
+                self.active_dictionary_id = dictionary_id
+
+    def _dictionary(self, dictionary_id: int) -> Optional[zstandard.ZstdCompressionDict]:
+        if not dictionary_id:
+            return None
+        if dictionary_id not in self._dictionaries:
+            data = self.dictionary_loader(dictionary_id) if self.dictionary_loader else None
+            if data is None:
+                raise ValueError(f"Compression dictionary {dictionary_id} not found")
+            self.add_dictionary(dictionary_id, data, activate=False)
+        return self._dictionaries[dictionary_id]
+
+    def _cached(self, kind: str, dictionary_id: int):
+        cache = self._local.__dict__.setdefault(kind, {})
+        if dictionary_id not in cache:
+            dictionary = self._dictionary(dictionary_id)
+            if kind == "compressors":
+                cache[dictionary_id] = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+            else:
+                cache[dictionary_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return cache[dictionary_id]
+
+    def compress(self, text: str) -> bytes:
+        """Always compresses (used for archive segments as well as messages)."""
+        dictionary_id = self.active_dictionary_id
+        frame = self._cached("compressors", dictionary_id).compress(text.encode("utf-8"))
+        return _HEADER.pack(CODEC_ZSTD, dictionary_id) + frame
+
+    def encode(self, text: str) -> Union[str, bytes]:
+        """Value to store for a message: compressed if worth it, else the text itself."""
+        if MESSAGE_COMPRESSION != "zstd" or len(text) < COMPRESS_MIN_CHARS:
+            return text
+        blob = self.compress(text)
+        return blob if len(blob) < len(text.encode("utf-8")) else text
+
+    def decode(self, value: Union[str, bytes, None]) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        codec, dictionary_id = _HEADER.unpack_from(value)
+        if codec != CODEC_ZSTD:
+            raise ValueError(f"Unknown message codec {codec}")
+        decompressor = self._cached("decompressors", dictionary_id)
+        return decompressor.decompress(value[_HEADER.size:]).decode("utf-8")
+
+    @staticmethod
+    def dictionary_id_of(value: Union[str, bytes]) -> Optional[int]:
+        """Dictionary a stored value was compressed with; None for plain text."""
+        if isinstance(value, str):
+            return None
+        return _HEADER.unpack_from(value)[1]
+
+    @staticmethod
+    def train(samples: List[str], size: int = DICTIONARY_SIZE) -> bytes:
+        """Trains a zstd dictionary on sample messages (needs a few hundred to be useful)."""
+        data = [sample.encode("utf-8") for sample in samples]
+        return zstandard.train_dictionary(size, data, level=COMPRESSION_LEVEL).as_bytes()
+
+
+CODEC = MessageCodec()